@@ -0,0 +1,171 @@
+"""
+Benchmark do organizar_layer_ordem_latitude_v1.py: sessão de edição
+contra o modo em lote (centroides_lote.py).
+
+Para cada tamanho em TAMANHOS cria um GeoPackage com polígonos sintéticos
+(hexágonos irregulares em SIRGAS 2000 / UTM 23S) e mede, cada um numa
+cópia nova do arquivo:
+- "edição, 3 chamadas": como era o v1 (getFeatures completo, centroid(),
+  três changeAttributeValue por feição, commitChanges)
+- "edição, 1 chamada": sessão de edição com um changeAttributeValues por feição
+- "lote, QgsGeometry": só geometrias + gravação direta no provedor
+- "lote, shapely": idem, com os centroides do shapely 2 (se instalado)
+
+Rodar no console do QGIS (abrir no editor e executar).
+"""
+from qgis.core import QgsVectorLayer, QgsField
+from qgis.PyQt.QtCore import QVariant
+from qgis.PyQt.QtWidgets import QFileDialog
+from qgis.utils import iface
+from osgeo import ogr, osr
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+
+# CONFIGURAÇÕES
+
+TAMANHOS = [1000, 10000, 100000]
+PASTA = None      # None = pasta temporária
+
+# Permite importar os módulos auxiliares que ficam na mesma pasta
+try:
+    PASTA_SCRIPT = os.path.dirname(os.path.abspath(__file__))
+except NameError:
+    # O editor do console do QGIS nem sempre define __file__
+    PASTA_SCRIPT = QFileDialog.getExistingDirectory(
+        iface.mainWindow(),
+        "Selecione a pasta 'arvore de camadas' do codigos_qgis"
+    )
+if PASTA_SCRIPT not in sys.path:
+    sys.path.insert(0, PASTA_SCRIPT)
+
+from centroides_lote import centroides, gravar_lote, TEM_SHAPELY
+
+CAMPOS = [("lat_centro", QVariant.Double), ("ordem_lat", QVariant.Int), ("BH_legenda", QVariant.String)]
+
+
+def criar_gpkg(caminho, n, semente=42):
+    """n hexágonos irregulares espalhados numa área de ~500 x 500 km."""
+    rng = np.random.default_rng(semente)
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(31983)
+    ds = ogr.GetDriverByName("GPKG").CreateDataSource(caminho)
+    lyr = ds.CreateLayer("bhs", srs, ogr.wkbPolygon)
+    lyr.CreateField(ogr.FieldDefn("nome", ogr.OFTString))
+    defn = lyr.GetLayerDefn()
+
+    cx = rng.uniform(300000, 800000, n)
+    cy = rng.uniform(7300000, 7800000, n)
+    raio = rng.uniform(200, 2000, n)
+    ds.StartTransaction()
+    for i in range(n):
+        anel = ogr.Geometry(ogr.wkbLinearRing)
+        for k in range(7):
+            a = 2 * math.pi * (k % 6) / 6
+            r = raio[i] * (0.7 + 0.3 * math.sin(3 * a + i))
+            anel.AddPoint_2D(cx[i] + r * math.cos(a), cy[i] + r * math.sin(a))
+        poligono = ogr.Geometry(ogr.wkbPolygon)
+        poligono.AddGeometry(anel)
+        feat = ogr.Feature(defn)
+        feat.SetGeometry(poligono)
+        feat.SetField("nome", f"BH sintética {i}")
+        lyr.CreateFeature(feat)
+    ds.CommitTransaction()
+    ds = None
+
+
+def preparar(original, pasta, rotulo):
+    copia = os.path.join(pasta, f"{rotulo}.gpkg")
+    shutil.copy2(original, copia)
+    layer = QgsVectorLayer(f"{copia}|layername=bhs", rotulo, "ogr")
+    if not layer.isValid():
+        raise Exception(f"Não foi possível abrir {copia}")
+    layer.dataProvider().addAttributes([QgsField(nome, tipo) for nome, tipo in CAMPOS])
+    layer.updateFields()
+    return layer, [layer.fields().indexOf(nome) for nome, _ in CAMPOS]
+
+
+def edicao_tres_chamadas(layer, indices):
+    idx_lat, idx_ordem, idx_leg = indices
+    layer.startEditing()
+    lista = []
+    for feat in layer.getFeatures():
+        geom = feat.geometry()
+        if geom is None or geom.isEmpty():
+            continue
+        lista.append((feat.id(), geom.centroid().asPoint().y()))
+    for i, (fid, lat) in enumerate(sorted(lista, key=lambda x: x[1]), start=1):
+        layer.changeAttributeValue(fid, idx_lat, float(lat))
+        layer.changeAttributeValue(fid, idx_ordem, int(i))
+        layer.changeAttributeValue(fid, idx_leg, f"BH{i:02d}")
+    if not layer.commitChanges():
+        raise Exception(f"Falha no commit: {layer.commitErrors()}")
+
+
+def _valores(indices, usar_shapely):
+    idx_lat, idx_ordem, idx_leg = indices
+
+    def calcular(layer):
+        fids, _, lats = centroides(layer, usar_shapely)
+        return {
+            int(fids[j]): {idx_lat: float(lats[j]), idx_ordem: i, idx_leg: f"BH{i:02d}"}
+            for i, j in enumerate(np.argsort(lats, kind="stable"), start=1)
+        }
+    return calcular
+
+
+def edicao_uma_chamada(layer, indices):
+    layer.startEditing()
+    for fid, atributos in _valores(indices, False)(layer).items():
+        layer.changeAttributeValues(fid, atributos)
+    if not layer.commitChanges():
+        raise Exception(f"Falha no commit: {layer.commitErrors()}")
+
+
+def lote(usar_shapely):
+    def rodar(layer, indices):
+        gravar_lote(layer, _valores(indices, usar_shapely)(layer))
+    return rodar
+
+
+metodos = [
+    ("edição, 3 chamadas", edicao_tres_chamadas),
+    ("edição, 1 chamada", edicao_uma_chamada),
+    ("lote, QgsGeometry", lote(False)),
+]
+if TEM_SHAPELY:
+    metodos.append(("lote, shapely", lote(True)))
+else:
+    print("shapely 2 não instalado: o modo em lote usa QgsGeometry.centroid().")
+
+pasta = PASTA or tempfile.mkdtemp(prefix="benchmark_latitude_")
+os.makedirs(pasta, exist_ok=True)
+print(f"Pasta de trabalho: {pasta}\n")
+
+print(f"{'Feições':>8}  " + "  ".join(f"{nome:>20}" for nome, _ in metodos))
+for n in TAMANHOS:
+    original = os.path.join(pasta, f"bhs_{n}.gpkg")
+    if not os.path.exists(original):
+        criar_gpkg(original, n)
+
+    tempos = []
+    referencia = None
+    for k, (nome, funcao) in enumerate(metodos):
+        layer, indices = preparar(original, pasta, f"bhs_{n}_{k}")
+        inicio = time.perf_counter()
+        funcao(layer, indices)
+        tempos.append(time.perf_counter() - inicio)
+
+        idx = layer.fields().indexOf("ordem_lat")
+        ordem = {f.id(): f[idx] for f in layer.getFeatures()}
+        if referencia is None:
+            referencia = ordem
+        elif ordem != referencia:
+            print(f"  ATENÇÃO: '{nome}' deu uma ordem diferente do método antigo ({n} feições).")
+        layer = None
+
+    print(f"{n:>8}  " + "  ".join(f"{t:>19.2f}s" for t in tempos))
@@ -0,0 +1,126 @@
+"""
+Microbenchmark do formatador de títulos (formatar_titulo.py) contra a
+versão antiga do title_case_preservando_siglas.
+
+Gera rótulos parecidos com os de legendas grandes (municípios, classes de
+uso do solo) e mede o custo por rótulo:
+- antigo: re.split / re.sub sem pré-compilar, sem cache
+- novo, cache frio: padrões compilados, cache vazio (1ª camada)
+- novo, cache quente: os mesmos rótulos de novo (outras camadas, outra
+  execução no mesmo QGIS)
+Confere também que, sem a lista de partículas, o resultado é idêntico ao
+antigo.
+
+Não precisa do QGIS:
+    python benchmark_titulo.py
+    python benchmark_titulo.py --rotulos 50000 --repeticoes 5
+"""
+import argparse
+import random
+import re
+import time
+
+from formatar_titulo import FormatadorTitulo
+
+
+def title_case_antigo(texto: str) -> str:
+    """Versão antiga (primeiras_letras_maiusculas_grupo.py), como referência."""
+    if not texto:
+        return texto
+
+    tokens = re.split(r'(\s+)', texto.strip())
+    saida = []
+
+    for token in tokens:
+        if token.isspace() or token == '':
+            saida.append(token)
+            continue
+
+        nucleo = re.sub(r'^[^\wÀ-ÿ]+|[^\wÀ-ÿ]+$', '', token)
+
+        if len(nucleo) >= 2 and nucleo.isupper():
+            saida.append(token)
+            continue
+
+        if nucleo.isdigit() or (nucleo and nucleo[0].isdigit()):
+            saida.append(token)
+            continue
+
+        primeira = token[0].upper()
+        resto = token[1:].lower() if len(token) > 1 else ''
+        saida.append(primeira + resto)
+
+    return ''.join(saida)
+
+
+PALAVRAS = [
+    "são", "josé", "santa", "rio", "serra", "vale", "bom", "jesus", "nova", "alto",
+    "floresta", "campo", "pastagem", "mosaico", "agricultura", "formação", "savânica",
+    "área", "urbana", "mineração", "(app)", "APP", "UC", "reserva", "legal", "cana",
+    "d'água", "várzea", "ribeirão", "lagoa", "cerrado", "mata", "atlântica", "soja",
+]
+PARTICULAS = ["de", "do", "da", "dos", "das", "e"]
+
+
+def gerar_rotulos(n, semente=1):
+    rng = random.Random(semente)
+    rotulos = []
+    for i in range(n):
+        palavras = []
+        for k in range(rng.randint(2, 6)):
+            if k and rng.random() < 0.3:
+                palavras.append(rng.choice(PARTICULAS))
+            palavras.append(rng.choice(PALAVRAS))
+        texto = " ".join(palavras)
+        if rng.random() < 0.5:
+            texto = f"{rng.randint(1, 9999)} - {texto}"
+        rotulos.append(texto.upper() if rng.random() < 0.2 else texto)
+    return rotulos
+
+
+def medir(funcao, rotulos, repeticoes):
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        for r in rotulos:
+            funcao(r)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor / len(rotulos) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Custo por rótulo do formatador de títulos.")
+    parser.add_argument("--rotulos", type=int, default=20000, help="rótulos diferentes")
+    parser.add_argument("--repeticoes", type=int, default=3, help="repetições (vale o melhor tempo)")
+    args = parser.parse_args()
+
+    rotulos = gerar_rotulos(args.rotulos)
+
+    sem_particulas = FormatadorTitulo(particulas=())
+    diferentes = sum(title_case_antigo(r) != sem_particulas(r) for r in rotulos)
+
+    antigo = medir(title_case_antigo, rotulos, args.repeticoes)
+
+    frio = float("inf")
+    for _ in range(args.repeticoes):
+        formatador = FormatadorTitulo()
+        frio = min(frio, medir(formatador, rotulos, 1))
+
+    formatador = FormatadorTitulo()
+    for r in rotulos:
+        formatador(r)
+    quente = medir(formatador, rotulos, args.repeticoes)
+
+    print(f"{len(rotulos)} rótulos diferentes")
+    print(f"{'antigo':>20}: {antigo:7.2f} µs/rótulo")
+    print(f"{'novo, cache frio':>20}: {frio:7.2f} µs/rótulo ({antigo / frio:.1f}x)")
+    print(f"{'novo, cache quente':>20}: {quente:7.2f} µs/rótulo ({antigo / quente:.1f}x)")
+    print(f"Cache: {formatador.info_cache()}")
+    if diferentes:
+        print(f"ATENÇÃO: {diferentes} rótulo(s) diferentes do antigo sem a lista de partículas.")
+    else:
+        print("Sem a lista de partículas o resultado é idêntico ao antigo.")
+
+
+if __name__ == "__main__":
+    main()
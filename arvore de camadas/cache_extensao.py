@@ -0,0 +1,253 @@
+"""
+Cache da extensão das camadas, para ordenar camadas sem recalcular tudo.
+
+layer.extent() pode custar uma varredura da tabela inteira (views do
+PostGIS, camadas virtuais, algumas fontes OGR). Aqui a extensão de cada
+camada vem, na ordem:
+1. do cache, se a fonte não mudou desde a última vez
+2. dos metadados do arquivo, quando existem:
+   - GeoPackage: bbox da tabela em gpkg_contents
+   - Shapefile: bbox do cabeçalho do .shp (bytes 36 a 68)
+3. de layer.extent() (o caminho lento de antes)
+
+A chave do cache é o id da camada mais uma assinatura da fonte: para
+arquivos, caminho + data de modificação + tamanho (no GPKG, também do
+-wal); para o resto, a string da fonte. O filtro (subsetString) entra na
+assinatura e, com filtro, os metadados do arquivo não são usados (a bbox
+deles é da tabela inteira). Camadas com edições não salvas não usam nem
+alimentam o cache.
+
+Fontes que não são arquivo (PostGIS, camadas virtuais, WFS...) não têm
+como avisar que os dados mudaram: a string da fonte continua a mesma
+quando linhas são inseridas numa tabela ou view. Essas entradas valem só
+por VALIDADE_SEM_ARQUIVO segundos; até lá, a extensão pode estar
+desatualizada. Para recalcular tudo antes disso: limpar_cache() (ou
+centros_camadas(..., limpar=True)).
+
+A extensão é guardada no SRC da camada e transformada para o SRC pedido
+na hora de usar (camadas em SRCs diferentes só podem ser comparadas num
+sistema comum). O cache fica num JSON na pasta de configurações do QGIS e
+vale entre execuções e entre sessões.
+"""
+import json
+import os
+import sqlite3
+import struct
+import time
+
+from qgis.core import (
+    QgsApplication,
+    QgsCoordinateTransform,
+    QgsProject,
+    QgsProviderRegistry,
+    QgsRectangle,
+    QgsVectorLayer,
+)
+
+NOME_CACHE = "cache_extensao.json"
+
+# Entradas mantidas no arquivo (as mais antigas saem primeiro)
+MAX_ENTRADAS = 20000
+
+# Segundos que vale a extensão de uma fonte que não é arquivo (PostGIS,
+# camadas virtuais...). 0 = não usa o cache para elas; None = não expira
+VALIDADE_SEM_ARQUIVO = 24 * 3600
+
+
+def _arquivo_da_camada(layer):
+    """(caminho, nome da camada no arquivo) para fontes em arquivo; senão (None, None)."""
+    if layer.providerType() not in ("ogr", "gdal"):
+        return None, None
+    partes = QgsProviderRegistry.instance().decodeUri(layer.providerType(), layer.source())
+    caminho = partes.get("path") or ""
+    if not os.path.isfile(caminho):
+        return None, None
+    return caminho, partes.get("layerName") or None
+
+
+def assinatura_fonte(layer):
+    """Texto que muda quando a fonte (ou o filtro) da camada muda."""
+    subset = layer.subsetString() if isinstance(layer, QgsVectorLayer) else ""
+    caminho, _ = _arquivo_da_camada(layer)
+    if caminho is None:
+        return f"{layer.source()}|{subset}"
+
+    partes = [layer.source(), subset]
+    for arquivo in (caminho, caminho + "-wal"):
+        if os.path.exists(arquivo):
+            info = os.stat(arquivo)
+            partes.append(f"{info.st_mtime_ns}:{info.st_size}")
+    return "|".join(partes)
+
+
+def _validade(layer):
+    """
+    Até quando (time.time()) vale a entrada da camada.
+    None = enquanto a assinatura não mudar (arquivos).
+    """
+    if VALIDADE_SEM_ARQUIVO is None or _arquivo_da_camada(layer)[0] is not None:
+        return None
+    return time.time() + VALIDADE_SEM_ARQUIVO
+
+
+def _bbox_gpkg(caminho, tabela):
+    """bbox de gpkg_contents (None se não houver ou estiver incompleta)."""
+    try:
+        con = sqlite3.connect(f"file:{caminho}?mode=ro", uri=True)
+        try:
+            if tabela:
+                linha = con.execute(
+                    "SELECT min_x, min_y, max_x, max_y FROM gpkg_contents WHERE table_name = ?",
+                    (tabela,)
+                ).fetchone()
+            else:
+                # Sem layername o OGR abre a primeira camada com geometria
+                linhas = con.execute(
+                    "SELECT min_x, min_y, max_x, max_y FROM gpkg_contents WHERE data_type = 'features'"
+                ).fetchall()
+                linha = linhas[0] if len(linhas) == 1 else None
+        finally:
+            con.close()
+    except sqlite3.Error:
+        return None
+    if not linha or any(v is None for v in linha):
+        return None
+    return tuple(float(v) for v in linha)
+
+
+def _bbox_shp(caminho):
+    """bbox do cabeçalho do .shp (little endian, bytes 36-68)."""
+    try:
+        with open(caminho, "rb") as f:
+            cabecalho = f.read(68)
+    except OSError:
+        return None
+    if len(cabecalho) < 68 or struct.unpack(">i", cabecalho[:4])[0] != 9994:
+        return None
+    return struct.unpack("<4d", cabecalho[36:68])
+
+
+def extensao_metadados(layer):
+    """Extensão tirada dos metadados do arquivo, ou None se não der."""
+    if not isinstance(layer, QgsVectorLayer) or layer.subsetString():
+        return None
+    caminho, tabela = _arquivo_da_camada(layer)
+    if caminho is None:
+        return None
+    ext = os.path.splitext(caminho)[1].lower()
+    if ext == ".gpkg":
+        bbox = _bbox_gpkg(caminho, tabela)
+    elif ext == ".shp":
+        bbox = _bbox_shp(caminho)
+    else:
+        return None
+    if bbox is None or bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+        return None
+    return QgsRectangle(*bbox)
+
+
+class CacheExtensao:
+    """Leitura, consulta e gravação do cache de extensões."""
+
+    def __init__(self, caminho=None):
+        self.caminho = caminho or os.path.join(QgsApplication.qgisSettingsDirPath(), NOME_CACHE)
+        self.entradas = {}
+        self.acertos = 0
+        self.metadados = 0
+        self.calculadas = 0
+        self.alterado = False
+        if os.path.isfile(self.caminho):
+            try:
+                with open(self.caminho, "r", encoding="utf-8") as f:
+                    self.entradas = json.load(f).get("camadas", {})
+            except (OSError, ValueError):
+                self.entradas = {}
+
+    def extensao(self, layer):
+        """Extensão da camada no SRC dela (QgsRectangle)."""
+        editada = isinstance(layer, QgsVectorLayer) and layer.isModified()
+        assinatura = assinatura_fonte(layer)
+        entrada = self.entradas.get(layer.id())
+        if (
+            not editada
+            and entrada
+            and entrada["assinatura"] == assinatura
+            and "validade" in entrada   # entradas antigas, sem validade, são refeitas
+            and (entrada["validade"] is None or time.time() < entrada["validade"])
+        ):
+            self.acertos += 1
+            return QgsRectangle(*entrada["bbox"])
+
+        ret = None if editada else extensao_metadados(layer)
+        if ret is not None:
+            self.metadados += 1
+        else:
+            ret = layer.extent()
+            self.calculadas += 1
+
+        if not editada:
+            # Reinsere no fim: as entradas mais antigas são as primeiras a sair
+            self.entradas.pop(layer.id(), None)
+            self.entradas[layer.id()] = {
+                "assinatura": assinatura,
+                "bbox": [ret.xMinimum(), ret.yMinimum(), ret.xMaximum(), ret.yMaximum()],
+                "validade": _validade(layer),
+            }
+            self.alterado = True
+        return ret
+
+    def centro(self, layer, crs_destino=None, projeto=None):
+        """
+        Centro da extensão no SRC 'crs_destino' (padrão: SRC do projeto).
+        Retorna (x, y); camadas sem extensão válida dão (None, None).
+        """
+        projeto = projeto or QgsProject.instance()
+        crs_destino = crs_destino or projeto.crs()
+        ret = self.extensao(layer)
+        if ret.isNull():
+            return None, None
+        if layer.crs().isValid() and crs_destino.isValid() and layer.crs() != crs_destino:
+            ret = QgsCoordinateTransform(layer.crs(), crs_destino, projeto).transformBoundingBox(ret)
+        centro = ret.center()
+        return centro.x(), centro.y()
+
+    def limpar(self):
+        """Esquece todas as extensões (gravado no próximo salvar())."""
+        self.entradas = {}
+        self.alterado = True
+
+    def salvar(self):
+        if not self.alterado:
+            return
+        excesso = len(self.entradas) - MAX_ENTRADAS
+        if excesso > 0:
+            for chave in list(self.entradas)[:excesso]:
+                del self.entradas[chave]
+        with open(self.caminho, "w", encoding="utf-8") as f:
+            json.dump({"camadas": self.entradas}, f, ensure_ascii=False)
+        self.alterado = False
+
+
+def limpar_cache(caminho=None):
+    """Apaga o cache de extensões (todas as camadas são recalculadas)."""
+    cache = CacheExtensao(caminho)
+    cache.limpar()
+    cache.salvar()
+
+
+def centros_camadas(layers, crs_destino=None, projeto=None, limpar=False):
+    """
+    Centros (xs, ys) das camadas num SRC comum, usando o cache.
+    - limpar: esquece o cache antes (extensões recalculadas)
+    Retorna também o cache, para o resumo (acertos/metadados/calculadas).
+    """
+    cache = CacheExtensao()
+    if limpar:
+        cache.limpar()
+    xs, ys = [], []
+    for layer in layers:
+        x, y = cache.centro(layer, crs_destino, projeto)
+        xs.append(x)
+        ys.append(y)
+    cache.salvar()
+    return xs, ys, cache
@@ -1,12 +1,31 @@
-root = QgsProject.instance().layerTreeRoot()
-grupo = root.findGroup("MAPAS")   # Nome do grupo
+from qgis.utils import iface
+from qgis.PyQt.QtWidgets import QFileDialog
+import os
+import sys
 
-if not grupo:
-    raise Exception("Grupo não encontrado!")
+# CONFIGURAÇÕES
 
-for node in grupo.children():
-    lyr = node.layer()
-    if lyr:  # garante que é camada, não grupo
-        lyr.setName(lyr.name().upper())
+# True  -> camadas de todos os subgrupos também
+# False -> só as camadas que estão direto no grupo escolhido
+RECURSIVO = True
 
-print("Todos os nomes de camadas do grupo MAPAS foram convertidos para CAIXA ALTA.")
+# Permite importar os módulos auxiliares que ficam na mesma pasta
+try:
+    PASTA_SCRIPT = os.path.dirname(os.path.abspath(__file__))
+except NameError:
+    # O editor do console do QGIS nem sempre define __file__
+    PASTA_SCRIPT = QFileDialog.getExistingDirectory(
+        iface.mainWindow(),
+        "Selecione a pasta 'arvore de camadas' do codigos_qgis"
+    )
+if PASTA_SCRIPT not in sys.path:
+    sys.path.insert(0, PASTA_SCRIPT)
+
+from transformar_nomes import CAMADAS, escolher_grupo, maiusculas, renomear
+
+grupo = escolher_grupo("Escolha o grupo cujas camadas irão para CAIXA ALTA:")
+
+n = renomear(grupo, [maiusculas], alvos=(CAMADAS,), recursivo=RECURSIVO,
+             titulo_janela="Caixa alta")
+
+print(f"{n} nome(s) de camada convertidos para CAIXA ALTA em '{grupo.name() or 'projeto'}'.")
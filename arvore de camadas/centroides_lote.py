@@ -0,0 +1,82 @@
+"""
+Centroides e gravação de atributos em lote, para camadas grandes.
+
+O organizar_layer_ordem_latitude_v1.py lia as feições com todos os
+atributos, chamava geom.centroid() uma a uma e gravava com três
+changeAttributeValue por feição numa sessão de edição: em camadas de
+50 mil polígonos o buffer de edição (e a pilha de desfazer) fica enorme e
+o commit demora. Aqui:
+
+- a leitura pede ao provedor só as geometrias (setNoAttributes)
+- com o shapely 2 instalado, os centroides saem de uma chamada só sobre o
+  array de geometrias (shapely.centroid); sem ele, QgsGeometry.centroid()
+- a gravação vai direto ao provedor num único changeAttributeValues
+  {fid: {campo: valor}}, sem buffer de edição nem pilha de desfazer
+  (não dá para desfazer com Ctrl+Z)
+"""
+import numpy as np
+from qgis.core import QgsFeatureRequest, QgsVectorDataProvider
+
+try:
+    import shapely
+
+    TEM_SHAPELY = hasattr(shapely, "from_wkb") and hasattr(shapely, "centroid")
+except ImportError:
+    TEM_SHAPELY = False
+
+
+def centroides(layer, usar_shapely=None):
+    """
+    Centroide de cada feição com geometria.
+    - usar_shapely: None = usa se estiver instalado
+    Retorna (fids, x, y) como arrays NumPy.
+    """
+    if usar_shapely is None:
+        usar_shapely = TEM_SHAPELY
+    if usar_shapely and not TEM_SHAPELY:
+        raise Exception("shapely 2 não está instalado.")
+
+    requisicao = QgsFeatureRequest().setNoAttributes()
+    fids = []
+    if usar_shapely:
+        wkbs = []
+        for feat in layer.getFeatures(requisicao):
+            geom = feat.geometry()
+            if geom is None or geom.isEmpty():
+                continue
+            fids.append(feat.id())
+            wkbs.append(bytes(geom.asWkb()))
+        pontos = shapely.centroid(shapely.from_wkb(np.array(wkbs, dtype=object)))
+        x, y = shapely.get_x(pontos), shapely.get_y(pontos)
+    else:
+        x, y = [], []
+        for feat in layer.getFeatures(requisicao):
+            geom = feat.geometry()
+            if geom is None or geom.isEmpty():
+                continue
+            centro = geom.centroid().asPoint()
+            fids.append(feat.id())
+            x.append(centro.x())
+            y.append(centro.y())
+
+    return np.array(fids, dtype=np.int64), np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+
+
+def gravar_lote(layer, valores):
+    """
+    Grava {fid: {índice do campo: valor}} direto no provedor, numa chamada.
+    A camada não pode ter edições pendentes (elas seriam sobrescritas).
+    """
+    provedor = layer.dataProvider()
+    if not provedor.capabilities() & QgsVectorDataProvider.ChangeAttributeValues:
+        raise Exception(f"O provedor da camada '{layer.name()}' não permite alterar atributos.")
+    if layer.isEditable() and layer.isModified():
+        raise Exception(
+            f"A camada '{layer.name()}' tem edições não salvas. Salve ou descarte antes do modo em lote."
+        )
+
+    if not provedor.changeAttributeValues(valores):
+        raise Exception(f"Falha ao gravar atributos em lote: {provedor.errors()}")
+    # Descarta o que a camada tinha em cache do provedor
+    layer.reload()
+    layer.triggerRepaint()
@@ -0,0 +1,95 @@
+"""
+Edição de rótulos e ordem de classes direto no renderer da camada.
+
+Antes, para trocar rótulos ou a ordem das categorias, os scripts criavam
+um QgsCategorizedSymbolRenderer / QgsGraduatedSymbolRenderer novo com
+symbol().clone() de cada classe. Isso custa caro em legendas com
+milhares de classes. No graduado perdia ainda o método de classificação,
+o formato da legenda e outras propriedades. Aqui o renderer atual é
+alterado no lugar:
+- rótulos: updateCategoryLabel / updateRangeLabel / QgsRuleBasedRenderer.Rule.setLabel,
+  só nas classes cujo rótulo realmente muda
+- ordem: moveCategory, só nas categorias fora do lugar
+- no final, se algo mudou, um aviso de estilo alterado (legenda) e um
+  redesenho da camada
+
+A leitura de categories() / ranges() ainda devolve cópias (o QGIS não tem
+acesso só ao rótulo), mas é uma passada em vez de três e nada é gravado
+de volta.
+"""
+from qgis.core import (
+    QgsCategorizedSymbolRenderer,
+    QgsGraduatedSymbolRenderer,
+    QgsRuleBasedRenderer,
+)
+
+
+def _avisar(layer, alterados):
+    if alterados:
+        layer.emitStyleChanged()
+        layer.triggerRepaint()
+    return alterados
+
+
+def atualizar_rotulos(layer, formatar, repintar=True):
+    """
+    Aplica formatar(rótulo) -> rótulo novo a cada classe do renderer
+    (categorizado, graduado ou por regras). Retorna quantos rótulos mudaram;
+    outros renderers (símbolo único etc.) dão 0.
+    """
+    renderer = layer.renderer()
+    alterados = 0
+
+    if isinstance(renderer, QgsCategorizedSymbolRenderer):
+        for i, cat in enumerate(renderer.categories()):
+            novo = formatar(cat.label())
+            if novo != cat.label():
+                renderer.updateCategoryLabel(i, novo)
+                alterados += 1
+
+    elif isinstance(renderer, QgsGraduatedSymbolRenderer):
+        for i, faixa in enumerate(renderer.ranges()):
+            novo = formatar(faixa.label())
+            if novo != faixa.label():
+                renderer.updateRangeLabel(i, novo)
+                alterados += 1
+
+    elif isinstance(renderer, QgsRuleBasedRenderer):
+        pendentes = list(renderer.rootRule().children())
+        while pendentes:
+            regra = pendentes.pop()
+            if regra.label():
+                novo = formatar(regra.label())
+                if novo != regra.label():
+                    regra.setLabel(novo)
+                    alterados += 1
+            pendentes.extend(regra.children())
+
+    return _avisar(layer, alterados) if repintar else alterados
+
+
+def reordenar_categorias(layer, chave, reverso=False, repintar=True):
+    """
+    Ordena as categorias de um renderer categorizado por chave(categoria)
+    com moveCategory (ordenação estável). Retorna quantas categorias foram
+    movidas.
+    """
+    renderer = layer.renderer()
+    if not isinstance(renderer, QgsCategorizedSymbolRenderer):
+        raise Exception(f"A camada '{layer.name()}' não usa simbologia Categorizada.")
+
+    categorias = renderer.categories()
+    destino = sorted(range(len(categorias)), key=lambda i: chave(categorias[i]), reverse=reverso)
+
+    # 'atual' acompanha a lista do renderer enquanto as categorias se movem
+    atual = list(range(len(categorias)))
+    movidas = 0
+    for posicao, original in enumerate(destino):
+        if atual[posicao] == original:
+            continue
+        i = atual.index(original, posicao)
+        renderer.moveCategory(i, posicao)
+        atual.insert(posicao, atual.pop(i))
+        movidas += 1
+
+    return _avisar(layer, movidas) if repintar else movidas
@@ -0,0 +1,95 @@
+"""
+'Primeira Letra Maiúscula' para nomes de camadas e rótulos de legenda.
+
+Mesmo comportamento do antigo title_case_preservando_siglas, mais rápido
+em legendas com milhares de classes (municípios, códigos de uso do solo):
+- os padrões são compilados uma vez, no import
+- o resultado de cada texto fica num cache LRU (as mesmas palavras e
+  rótulos se repetem entre camadas e entre execuções)
+
+E com listas de exceções configuráveis:
+- partículas ("de", "do", "da", "dos", "das", "e"): ficam em minúsculas,
+  exceto na primeira palavra ("Rio de Janeiro", "De Olho no Rio")
+- siglas: sempre em maiúsculas, mesmo que venham escritas em minúsculas
+  ("app" -> "APP"); palavras com 2+ letras já todas maiúsculas continuam
+  sendo preservadas como sigla
+
+Não depende do QGIS.
+"""
+import re
+from functools import lru_cache
+
+PARTICULAS_PADRAO = frozenset({"de", "do", "da", "dos", "das", "e"})
+SIGLAS_PADRAO = frozenset()
+
+# Textos diferentes guardados no cache de cada formatador
+TAMANHO_CACHE = 65536
+
+_ESPACOS = re.compile(r'(\s+)')
+_BORDAS = re.compile(r'^([^\wÀ-ÿ]*)(.*?)([^\wÀ-ÿ]*)$', re.S)
+
+
+class FormatadorTitulo:
+    """
+    Formatador com as suas próprias listas de exceções e o seu cache.
+    - particulas: palavras que ficam em minúsculas (fora da 1ª posição)
+    - siglas: palavras que ficam sempre em maiúsculas
+    """
+
+    def __init__(self, particulas=PARTICULAS_PADRAO, siglas=SIGLAS_PADRAO, tamanho_cache=TAMANHO_CACHE):
+        self.particulas = frozenset(p.lower() for p in particulas)
+        self.siglas = frozenset(s.upper() for s in siglas)
+        self._formatar = lru_cache(maxsize=tamanho_cache)(self._formatar_sem_cache)
+
+    def __call__(self, texto):
+        if not texto:
+            return texto
+        return self._formatar(texto)
+
+    def info_cache(self):
+        return self._formatar.cache_info()
+
+    def limpar_cache(self):
+        self._formatar.cache_clear()
+
+    def _palavra(self, token, primeira):
+        if token[0].isalnum() and token[-1].isalnum():
+            prefixo, nucleo, sufixo = "", token, ""   # caso comum, sem regex
+        else:
+            prefixo, nucleo, sufixo = _BORDAS.match(token).groups()
+
+        if nucleo.upper() in self.siglas:
+            return prefixo + nucleo.upper() + sufixo
+        if len(nucleo) >= 2 and nucleo.isupper():
+            return token
+        if nucleo.isdigit() or (nucleo and nucleo[0].isdigit()):
+            return token
+        if not primeira and nucleo.lower() in self.particulas:
+            return token.lower()
+
+        return token[0].upper() + token[1:].lower()
+
+    def _formatar_sem_cache(self, texto):
+        tokens = _ESPACOS.split(texto.strip())
+        saida = []
+        primeira = True
+        for token in tokens:
+            if not token or token.isspace():
+                saida.append(token)
+                continue
+            saida.append(self._palavra(token, primeira))
+            primeira = False
+        return ''.join(saida)
+
+
+# Formatador usado pelos scripts (listas padrão)
+titulo = FormatadorTitulo()
+
+
+def title_case_preservando_siglas(texto: str) -> str:
+    """
+    Coloca 'Primeira Letra Maiúscula' por palavra,
+    preservando siglas (2+ letras todas maiúsculas) e números.
+    Partículas (de, do, da...) ficam em minúsculas fora da 1ª palavra.
+    """
+    return titulo(texto)
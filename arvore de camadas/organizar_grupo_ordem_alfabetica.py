@@ -0,0 +1,65 @@
+from qgis.core import QgsProject, QgsLayerTreeGroup
+from qgis.utils import iface
+from qgis.PyQt.QtWidgets import QInputDialog, QFileDialog
+import os
+import re
+import sys
+
+# CONFIGURAÇÕES
+
+# True -> ordena também os subgrupos (cada um dentro de si)
+RECURSIVO = True
+
+# Permite importar os módulos auxiliares que ficam na mesma pasta
+try:
+    PASTA_SCRIPT = os.path.dirname(os.path.abspath(__file__))
+except NameError:
+    # O editor do console do QGIS nem sempre define __file__
+    PASTA_SCRIPT = QFileDialog.getExistingDirectory(
+        iface.mainWindow(),
+        "Selecione a pasta 'arvore de camadas' do codigos_qgis"
+    )
+if PASTA_SCRIPT not in sys.path:
+    sys.path.insert(0, PASTA_SCRIPT)
+
+from reordenar_arvore import ordenar_grupo
+
+root = QgsProject.instance().layerTreeRoot()
+
+# 1. Coletar todos os grupos existentes no projeto (em qualquer nível)
+grupos = []
+
+def coletar_grupos(node):
+    if isinstance(node, QgsLayerTreeGroup):
+        grupos.append(node)
+        for child in node.children():
+            if isinstance(child, QgsLayerTreeGroup):
+                coletar_grupos(child)
+
+coletar_grupos(root)
+nomes_grupos = [g.name() or "(raiz do projeto)" for g in grupos]
+
+# 2. Caixa de diálogo para o usuário escolher o grupo
+nome_grupo_escolhido, ok = QInputDialog.getItem(
+    iface.mainWindow(),
+    "Selecionar grupo",
+    "Escolha o grupo cujas camadas serão ordenadas (ordem alfanumérica natural):",
+    nomes_grupos,
+    0,      # índice padrão
+    False   # não permite digitar texto livre
+)
+
+if not ok:
+    raise Exception("Operação cancelada na seleção do grupo.")
+
+grupo_sel = grupos[nomes_grupos.index(nome_grupo_escolhido)]
+
+# 3. Ordem 'natural' (BH_1, BH_2, ..., BH_10), sem diferenciar maiúsculas
+def natural_key(node):
+    parts = re.split(r'(\d+)', node.name())
+    return [int(p) if p.isdigit() else p.lower() for p in parts]
+
+# 4. Reordena (uma operação por grupo, mapa redesenhado uma vez só)
+alterados = ordenar_grupo(grupo_sel, natural_key, recursivo=RECURSIVO)
+
+print(f"Grupo '{nome_grupo_escolhido}' em ordem alfanumérica: {alterados} grupo(s) alterado(s).")
@@ -1,6 +1,23 @@
 from qgis.core import QgsCategorizedSymbolRenderer
 from qgis.utils import iface
+from qgis.PyQt.QtWidgets import QFileDialog
+import os
 import re
+import sys
+
+# Permite importar os módulos auxiliares que ficam na mesma pasta
+try:
+    PASTA_SCRIPT = os.path.dirname(os.path.abspath(__file__))
+except NameError:
+    # O editor do console do QGIS nem sempre define __file__
+    PASTA_SCRIPT = QFileDialog.getExistingDirectory(
+        iface.mainWindow(),
+        "Selecione a pasta 'arvore de camadas' do codigos_qgis"
+    )
+if PASTA_SCRIPT not in sys.path:
+    sys.path.insert(0, PASTA_SCRIPT)
+
+from editar_renderer import reordenar_categorias
 
 # Camada ativa
 layer = iface.activeLayer()
@@ -13,9 +30,6 @@ renderer = layer.renderer()
 if not isinstance(renderer, QgsCategorizedSymbolRenderer):
     raise Exception("A camada ativa não usa simbologia Categorizada.")
 
-# Pega as categorias atuais
-cats = renderer.categories()
-
 # Função para fazer 'ordem natural' (BH_1, BH_2, ..., BH_10 etc.)
 def natural_key(cat):
     # Pode usar cat.label() ou cat.value(), escolha o que preferir
@@ -30,14 +44,8 @@ def natural_key(cat):
             out.append(p.lower())
     return out
 
-# Ordena as categorias
-cats_sorted = sorted(cats, key=natural_key)
-
-# Cria novo renderer categorizado, mantendo o mesmo campo da classificação
-new_renderer = QgsCategorizedSymbolRenderer(renderer.classAttribute(), cats_sorted)
-
-# Aplica na camada
-layer.setRenderer(new_renderer)
-layer.triggerRepaint()
+# Ordena as categorias no próprio renderer (moveCategory só nas que estão
+# fora do lugar; sem recriar o renderer nem clonar os símbolos)
+movidas = reordenar_categorias(layer, natural_key)
 
-print("Categorias reordenadas em ordem alfanumérica (natural).")
+print(f"Categorias reordenadas em ordem alfanumérica (natural): {movidas} movida(s).")
@@ -1,5 +1,50 @@
 from qgis.core import QgsField
 from qgis.PyQt.QtCore import QVariant
+from qgis.PyQt.QtWidgets import QFileDialog
+from qgis.utils import iface
+import os
+import sys
+
+# CONFIGURAÇÕES
+
+# Modo em lote (ver centroides_lote.py): lê só as geometrias, calcula os
+# centroides de uma vez (shapely 2, se instalado) e grava tudo direto no
+# provedor numa chamada, sem sessão de edição. Mais rápido em camadas
+# grandes, mas a gravação não pode ser desfeita com Ctrl+Z.
+# False = sessão de edição (as alterações passam pelo buffer de edição)
+MODO_LOTE = True
+
+# Chave da ordem gravada em ordem_lat / BH_legenda (ver ordenacao_espacial.py):
+# "latitude", "longitude", "distancia", "hilbert" ou "morton"
+CHAVE = "latitude"
+
+# Ponto (x, y) no SRC da camada para a chave "distancia"
+# None = centro da extensão dos centroides
+PONTO_REFERENCIA = None
+
+# False -> crescente (na latitude: de sul para norte)
+# True  -> decrescente (na latitude: de norte para sul)
+DESCENDENTE = False
+
+# Permite importar os módulos auxiliares que ficam na mesma pasta
+try:
+    PASTA_SCRIPT = os.path.dirname(os.path.abspath(__file__))
+except NameError:
+    # O editor do console do QGIS nem sempre define __file__
+    PASTA_SCRIPT = QFileDialog.getExistingDirectory(
+        iface.mainWindow(),
+        "Selecione a pasta 'arvore de camadas' do codigos_qgis"
+    )
+if PASTA_SCRIPT not in sys.path:
+    sys.path.insert(0, PASTA_SCRIPT)
+
+# Módulos compartilhados entre as pastas (comum/)
+PASTA_COMUM = os.path.join(os.path.dirname(PASTA_SCRIPT), "comum")
+if PASTA_COMUM not in sys.path:
+    sys.path.insert(0, PASTA_COMUM)
+
+from centroides_lote import centroides, gravar_lote, TEM_SHAPELY
+from ordenacao_espacial import ordenar
 
 # 1. Pega a camada ativa (selecionada no painel de camadas)
 layer = iface.activeLayer()
@@ -12,8 +57,8 @@ if not layer.isSpatial():
 
 print(f"Camada ativa: {layer.name()}")
 
-# 3. Tenta colocar em modo de edição
-if not layer.isEditable():
+# 3. Tenta colocar em modo de edição (no modo em lote a gravação vai direto ao provedor)
+if not MODO_LOTE and not layer.isEditable():
     ok = layer.startEditing()
     if not ok:
         raise Exception(
@@ -60,39 +105,38 @@ if idx_lat == -1 or idx_ordem == -1 or idx_leg == -1:
 
 print(f"Índices -> lat: {idx_lat}, ordem: {idx_ordem}, legenda: {idx_leg}")
 
-# 7. Monta lista (fid, latitude)
-lista = []
-for feat in layer.getFeatures():
-    geom = feat.geometry()
-    if geom is None or geom.isEmpty():
-        continue
-    centro = geom.centroid().asPoint()
-    lat = centro.y()
-    lista.append((feat.id(), lat))
-
-if not lista:
+# 7. Centroides (só as geometrias; nenhum atributo é lido)
+fids, xs, lats = centroides(layer)
+
+if not fids.size:
     raise Exception("Nenhuma feição com geometria válida foi encontrada.")
 
-print(f"Total de feições consideradas: {len(lista)}")
-
-# 8. Ordena pela latitude
-# reverse=False -> de sul para norte (lat menor para maior)
-# reverse=True  -> de norte para sul (lat maior para menor)
-lista_ordenada = sorted(lista, key=lambda x: x[1], reverse=False)
-
-# 9. Atualiza atributos com ordem e rótulo BHxx
-for i, (fid, lat) in enumerate(lista_ordenada, start=1):
-    layer.changeAttributeValue(fid, idx_lat, float(lat))
-    layer.changeAttributeValue(fid, idx_ordem, int(i))
-    bh_label = f"BH{i:02d}"  # BH01, BH02, ...
-    layer.changeAttributeValue(fid, idx_leg, bh_label)
-
-# 10. Tenta salvar as alterações
-if not layer.commitChanges():
-    # Se der problema ao salvar, imprime os erros
-    print("Não foi possível salvar as alterações. Erros:")
-    for err in layer.commitErrors():
-        print(err)
-    raise Exception("Falha ao salvar alterações na camada.")
+print(f"Total de feições consideradas: {fids.size} (centroides via {'shapely' if TEM_SHAPELY else 'QgsGeometry'})")
+
+# 8. Ordena pela chave escolhida (estável: empates mantêm a ordem das feições)
+ordem = ordenar(xs, lats, CHAVE, DESCENDENTE, ponto=PONTO_REFERENCIA)
+print(f"Ordem por {CHAVE}{' (decrescente)' if DESCENDENTE else ''}.")
+
+# 9. Valores de cada feição: latitude, ordem e rótulo BHxx (BH01, BH02, ...)
+valores = {
+    int(fids[j]): {idx_lat: float(lats[j]), idx_ordem: i, idx_leg: f"BH{i:02d}"}
+    for i, j in enumerate(ordem, start=1)
+}
+
+# 10. Grava
+if MODO_LOTE:
+    gravar_lote(layer, valores)
+    print("Campos lat_centro, ordem_lat e BH_legenda gravados em lote com sucesso.")
 else:
-    print("Campos lat_centro, ordem_lat e BH_legenda atualizados e salvos com sucesso.")
+    # Uma chamada por feição (em vez de uma por campo)
+    for fid, atributos in valores.items():
+        layer.changeAttributeValues(fid, atributos)
+
+    if not layer.commitChanges():
+        # Se der problema ao salvar, imprime os erros
+        print("Não foi possível salvar as alterações. Erros:")
+        for err in layer.commitErrors():
+            print(err)
+        raise Exception("Falha ao salvar alterações na camada.")
+    else:
+        print("Campos lat_centro, ordem_lat e BH_legenda atualizados e salvos com sucesso.")
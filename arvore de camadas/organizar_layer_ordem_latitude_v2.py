@@ -1,6 +1,45 @@
 from qgis.utils import iface
 from qgis.core import QgsProject
-from qgis.PyQt.QtWidgets import QInputDialog
+from qgis.PyQt.QtWidgets import QInputDialog, QFileDialog
+import os
+import sys
+
+# Permite importar os módulos auxiliares que ficam na mesma pasta
+try:
+    PASTA_SCRIPT = os.path.dirname(os.path.abspath(__file__))
+except NameError:
+    # O editor do console do QGIS nem sempre define __file__
+    PASTA_SCRIPT = QFileDialog.getExistingDirectory(
+        iface.mainWindow(),
+        "Selecione a pasta 'arvore de camadas' do codigos_qgis"
+    )
+if PASTA_SCRIPT not in sys.path:
+    sys.path.insert(0, PASTA_SCRIPT)
+
+# Módulos compartilhados entre as pastas (comum/)
+PASTA_COMUM = os.path.join(os.path.dirname(PASTA_SCRIPT), "comum")
+if PASTA_COMUM not in sys.path:
+    sys.path.insert(0, PASTA_COMUM)
+
+from ordenacao_espacial import ordenar
+from reordenar_arvore import nos_das_camadas, reordenar
+from cache_extensao import centros_camadas
+
+# CONFIGURAÇÕES
+
+# True: recalcula as extensões de todas as camadas (ignora o cache; útil
+# depois de alterar dados em PostGIS / camadas virtuais, cujo cache só
+# expira depois de cache_extensao.VALIDADE_SEM_ARQUIVO)
+LIMPAR_CACHE_EXTENSAO = False
+
+# Opções do diálogo -> chave do ordenacao_espacial
+CHAVES_DIALOGO = {
+    "Latitude": "latitude",
+    "Longitude": "longitude",
+    "Distância ao centro do mapa": "distancia",
+    "Curva de Hilbert (vizinhas juntas)": "hilbert",
+    "Curva Z / Morton (vizinhas juntas)": "morton",
+}
 
 proj = QgsProject.instance()
 root = proj.layerTreeRoot()
@@ -17,12 +56,26 @@ if not ok or not prefixo.strip():
 
 prefixo = prefixo.strip()
 
-# 2. Pede ao usuário se a ordenação será ascendente ou descendente
+# 2. Pede a chave de ordenação e se será ascendente ou descendente
+nome_chave, ok_chave = QInputDialog.getItem(
+    iface.mainWindow(),
+    "Chave de ordenação",
+    "Ordenar as camadas pelo centro da extensão, por:",
+    list(CHAVES_DIALOGO),
+    0,          # índice padrão (Latitude)
+    False       # não permite edição livre do texto
+)
+
+if not ok_chave:
+    raise Exception("Operação cancelada na escolha da chave.")
+
+chave = CHAVES_DIALOGO[nome_chave]
+
 opcoes_ordem = ["Ascendente (sul → norte)", "Descendente (norte → sul)"]
 ordem_escolhida, ok2 = QInputDialog.getItem(
     iface.mainWindow(),
-    "Ordem de latitude",
-    "Escolha a ordem de latitude:",
+    "Ordem",
+    "Escolha a ordem (na latitude: sul → norte ou norte → sul):",
     opcoes_ordem,
     0,          # índice padrão (Ascendente)
     False       # não permite edição livre do texto
@@ -31,11 +84,8 @@ ordem_escolhida, ok2 = QInputDialog.getItem(
 if not ok2:
     raise Exception("Operação cancelada na escolha da ordem.")
 
-# Define se será reverse ou não no sorted()
-if "Ascendente" in ordem_escolhida:
-    reverse_flag = False   # sul → norte (lat menor para maior)
-else:
-    reverse_flag = True    # norte → sul (lat maior para menor)
+# Descendente inverte a ordem da chave
+descendente = "Descendente" in ordem_escolhida
 
 # 3. Seleciona as camadas cujo nome começa com o prefixo informado
 layers = [
@@ -48,31 +98,35 @@ if not layers:
 
 print(f"{len(layers)} camadas encontradas com prefixo '{prefixo}'.")
 
-# 4. Cria lista (layer, latitude do centro da extensão)
-layer_lat = []
-for layer in layers:
-    ext = layer.extent()
-    centro = ext.center()
-    lat = centro.y()
-    layer_lat.append((layer, lat))
-
-# 5. Ordena pela latitude conforme escolha do usuário
-layer_lat_sorted = sorted(layer_lat, key=lambda x: x[1], reverse=reverse_flag)
-
-# Atenção:
-# Vamos inserir SEMPRE na posição 0, então o último inserido fica no topo.
-# Para que a ordem final no painel acompanhe a lista 'layer_lat_sorted',
-# vamos iterar sobre ela em ordem inversa.
-layer_lat_sorted_reverse = list(reversed(layer_lat_sorted))
-
-# 6. Reorganiza as camadas existentes no painel de camadas
-for lyr, _ in layer_lat_sorted_reverse:
-    node = root.findLayer(lyr.id())
-    if not node:
-        continue
-    parent = node.parent()          # mantém o grupo original
-    clone = node.clone()            # faz um clone do nó
-    parent.insertChildNode(0, clone)  # insere o clone no topo do grupo
-    parent.removeChildNode(node)      # remove o nó original (que será deletado)
-
-print(f"Camadas reorganizadas pela latitude ({ordem_escolhida}).")
+# 4. Centro da extensão de cada camada, no SRC do projeto (camadas em SRCs
+#    diferentes precisam estar no mesmo sistema para serem comparadas).
+#    As extensões vêm do cache / metadados do arquivo (ver cache_extensao.py)
+xs, ys, cache = centros_camadas(layers, proj.crs(), proj, limpar=LIMPAR_CACHE_EXTENSAO)
+print(
+    f"Extensões: {cache.acertos} do cache, {cache.metadados} dos metadados do arquivo, "
+    f"{cache.calculadas} calculadas."
+)
+
+sem_extensao = [l.name() for l, x in zip(layers, xs) if x is None]
+if sem_extensao:
+    print(f"Camadas sem extensão válida (ficam fora da ordenação): {', '.join(sem_extensao)}")
+    validos = [i for i, x in enumerate(xs) if x is not None]
+    layers = [layers[i] for i in validos]
+    xs = [xs[i] for i in validos]
+    ys = [ys[i] for i in validos]
+
+# 5. Ordena pela chave conforme escolha do usuário
+ponto = None
+if chave == "distancia":
+    centro_mapa = iface.mapCanvas().center()
+    ponto = (centro_mapa.x(), centro_mapa.y())
+
+camadas_ordenadas = [layers[i] for i in ordenar(xs, ys, chave, descendente, ponto=ponto)]
+
+# 6. Reorganiza as camadas no painel de camadas: dentro de cada grupo, as
+#    camadas encontradas vão para o topo na ordem calculada (uma operação
+#    por grupo, com o mapa congelado e um redesenho só no final)
+nos = nos_das_camadas(camadas_ordenadas, root)
+grupos_alterados = reordenar(nos, no_topo=True)
+
+print(f"Camadas reorganizadas por {nome_chave.lower()} ({ordem_escolhida}); {grupos_alterados} grupo(s) alterado(s).")
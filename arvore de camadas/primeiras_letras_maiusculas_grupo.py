@@ -1,54 +1,37 @@
-import re
+import os
+import sys
+from functools import lru_cache
 from qgis.PyQt.QtCore import Qt
-from qgis.PyQt.QtWidgets import QDialog, QVBoxLayout, QListWidget, QPushButton, QLabel, QListWidgetItem
-from qgis.core import (
-    QgsProject,
-    QgsLayerTreeGroup,
-    QgsCategorizedSymbolRenderer,
-    QgsGraduatedSymbolRenderer,
-    QgsRuleBasedRenderer,
-    QgsRendererCategory,
-    QgsRendererRange
+from qgis.PyQt.QtWidgets import (
+    QDialog, QVBoxLayout, QListWidget, QPushButton, QLabel, QListWidgetItem, QFileDialog
 )
+from qgis.utils import iface
+from qgis.core import QgsProject
+
+# Permite importar os módulos auxiliares que ficam na mesma pasta
+try:
+    PASTA_SCRIPT = os.path.dirname(os.path.abspath(__file__))
+except NameError:
+    # O editor do console do QGIS nem sempre define __file__
+    PASTA_SCRIPT = QFileDialog.getExistingDirectory(
+        iface.mainWindow(),
+        "Selecione a pasta 'arvore de camadas' do codigos_qgis"
+    )
+if PASTA_SCRIPT not in sys.path:
+    sys.path.insert(0, PASTA_SCRIPT)
+
+from transformar_nomes import (
+    title_case_preservando_siglas, planejar, confirmar, aplicar, coletar_grupos
+)
+from editar_renderer import atualizar_rotulos
 
 
-def title_case_preservando_siglas(texto: str) -> str:
-    """
-    Coloca 'Primeira Letra Maiúscula' por palavra,
-    preservando siglas (2+ letras todas maiúsculas) e números.
-    """
-    if not texto:
-        return texto
-
-    tokens = re.split(r'(\s+)', texto.strip())
-    saida = []
-
-    for token in tokens:
-        if token.isspace() or token == '':
-            saida.append(token)
-            continue
-
-        nucleo = re.sub(r'^[^\wÀ-ÿ]+|[^\wÀ-ÿ]+$', '', token)
-
-        if len(nucleo) >= 2 and nucleo.isupper():
-            saida.append(token)
-            continue
-
-        if nucleo.isdigit() or (nucleo and nucleo[0].isdigit()):
-            saida.append(token)
-            continue
-
-        primeira = token[0].upper()
-        resto = token[1:].lower() if len(token) > 1 else ''
-        saida.append(primeira + resto)
-
-    return ''.join(saida)
-
-
+@lru_cache(maxsize=65536)
 def formatar_label_legenda(label_original: str) -> str:
     """
     Se tiver ' - ', mantém a parte 1 e formata a parte 2.
     Senão, formata tudo.
+    (Com cache: os mesmos rótulos se repetem entre camadas.)
     """
     if not label_original:
         return label_original
@@ -64,124 +47,57 @@ def formatar_label_legenda(label_original: str) -> str:
 
 def formatar_renderer_se_existir(layer) -> int:
     """
-    Formata rótulos internos do renderizador quando aplicável:
+    Formata rótulos internos do renderizador quando aplicável, no próprio
+    renderer (sem recriá-lo nem clonar símbolos; ver editar_renderer.py):
     - Categorizado: labels das categorias
     - Graduado: labels dos ranges
     - Rule-based: labels das regras
-    Retorna quantidade de itens de legenda alterados (aproximado).
+    Retorna quantidade de itens de legenda alterados.
     """
-    renderer = layer.renderer()
-    if not renderer:
+    if not layer.renderer():
         return 0
+    return atualizar_rotulos(layer, formatar_label_legenda, repintar=False)
+
 
-    alterados = 0
-
-    # 1) Categorizado
-    if isinstance(renderer, QgsCategorizedSymbolRenderer):
-        novas = []
-        for cat in renderer.categories():
-            novo_label = formatar_label_legenda(cat.label())
-            novas.append(QgsRendererCategory(cat.value(), cat.symbol().clone(), novo_label))
-            if novo_label != cat.label():
-                alterados += 1
-
-        novo_renderer = QgsCategorizedSymbolRenderer(renderer.classAttribute(), novas)
-        layer.setRenderer(novo_renderer)
-        return alterados
-
-    # 2) Graduado
-    if isinstance(renderer, QgsGraduatedSymbolRenderer):
-        novos_ranges = []
-        for r in renderer.ranges():
-            novo_label = formatar_label_legenda(r.label())
-            novos_ranges.append(QgsRendererRange(r.lowerValue(), r.upperValue(), r.symbol().clone(), novo_label))
-            if novo_label != r.label():
-                alterados += 1
-
-        novo_renderer = QgsGraduatedSymbolRenderer(renderer.classAttribute(), novos_ranges)
-        novo_renderer.setMode(renderer.mode())
-        layer.setRenderer(novo_renderer)
-        return alterados
-
-    # 3) Rule-based
-    if isinstance(renderer, QgsRuleBasedRenderer):
-        root = renderer.rootRule()
-
-        def percorrer_regra(regra):
-            nonlocal alterados
-            if regra.label():
-                novo_label = formatar_label_legenda(regra.label())
-                if novo_label != regra.label():
-                    regra.setLabel(novo_label)
-                    alterados += 1
-            for filho in regra.children():
-                percorrer_regra(filho)
-
-        percorrer_regra(root)
-        layer.setRenderer(renderer)
-        return alterados
-
-    # Outros tipos (Single Symbol etc.) não têm uma lista clara de labels para mexer
-    return 0
-
-
-def listar_grupos_recursivo(grupo_raiz: QgsLayerTreeGroup, prefixo=''):
-    saida = []
-    for filho in grupo_raiz.children():
-        if isinstance(filho, QgsLayerTreeGroup):
-            caminho = f'{prefixo}{filho.name()}'
-            saida.append((filho, caminho))
-            saida.extend(listar_grupos_recursivo(filho, prefixo=f'{caminho} / '))
-    return saida
-
-
-def formatar_grupo_e_camadas(grupo_obj: QgsLayerTreeGroup) -> dict:
+def planejar_nomes(grupos_obj) -> list:
     """
-    Formata:
-    - nome do grupo
-    - nome de todas as camadas do grupo (inclui subgrupos)
-    - legendas internas do renderer quando existir
+    Nomes que mudam (o próprio grupo, subgrupos e camadas) de todos os
+    grupos escolhidos, numa passada por grupo. Grupos escolhidos que estão
+    um dentro do outro não geram a mesma alteração duas vezes.
     """
-    resultado = {
-        'grupos_renomeados': 0,
-        'camadas_renomeadas': 0,
-        'itens_legenda_alterados': 0,
-        'camadas_total': 0
-    }
-
-    # Renomeia o grupo selecionado
-    nome_grupo_original = grupo_obj.name()
-    nome_grupo_novo = title_case_preservando_siglas(nome_grupo_original)
-    if nome_grupo_novo != nome_grupo_original:
-        grupo_obj.setName(nome_grupo_novo)
-        resultado['grupos_renomeados'] += 1
-
-    # Renomeia camadas + renderizadores
-    for node_layer in grupo_obj.findLayers():
-        layer = node_layer.layer()
-        if not layer:
-            continue
-
-        resultado['camadas_total'] += 1
-
-        # 1) nome da camada (sempre)
-        nome_original = layer.name()
-        nome_novo = title_case_preservando_siglas(nome_original)
-        if nome_novo != nome_original:
-            layer.setName(nome_novo)
-            resultado['camadas_renomeadas'] += 1
-
-        # 2) labels de legenda (se existirem no renderer)
-        resultado['itens_legenda_alterados'] += formatar_renderer_se_existir(layer)
-
-        layer.triggerRepaint()
-
+    alteracoes = []
+    vistos = set()
+    for grupo_obj in grupos_obj:
+        for alt in planejar(grupo_obj, [title_case_preservando_siglas]):
+            chave = alt.no.layer().id() if alt.tipo == "camada" else id(alt.no)
+            if chave not in vistos:
+                vistos.add(chave)
+                alteracoes.append(alt)
+    return alteracoes
+
+
+def formatar_legendas(grupos_obj) -> dict:
+    """Legendas internas do renderer de cada camada dos grupos (uma vez por camada)."""
+    resultado = {'itens_legenda_alterados': 0, 'camadas_total': 0}
+    vistas = set()
+    for grupo_obj in grupos_obj:
+        for node_layer in grupo_obj.findLayers():
+            layer = node_layer.layer()
+            if not layer or layer.id() in vistas:
+                continue
+            vistas.add(layer.id())
+            resultado['camadas_total'] += 1
+            alterados = formatar_renderer_se_existir(layer)
+            if alterados:
+                resultado['itens_legenda_alterados'] += alterados
+                layer.emitStyleChanged()
+                layer.triggerRepaint()
     return resultado
 
 
 def abrir_dialogo_grupos():
     raiz = QgsProject.instance().layerTreeRoot()
-    grupos = listar_grupos_recursivo(raiz)
+    grupos = coletar_grupos(raiz)
 
     if not grupos:
         print('❌ Não encontrei grupos no projeto.')
@@ -213,21 +129,22 @@ def abrir_dialogo_grupos():
             dialogo.close()
             return
 
-        total_grupos = 0
-        total_camadas = 0
-        total_camadas_renomeadas = 0
-        total_itens_legenda = 0
+        grupos_obj = [item.data(Qt.UserRole) for item in itens]
 
-        for item in itens:
-            grupo_obj = item.data(Qt.UserRole)
-            res = formatar_grupo_e_camadas(grupo_obj)
+        # Nomes: prévia no console, confirmação e todos os setName de uma vez
+        alteracoes = planejar_nomes(grupos_obj)
+        if alteracoes and not confirmar(alteracoes, 'Primeiras letras maiúsculas'):
+            print('Nomes mantidos; só as legendas serão formatadas.')
+            alteracoes = []
+        aplicar(alteracoes)
 
-            total_grupos += res['grupos_renomeados']
-            total_camadas += res['camadas_total']
-            total_camadas_renomeadas += res['camadas_renomeadas']
-            total_itens_legenda += res['itens_legenda_alterados']
+        res = formatar_legendas(grupos_obj)
+        total_grupos = sum(alt.tipo == 'grupo' for alt in alteracoes)
+        total_camadas_renomeadas = len(alteracoes) - total_grupos
+        total_camadas = res['camadas_total']
+        total_itens_legenda = res['itens_legenda_alterados']
 
-        iface.layerTreeView().refreshLayerSymbology()
+        # A legenda de cada camada alterada já foi avisada (emitStyleChanged)
         print('✅ Processo finalizado.')
         print(f'📁 Grupos renomeados: {total_grupos}')
         print(f'🧱 Camadas no(s) grupo(s): {total_camadas}')
@@ -0,0 +1,42 @@
+from qgis.utils import iface
+from qgis.PyQt.QtWidgets import QFileDialog
+import os
+import sys
+
+# Permite importar os módulos auxiliares que ficam na mesma pasta
+try:
+    PASTA_SCRIPT = os.path.dirname(os.path.abspath(__file__))
+except NameError:
+    # O editor do console do QGIS nem sempre define __file__
+    PASTA_SCRIPT = QFileDialog.getExistingDirectory(
+        iface.mainWindow(),
+        "Selecione a pasta 'arvore de camadas' do codigos_qgis"
+    )
+if PASTA_SCRIPT not in sys.path:
+    sys.path.insert(0, PASTA_SCRIPT)
+
+from transformar_nomes import (
+    CAMADAS, GRUPOS, escolher_grupo, renomear,
+    maiusculas, minusculas, titulo, substituir, regex, numeracao
+)
+
+# CONFIGURAÇÕES
+
+# Transformações aplicadas em sequência a cada nome, numa passada só pela
+# árvore (em vez de rodar um script por transformação). Exemplos:
+#   [substituir("_", " "), titulo]
+#   [regex(r"\s+", " "), maiusculas]
+#   [numeracao("BH", 2)]          (só faz sentido com ALVOS = (CAMADAS,))
+PIPELINE = [substituir("_", " "), regex(r"\s+", " "), titulo]
+
+# O que renomear: CAMADAS e/ou GRUPOS
+ALVOS = (CAMADAS, GRUPOS)
+
+# False -> só os filhos diretos do grupo escolhido
+RECURSIVO = True
+
+grupo = escolher_grupo("Aplicar o PIPELINE de nomes em:")
+
+n = renomear(grupo, PIPELINE, alvos=ALVOS, recursivo=RECURSIVO, titulo_janela="Renomear árvore")
+
+print(f"{n} nome(s) alterado(s).")
@@ -1,56 +1,35 @@
-from qgis.core import QgsProject, QgsLayerTreeGroup
 from qgis.utils import iface
-from qgis.PyQt.QtWidgets import QInputDialog
+from qgis.PyQt.QtWidgets import QInputDialog, QFileDialog
+import os
+import sys
 
-root = QgsProject.instance().layerTreeRoot()
+# CONFIGURAÇÕES
 
-# -------------------------------------------------------------------
-# 1. Coletar todos os grupos existentes no projeto (em qualquer nível)
-# -------------------------------------------------------------------
-grupos = []
-
-def coletar_grupos(node):
-    if isinstance(node, QgsLayerTreeGroup):
-        grupos.append(node)
-        # percorre recursivamente subgrupos
-        for child in node.children():
-            if isinstance(child, QgsLayerTreeGroup):
-                coletar_grupos(child)
+# Dígitos do número (2 -> BH01, BH02...)
+DIGITOS = 2
 
-coletar_grupos(root)
+# Permite importar os módulos auxiliares que ficam na mesma pasta
+try:
+    PASTA_SCRIPT = os.path.dirname(os.path.abspath(__file__))
+except NameError:
+    # O editor do console do QGIS nem sempre define __file__
+    PASTA_SCRIPT = QFileDialog.getExistingDirectory(
+        iface.mainWindow(),
+        "Selecione a pasta 'arvore de camadas' do codigos_qgis"
+    )
+if PASTA_SCRIPT not in sys.path:
+    sys.path.insert(0, PASTA_SCRIPT)
 
-if not grupos:
-    raise Exception("Nenhum grupo encontrado no projeto.")
-
-nomes_grupos = [g.name() for g in grupos]
+from transformar_nomes import CAMADAS, escolher_grupo, numeracao, renomear
 
 # -------------------------------------------------------------------
-# 2. Caixa de diálogo para o usuário escolher o grupo
+# 1. Caixa de diálogo para o usuário escolher o grupo
 # -------------------------------------------------------------------
-nome_grupo_escolhido, ok_grp = QInputDialog.getItem(
-    iface.mainWindow(),
-    "Selecionar grupo",
-    "Escolha o grupo cujas camadas serão renomeadas:",
-    nomes_grupos,
-    0,      # índice padrão
-    False   # não permite digitar texto livre
-)
-
-if not ok_grp:
-    raise Exception("Operação cancelada na seleção do grupo.")
-
-# Encontra o objeto do grupo selecionado
-grupo_sel = None
-for g in grupos:
-    if g.name() == nome_grupo_escolhido:
-        grupo_sel = g
-        break
-
-if grupo_sel is None:
-    raise Exception(f"Grupo '{nome_grupo_escolhido}' não encontrado (isso não era para acontecer).")
+grupo_sel = escolher_grupo("Escolha o grupo cujas camadas serão renomeadas:", incluir_projeto=False)
+nome_grupo_escolhido = grupo_sel.name()
 
 # -------------------------------------------------------------------
-# 3. Caixa de diálogo para o prefixo
+# 2. Caixa de diálogo para o prefixo
 # -------------------------------------------------------------------
 prefixo, ok_pref = QInputDialog.getText(
     iface.mainWindow(),
@@ -64,17 +43,10 @@ if not ok_pref or not prefixo.strip():
 prefixo = prefixo.strip()
 
 # -------------------------------------------------------------------
-# 4. Pegar as camadas do grupo e renomear na ordem atual
+# 3. Renomear as camadas do grupo (inclusive subgrupos) na ordem atual
+#    do painel: prévia, confirmação e todos os nomes de uma vez
 # -------------------------------------------------------------------
-layer_nodes = grupo_sel.findLayers()
-
-print(f"Encontradas {len(layer_nodes)} camadas no grupo '{nome_grupo_escolhido}'.")
-
-for i, node in enumerate(layer_nodes, start=1):
-    layer = node.layer()
-    old_name = layer.name()
-    new_name = f"{prefixo}{str(i).zfill(2)}"  # ex.: BH01, BH02...
-    layer.setName(new_name)
-    print(f"Renomeado: {old_name} → {new_name}")
+n = renomear(grupo_sel, [numeracao(prefixo, DIGITOS)], alvos=(CAMADAS,),
+             titulo_janela="Renomear em ordem")
 
-print(f"\n{len(layer_nodes)} camadas do grupo '{nome_grupo_escolhido}' renomeadas com sucesso.")
+print(f"\n{n} camadas do grupo '{nome_grupo_escolhido}' renomeadas com sucesso.")
@@ -0,0 +1,147 @@
+"""
+Reordenação em lote do painel de camadas.
+
+Mover nó a nó (clone + insertChildNode + removeChildNode) dispara sinais
+do modelo da árvore, atualização da legenda e redesenho do mapa a cada
+camada: com centenas de camadas o QGIS trava por minutos. Aqui a ordem
+final de cada grupo é calculada antes e aplicada de uma vez por grupo:
+
+- os clones de todos os filhos, já na ordem nova, entram numa única
+  insertChildNodes no fim do grupo
+- os nós originais saem numa única removeChildren
+- o mapa fica congelado até o fim e é redesenhado uma vez só
+
+Os clones entram antes de os originais saírem: se o grupo ficasse vazio
+no meio do caminho, o QGIS tiraria as camadas do projeto. Grupos que já
+estão na ordem certa não são tocados. Os sinais da árvore não são
+bloqueados (o modelo do painel depende deles para não ficar
+inconsistente); o ganho vem de serem duas operações por grupo em vez de
+duas por camada.
+"""
+from qgis.core import QgsProject, QgsLayerTreeGroup
+
+
+def nos_das_camadas(layers, root=None):
+    """Nó da árvore de cada camada (uma busca só na árvore, não uma por camada)."""
+    root = root or QgsProject.instance().layerTreeRoot()
+    por_id = {}
+    for no in root.findLayers():
+        por_id.setdefault(no.layerId(), no)
+    return [por_id[layer.id()] for layer in layers if layer.id() in por_id]
+
+
+def aplicar_ordem(grupo, filhos):
+    """
+    Troca os filhos de 'grupo' por 'filhos' (os mesmos nós, em outra ordem)
+    em duas operações. Retorna False se a ordem já era essa.
+    """
+    atuais = grupo.children()
+    if len(filhos) != len(atuais) or {id(n) for n in filhos} != {id(n) for n in atuais}:
+        raise Exception(f"A nova ordem do grupo '{grupo.name()}' não tem os mesmos filhos do grupo.")
+    if all(a is b for a, b in zip(atuais, filhos)):
+        return False
+
+    n = len(atuais)
+    grupo.insertChildNodes(n, [no.clone() for no in filhos])
+    grupo.removeChildren(0, n)
+    return True
+
+
+def _por_grupo(nos):
+    """Agrupa os nós pelo grupo pai, mantendo a ordem de chegada."""
+    grupos = {}
+    for no in nos:
+        pai = no.parent()
+        if pai is None:
+            continue
+        grupos.setdefault(id(pai), (pai, []))[1].append(no)
+    return list(grupos.values())
+
+
+def ordem_filhos(grupo, nos, no_topo=True):
+    """
+    Filhos de 'grupo' com 'nos' (filhos dele) na ordem dada.
+    - no_topo=True:  'nos' vão para o início do grupo, os demais depois
+      (como fazia o organizar_layer_ordem_latitude_v2.py)
+    - no_topo=False: 'nos' trocam de lugar entre si, nas posições que já
+      ocupavam; os demais filhos não se mexem
+    """
+    mover = {id(n) for n in nos}
+    if no_topo:
+        return list(nos) + [n for n in grupo.children() if id(n) not in mover]
+    fila = iter(nos)
+    return [next(fila) if id(n) in mover else n for n in grupo.children()]
+
+
+def _congelar(canvas, congelar):
+    if canvas is not None:
+        canvas.freeze(congelar)
+
+
+def _canvas_padrao():
+    try:
+        from qgis.utils import iface
+        return iface.mapCanvas() if iface else None
+    except ImportError:
+        return None
+
+
+def _profundidade(no):
+    n = 0
+    while no.parent() is not None:
+        no = no.parent()
+        n += 1
+    return n
+
+
+def aplicar_varios(ordens, canvas=None):
+    """
+    Aplica [(grupo, filhos)] com o mapa congelado e um redesenho no final.
+    Os grupos mais fundos vão primeiro: reordenar um grupo troca os filhos
+    por clones, e um subgrupo ainda pendente deixaria de existir.
+    Os nós originais são apagados: não use mais as referências antigas.
+    Retorna quantos grupos mudaram.
+    """
+    ordens = sorted(ordens, key=lambda par: _profundidade(par[0]), reverse=True)
+    canvas = canvas or _canvas_padrao()
+    _congelar(canvas, True)
+    try:
+        alterados = sum(aplicar_ordem(grupo, filhos) for grupo, filhos in ordens)
+    finally:
+        _congelar(canvas, False)
+    if canvas is not None and alterados:
+        canvas.refresh()
+    return alterados
+
+
+def reordenar(nos, no_topo=True, canvas=None):
+    """
+    Põe os nós na ordem da lista, cada um dentro do seu próprio grupo.
+    Retorna quantos grupos mudaram.
+    """
+    return aplicar_varios(
+        [(grupo, ordem_filhos(grupo, filhos, no_topo)) for grupo, filhos in _por_grupo(nos)],
+        canvas
+    )
+
+
+def ordenar_grupo(grupo, chave, reverso=False, recursivo=False, canvas=None):
+    """
+    Ordena os filhos de 'grupo' por chave(no) (ex.: nome, para ordem
+    alfabética). Com recursivo=True ordena também os subgrupos.
+    Retorna quantos grupos mudaram.
+    """
+    grupos = []
+
+    def coletar(g):
+        grupos.append(g)
+        if recursivo:
+            for filho in g.children():
+                if isinstance(filho, QgsLayerTreeGroup):
+                    coletar(filho)
+
+    coletar(grupo)
+    return aplicar_varios(
+        [(g, sorted(g.children(), key=chave, reverse=reverso)) for g in grupos],
+        canvas
+    )
@@ -1,33 +1,32 @@
 # -*- coding: utf-8 -*-
-from qgis.core import QgsProject, QgsLayerTreeGroup, QgsLayerTreeLayer
+from qgis.utils import iface
+from qgis.PyQt.QtWidgets import QFileDialog
+import os
+import sys
 
-root = QgsProject.instance().layerTreeRoot()
+# CONFIGURAÇÕES
 
-def renomear_no(no):
-    # Se for GRUPO
-    if isinstance(no, QgsLayerTreeGroup):
-        nome_antigo = no.name()
-        nome_novo = nome_antigo.replace("_", " ")
-        if nome_antigo != nome_novo:
-            no.setName(nome_novo)
-            print(f"✔ Grupo renomeado: {nome_antigo} -> {nome_novo}")
+# Texto procurado e o que entra no lugar
+ANTIGO = "_"
+NOVO = " "
 
-        # Chamar recursivamente para filhos
-        for filho in no.children():
-            renomear_no(filho)
+# Permite importar os módulos auxiliares que ficam na mesma pasta
+try:
+    PASTA_SCRIPT = os.path.dirname(os.path.abspath(__file__))
+except NameError:
+    # O editor do console do QGIS nem sempre define __file__
+    PASTA_SCRIPT = QFileDialog.getExistingDirectory(
+        iface.mainWindow(),
+        "Selecione a pasta 'arvore de camadas' do codigos_qgis"
+    )
+if PASTA_SCRIPT not in sys.path:
+    sys.path.insert(0, PASTA_SCRIPT)
 
-    # Se for CAMADA
-    elif isinstance(no, QgsLayerTreeLayer):
-        layer = no.layer()
-        if layer:
-            nome_antigo = layer.name()
-            nome_novo = nome_antigo.replace("_", " ")
-            if nome_antigo != nome_novo:
-                layer.setName(nome_novo)
-                print(f"✔ Camada renomeada: {nome_antigo} -> {nome_novo}")
+from transformar_nomes import escolher_grupo, renomear, substituir
 
-# Executar para todos os itens da raiz
-for item in root.children():
-    renomear_no(item)
+# Grupos e camadas do grupo escolhido (ou do projeto inteiro), em todos os níveis
+grupo = escolher_grupo(f"Substituir '{ANTIGO}' por '{NOVO}' nos nomes de:")
 
-print("\n✓ Concluído! Todos os '_' foram substituídos por espaços.")
+n = renomear(grupo, [substituir(ANTIGO, NOVO)], titulo_janela="Substituir underscore")
+
+print(f"\n✓ Concluído! {n} nome(s) com '{ANTIGO}' trocado por '{NOVO}'.")
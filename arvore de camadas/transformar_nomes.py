@@ -0,0 +1,243 @@
+"""
+Renomeação do painel de camadas numa passada só.
+
+Os scripts de nomes (caixa alta/baixa, underscore, primeiras letras
+maiúsculas, numeração) usam este módulo: a árvore é percorrida uma vez e
+cada nome passa por uma sequência (pipeline) de transformações, por
+exemplo [substituir("_", " "), titulo] ou [maiusculas].
+
+Fluxo:
+1. planejar(): percorre a árvore e calcula só o que muda (nada é renomeado)
+2. mostrar_diff(): imprime "antigo -> novo" (prévia / dry-run)
+3. aplicar(): faz todos os setName com o painel de camadas sem redesenhar
+   até o fim
+
+Os sinais de nome não são bloqueados: é por eles que o nó da árvore
+acompanha o nome da camada. O que fica suspenso é o redesenho do painel.
+
+Transformações são funções texto -> texto; numeracao() cria uma que
+numera na ordem em que os nós aparecem no painel.
+"""
+import re
+
+from qgis.core import QgsProject, QgsLayerTreeGroup, QgsLayerTreeLayer
+
+# titulo: 'Primeira Letra Maiúscula' com siglas e partículas (ver formatar_titulo.py)
+from formatar_titulo import FormatadorTitulo, titulo, title_case_preservando_siglas
+
+# Alvos possíveis de uma renomeação
+CAMADAS = "camadas"
+GRUPOS = "grupos"
+
+
+# TRANSFORMAÇÕES
+
+def maiusculas(nome):
+    return nome.upper()
+
+
+def minusculas(nome):
+    return nome.lower()
+
+
+def substituir(antigo, novo):
+    """Troca de texto simples (ex.: substituir("_", " "))."""
+    def transformar(nome):
+        return nome.replace(antigo, novo)
+    return transformar
+
+
+def regex(padrao, troca, flags=0):
+    """re.sub com o padrão compilado uma vez."""
+    compilado = re.compile(padrao, flags)
+
+    def transformar(nome):
+        return compilado.sub(troca, nome)
+    return transformar
+
+
+def numeracao(prefixo, digitos=2, inicio=1):
+    """
+    Nome novo = prefixo + número sequencial (BH01, BH02...), na ordem do
+    painel. O nome antigo é descartado.
+    """
+    contador = [inicio]
+
+    def transformar(nome):
+        novo = f"{prefixo}{str(contador[0]).zfill(digitos)}"
+        contador[0] += 1
+        return novo
+    return transformar
+
+
+def compor(transformacoes):
+    """Uma transformação que aplica as da lista em sequência."""
+    transformacoes = list(transformacoes)
+
+    def transformar(nome):
+        for t in transformacoes:
+            nome = t(nome)
+        return nome
+    return transformar
+
+
+# PERCURSO E APLICAÇÃO
+
+class Alteracao:
+    """Um nome que vai mudar: nó, tipo ("camada"/"grupo"), antigo e novo."""
+
+    def __init__(self, no, tipo, antigo, novo):
+        self.no = no
+        self.tipo = tipo
+        self.antigo = antigo
+        self.novo = novo
+
+    def aplicar(self):
+        if self.tipo == "grupo":
+            self.no.setName(self.novo)
+        else:
+            self.no.layer().setName(self.novo)
+
+
+def planejar(raiz, transformacoes, alvos=(CAMADAS, GRUPOS), recursivo=True, incluir_raiz=True):
+    """
+    Percorre 'raiz' (grupo do painel) em ordem de exibição e devolve a
+    lista de Alteracao, só com os nomes que mudam.
+    - transformacoes: função ou lista de funções (aplicadas em sequência)
+    - alvos: CAMADAS e/ou GRUPOS
+    - recursivo=False: só os filhos diretos de 'raiz'
+    - incluir_raiz: renomeia também o próprio grupo 'raiz' (nunca a raiz do projeto)
+    Uma camada que aparece em mais de um nó é considerada uma vez só.
+    """
+    transformar = compor(transformacoes) if isinstance(transformacoes, (list, tuple)) else transformacoes
+    alteracoes = []
+    vistas = set()
+
+    def visitar(no, nivel):
+        if isinstance(no, QgsLayerTreeGroup):
+            eh_raiz_projeto = no.parent() is None
+            if GRUPOS in alvos and not eh_raiz_projeto and (nivel > 0 or incluir_raiz):
+                novo = transformar(no.name())
+                if novo != no.name():
+                    alteracoes.append(Alteracao(no, "grupo", no.name(), novo))
+            if nivel == 0 or recursivo:
+                for filho in no.children():
+                    visitar(filho, nivel + 1)
+
+        elif isinstance(no, QgsLayerTreeLayer) and CAMADAS in alvos:
+            layer = no.layer()
+            if layer is None or layer.id() in vistas:
+                return
+            vistas.add(layer.id())
+            novo = transformar(layer.name())
+            if novo != layer.name():
+                alteracoes.append(Alteracao(no, "camada", layer.name(), novo))
+
+    visitar(raiz, 0)
+    return alteracoes
+
+
+def mostrar_diff(alteracoes, limite=None):
+    """Imprime a prévia das alterações (até 'limite' linhas)."""
+    if not alteracoes:
+        print("Nenhum nome muda.")
+        return
+    for alt in alteracoes[:limite]:
+        print(f"  {alt.tipo:<6}  {alt.antigo}  →  {alt.novo}")
+    if limite is not None and len(alteracoes) > limite:
+        print(f"  ... e mais {len(alteracoes) - limite}")
+    grupos = sum(alt.tipo == "grupo" for alt in alteracoes)
+    print(f"{len(alteracoes) - grupos} camada(s) e {grupos} grupo(s) a renomear.")
+
+
+def aplicar(alteracoes, view=None):
+    """
+    Faz todos os setName com o painel de camadas sem redesenhar até o fim.
+    Retorna quantos nomes foram alterados.
+    """
+    if view is None:
+        try:
+            from qgis.utils import iface
+            view = iface.layerTreeView() if iface else None
+        except ImportError:
+            view = None
+
+    if view is not None:
+        view.setUpdatesEnabled(False)
+    try:
+        for alt in alteracoes:
+            alt.aplicar()
+    finally:
+        if view is not None:
+            view.setUpdatesEnabled(True)
+    return len(alteracoes)
+
+
+def confirmar(alteracoes, titulo_janela="Renomear camadas", limite=40):
+    """Mostra a prévia no console e pergunta se aplica. Retorna True/False."""
+    from qgis.PyQt.QtWidgets import QMessageBox
+    from qgis.utils import iface
+
+    mostrar_diff(alteracoes, limite)
+    if not alteracoes:
+        return False
+    linhas = [f"{alt.antigo}  →  {alt.novo}" for alt in alteracoes[:15]]
+    if len(alteracoes) > 15:
+        linhas.append(f"... e mais {len(alteracoes) - 15} (lista no console)")
+    resposta = QMessageBox.question(
+        iface.mainWindow(),
+        titulo_janela,
+        f"{len(alteracoes)} nome(s) vão mudar:\n\n" + "\n".join(linhas) + "\n\nAplicar?",
+        QMessageBox.Yes | QMessageBox.No,
+        QMessageBox.Yes
+    )
+    return resposta == QMessageBox.Yes
+
+
+def renomear(raiz, transformacoes, alvos=(CAMADAS, GRUPOS), recursivo=True,
+             incluir_raiz=True, perguntar=True, titulo_janela="Renomear camadas"):
+    """planejar + prévia (+ confirmação) + aplicar. Retorna quantos nomes mudaram."""
+    alteracoes = planejar(raiz, transformacoes, alvos, recursivo, incluir_raiz)
+    if perguntar:
+        if not confirmar(alteracoes, titulo_janela):
+            print("Nada foi renomeado.")
+            return 0
+    else:
+        mostrar_diff(alteracoes)
+    return aplicar(alteracoes)
+
+
+def coletar_grupos(root=None):
+    """Todos os grupos do projeto (qualquer nível), com o caminho 'A / B / C'."""
+    root = root or QgsProject.instance().layerTreeRoot()
+    saida = []
+
+    def visitar(grupo, prefixo):
+        for filho in grupo.children():
+            if isinstance(filho, QgsLayerTreeGroup):
+                caminho = f"{prefixo}{filho.name()}"
+                saida.append((filho, caminho))
+                visitar(filho, f"{caminho} / ")
+
+    visitar(root, "")
+    return saida
+
+
+def escolher_grupo(texto, incluir_projeto=True):
+    """
+    Caixa de diálogo para escolher um grupo (ou o projeto inteiro).
+    Retorna o QgsLayerTreeGroup escolhido.
+    """
+    from qgis.PyQt.QtWidgets import QInputDialog
+    from qgis.utils import iface
+
+    root = QgsProject.instance().layerTreeRoot()
+    opcoes = ([(root, "(projeto inteiro)")] if incluir_projeto else []) + coletar_grupos(root)
+    if not opcoes:
+        raise Exception("Nenhum grupo encontrado no projeto.")
+
+    nomes = [caminho for _, caminho in opcoes]
+    escolhido, ok = QInputDialog.getItem(iface.mainWindow(), "Selecionar grupo", texto, nomes, 0, False)
+    if not ok:
+        raise Exception("Operação cancelada na seleção do grupo.")
+    return opcoes[nomes.index(escolhido)][0]
@@ -0,0 +1,12 @@
+"""
+Formatação de valores para mensagens e relatórios dos scripts.
+"""
+
+
+def formatar_bytes(n):
+    """Tamanho em bytes -> texto legível (ex.: '12.3 MB')."""
+    for unidade in ("B", "KB", "MB", "GB"):
+        if n < 1024:
+            return f"{n:.1f} {unidade}"
+        n /= 1024
+    return f"{n:.1f} TB"
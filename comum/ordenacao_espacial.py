@@ -0,0 +1,143 @@
+"""
+Ordenação espacial de pontos (centroides de feições ou centros de camadas).
+
+Usado pelo organizar_layer_ordem_latitude_v1.py (feições -> campos de
+ordem) e pelo organizar_layer_ordem_latitude_v2.py (camadas -> painel de
+camadas), na pasta 'arvore de camadas', e pelo gpkg_espacial.py (ordem
+das feições nos GPKGs), na pasta 'salvamento'. Só NumPy: as chaves são
+calculadas de uma vez sobre todos os pontos.
+
+Chaves (CHAVES):
+- "latitude":  y do ponto (sul -> norte)
+- "longitude": x do ponto (oeste -> leste)
+- "distancia": distância a um ponto de referência (perto -> longe)
+- "hilbert":   índice na curva de Hilbert
+- "morton":    índice na curva Z (Morton)
+
+As curvas percorrem uma grade de 2^bits x 2^bits células sobre a extensão
+dos pontos; pontos próximos no mapa ficam próximos na ordem (a de Hilbert
+preserva melhor a vizinhança, a de Morton é mais barata). Gravar as
+feições de um GPKG nessa ordem deixa as leituras por retângulo mais
+rápidas, porque feições vizinhas ficam nas mesmas páginas do arquivo.
+"""
+import numpy as np
+
+CHAVES = ("latitude", "longitude", "distancia", "hilbert", "morton")
+
+# Resolução das curvas: 2^16 células por eixo (o índice cabe em 32 bits)
+BITS_CURVA = 16
+
+
+def _extensao(x, y, extensao=None):
+    if extensao is not None:
+        return extensao
+    return float(x.min()), float(y.min()), float(x.max()), float(y.max())
+
+
+def quantizar(x, y, bits=BITS_CURVA, extensao=None):
+    """
+    Coordenadas -> células inteiras de uma grade 2^bits x 2^bits.
+    - extensao: (xmin, ymin, xmax, ymax); None = extensão dos próprios pontos
+    """
+    if not 1 <= bits <= 31:
+        raise Exception(f"bits deve estar entre 1 e 31 (recebido: {bits}).")
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    xmin, ymin, xmax, ymax = _extensao(x, y, extensao)
+    ultimo = (1 << bits) - 1
+
+    def eixo(v, menor, maior):
+        largura = maior - menor
+        if largura <= 0:
+            return np.zeros(v.shape, dtype=np.int64)
+        return np.clip(((v - menor) / largura * ultimo).round(), 0, ultimo).astype(np.int64)
+
+    return eixo(x, xmin, xmax), eixo(y, ymin, ymax)
+
+
+def _espalhar_bits(v):
+    """Intercala zeros entre os bits de v (até 32 bits -> 64 bits)."""
+    v = v.astype(np.uint64) & np.uint64(0xFFFFFFFF)
+    for deslocamento, mascara in (
+        (16, 0x0000FFFF0000FFFF),
+        (8, 0x00FF00FF00FF00FF),
+        (4, 0x0F0F0F0F0F0F0F0F),
+        (2, 0x3333333333333333),
+        (1, 0x5555555555555555),
+    ):
+        v = (v | (v << np.uint64(deslocamento))) & np.uint64(mascara)
+    return v
+
+
+def indice_morton(x, y, bits=BITS_CURVA, extensao=None):
+    """Índice na curva Z: bits de x e y intercalados."""
+    cx, cy = quantizar(x, y, bits, extensao)
+    return _espalhar_bits(cx) | (_espalhar_bits(cy) << np.uint64(1))
+
+
+def indice_hilbert(x, y, bits=BITS_CURVA, extensao=None):
+    """
+    Índice na curva de Hilbert (algoritmo xy2d clássico, vetorizado: um
+    passo por bit, sobre todos os pontos ao mesmo tempo).
+    """
+    cx, cy = quantizar(x, y, bits, extensao)
+    n = np.int64(1 << bits)
+    d = np.zeros(cx.shape, dtype=np.uint64)
+    s = n // 2
+    while s > 0:
+        rx = (cx & s) > 0
+        ry = (cy & s) > 0
+        d += np.uint64(s) * np.uint64(s) * ((3 * rx) ^ ry).astype(np.uint64)
+
+        # Gira o quadrante para a próxima escala
+        girar = ~ry
+        espelhar = girar & rx
+        cx = np.where(espelhar, n - 1 - cx, cx)
+        cy = np.where(espelhar, n - 1 - cy, cy)
+        cx, cy = np.where(girar, cy, cx), np.where(girar, cx, cy)
+        s //= 2
+    return d
+
+
+def chave_ordenacao(x, y, chave="latitude", ponto=None, bits=BITS_CURVA, extensao=None):
+    """
+    Valor usado para ordenar cada ponto.
+    - ponto: (x, y) de referência da chave "distancia";
+      None = centro da extensão dos pontos
+    - bits / extensao: grade das curvas "hilbert" e "morton"
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if x.shape != y.shape:
+        raise Exception("x e y devem ter o mesmo tamanho.")
+
+    if chave == "latitude":
+        return y
+    if chave == "longitude":
+        return x
+    if chave == "distancia":
+        if ponto is None:
+            xmin, ymin, xmax, ymax = _extensao(x, y)
+            ponto = ((xmin + xmax) / 2, (ymin + ymax) / 2)
+        return np.hypot(x - ponto[0], y - ponto[1])
+    if chave == "hilbert":
+        return indice_hilbert(x, y, bits, extensao)
+    if chave == "morton":
+        return indice_morton(x, y, bits, extensao)
+    raise Exception(f"Chave de ordenação desconhecida: '{chave}'. Use uma de {CHAVES}.")
+
+
+def ordenar(x, y, chave="latitude", descendente=False, **opcoes):
+    """
+    Posições dos pontos na ordem da chave (argsort estável: empates mantêm
+    a ordem de entrada, também no modo descendente).
+    As opções extras vão para chave_ordenacao (ponto, bits, extensao).
+    """
+    valores = chave_ordenacao(x, y, chave, **opcoes)
+    if not valores.size:
+        return np.zeros(0, dtype=np.int64)
+    if descendente:
+        # Posição invertida em vez de -valores: funciona também para uint64
+        _, valores = np.unique(valores, return_inverse=True)
+        valores = -valores.astype(np.int64)
+    return np.argsort(valores, kind="stable")
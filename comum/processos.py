@@ -0,0 +1,30 @@
+"""
+Lançamento de processos Python a partir do QGIS.
+
+Usado pela exportação paralela (salvamento/worker_exportacao.py) e pelo
+pool de blocos da hidrologia (processamento/hidrologia_blocos.py).
+"""
+import os
+import sys
+
+
+def executavel_python():
+    """
+    Caminho do interpretador Python para lançar os processos.
+    Dentro do QGIS o sys.executable costuma ser o próprio qgis(.exe).
+    """
+    nome = os.path.basename(sys.executable).lower()
+    if nome.startswith("python"):
+        return sys.executable
+
+    candidatos = [
+        os.path.join(sys.exec_prefix, "python.exe"),
+        os.path.join(sys.exec_prefix, "python3.exe"),
+        os.path.join(sys.exec_prefix, "bin", "python3"),
+        os.path.join(sys.exec_prefix, "bin", "python"),
+    ]
+    for caminho in candidatos:
+        if os.path.isfile(caminho):
+            return caminho
+
+    raise Exception("Não encontrei o executável do Python para lançar os processos.")
@@ -0,0 +1,252 @@
+"""
+Acumulação de fluxo e trechos de drenagem em NumPy a partir da direção D8.
+
+Substitui as saídas accumulation, drainage e stream do grass7:r.watershed
+quando a direção já existe (hidrologia_numpy.py). Sem recursão: é uma
+ordenação topológica (Kahn) sobre os índices achatados do raster:
+
+1. grau de entrada de cada célula = quantas células drenam para ela
+2. a frente começa com as células sem doadoras (divisores); cada passo
+   soma a acumulação da frente nas receptoras (np.add.at), tira 1 do grau
+   delas, e quem chegar a grau 0 entra na próxima frente
+
+Trechos: células com acumulação >= threshold. Um trecho começa numa
+nascente (nenhuma doadora de rio) ou logo abaixo de uma confluência (duas
+ou mais); o rótulo do trecho é o índice achatado da célula inicial + 1, o
+que não depende da ordem de processamento (o modo em blocos dá os mesmos
+rótulos).
+
+Para rasters maiores que a RAM, passe pasta_memmap: os arrays grandes
+viram np.memmap em disco e só as frentes ficam na memória.
+
+Memória por célula: direção uint8 (1) + grau de entrada uint8 (1) +
+nascente bool (1) + acumulação uint32 (4) = 7 bytes; com os trechos,
++ rótulo uint32 (4) + doadoras uint8 (1) = 12 bytes. O modo RAM do
+r.watershed usa ~31.
+
+Acumulação = número de células que drenam pela célula, incluindo ela
+mesma (como o accumulation do r.watershed, sem o sinal negativo de
+fluxo vindo de fora da região).
+"""
+import os
+import time
+
+import numpy as np
+
+from hidrologia_numpy import DESLOC_LINHA, DESLOC_COLUNA, NODATA_DIRECAO, LINHAS_POR_FAIXA
+
+# Máximo de células por frente processada de uma vez
+LOTE_FRENTE = 4 * 1024 * 1024
+
+BYTES_POR_CELULA = 7
+BYTES_POR_CELULA_TRECHOS = 5
+
+NODATA_ACUMULACAO = 0
+NODATA_TRECHO = 0
+
+
+def novo_array(forma, dtype, pasta_memmap=None, nome="array"):
+    """Array zerado na RAM ou, com pasta_memmap, em disco (np.memmap)."""
+    if pasta_memmap is None:
+        return np.zeros(forma, dtype=dtype)
+    os.makedirs(pasta_memmap, exist_ok=True)
+    caminho = os.path.join(pasta_memmap, f"{nome}_{os.getpid()}.dat")
+    return np.memmap(caminho, dtype=dtype, mode="w+", shape=forma)
+
+
+def receptores(indices, direcao_plana, largura, altura):
+    """
+    Célula para onde drena cada índice. Retorna (receptor, ok); ok=False
+    quando a água sai do raster ou cai em NoData.
+    """
+    codigo = direcao_plana[indices]
+    k = codigo % 8
+    linha = indices // largura + DESLOC_LINHA[k]
+    coluna = indices % largura + DESLOC_COLUNA[k]
+    ok = (codigo != NODATA_DIRECAO) & (linha >= 0) & (linha < altura) & (coluna >= 0) & (coluna < largura)
+    receptor = linha * largura + coluna
+    ok[ok] = direcao_plana[receptor[ok]] != NODATA_DIRECAO
+    return receptor, ok
+
+
+def _faixas(altura, largura):
+    """Intervalos de índices achatados, uma faixa de linhas por vez."""
+    for linha in range(0, altura, LINHAS_POR_FAIXA):
+        fim = min(altura, linha + LINHAS_POR_FAIXA)
+        yield linha * largura, fim * largura
+
+
+def acumular(direcao, pasta_memmap=None, entrada=None):
+    """
+    Acumulação (uint32) a partir da direção D8 em códigos GRASS.
+    - entrada: células que chegam de fora em cada célula (array da mesma
+      forma; usado pelo modo em blocos, hidrologia_blocos.py)
+    """
+    altura, largura = direcao.shape
+    n = altura * largura
+    direcao_plana = direcao.reshape(-1)
+
+    grau = novo_array(n, np.uint8, pasta_memmap, "grau")
+    nascente = novo_array(n, np.bool_, pasta_memmap, "nascente")
+    acumulacao = novo_array(n, np.uint32, pasta_memmap, "acumulacao")
+
+    for inicio, fim in _faixas(altura, largura):
+        indices = np.arange(inicio, fim, dtype=np.int64)
+        receptor, ok = receptores(indices, direcao_plana, largura, altura)
+        np.add.at(grau, receptor[ok], 1)
+        acumulacao[inicio:fim] = direcao_plana[inicio:fim] != NODATA_DIRECAO
+        if entrada is not None:
+            acumulacao[inicio:fim] += entrada.reshape(-1)[inicio:fim]
+
+    # Nascentes marcadas antes do Kahn: durante o Kahn o grau de células de
+    # faixas seguintes também chega a 0, e elas já entram pela frente da
+    # faixa que as alcançou (não podem ser semeadas de novo)
+    for inicio, fim in _faixas(altura, largura):
+        nascente[inicio:fim] = (grau[inicio:fim] == 0) & (direcao_plana[inicio:fim] != NODATA_DIRECAO)
+
+    # Kahn: a ordem entre frentes não importa, só que cada célula entre
+    # depois de todas as doadoras. As nascentes entram faixa por faixa,
+    # para a frente inicial não ocupar um array do tamanho do raster.
+    for inicio, fim in _faixas(altura, largura):
+        pilha = [inicio + np.flatnonzero(nascente[inicio:fim])]
+        while pilha:
+            frente = pilha.pop()
+            if frente.size > LOTE_FRENTE:
+                pilha.append(frente[LOTE_FRENTE:])
+                frente = frente[:LOTE_FRENTE]
+
+            receptor, ok = receptores(frente, direcao_plana, largura, altura)
+            doadora, receptor = frente[ok], receptor[ok]
+            if receptor.size == 0:
+                continue
+            np.add.at(acumulacao, receptor, acumulacao[doadora])
+            np.subtract.at(grau, receptor, 1)
+
+            prontas = receptor[grau[receptor] == 0]
+            if prontas.size:
+                pilha.append(np.unique(prontas))
+
+    return acumulacao.reshape(altura, largura)
+
+
+def extrair_trechos(direcao, acumulacao, threshold, pasta_memmap=None):
+    """
+    Rótulo do trecho (uint32) em cada célula de rio (acumulação >= threshold).
+    Rótulo = índice achatado da primeira célula do trecho + 1; 0 = não é rio.
+    """
+    altura, largura = direcao.shape
+    n = altura * largura
+    direcao_plana = direcao.reshape(-1)
+    acumulacao_plana = acumulacao.reshape(-1)
+
+    doadoras = novo_array(n, np.uint8, pasta_memmap, "doadoras")
+    rotulo = novo_array(n, np.uint32, pasta_memmap, "rotulo")
+
+    # Quantas células de rio drenam para cada célula (a jusante de rio é rio)
+    for inicio, fim in _faixas(altura, largura):
+        rio = inicio + np.flatnonzero(acumulacao_plana[inicio:fim] >= threshold)
+        receptor, ok = receptores(rio, direcao_plana, largura, altura)
+        np.add.at(doadoras, receptor[ok], 1)
+
+    # Começo de trecho: nascente (0 doadoras) ou abaixo de confluência (2+).
+    # Cada um desce até o próximo começo; quem tem 1 doadora herda o rótulo.
+    for inicio, fim in _faixas(altura, largura):
+        atual = inicio + np.flatnonzero(
+            (acumulacao_plana[inicio:fim] >= threshold) & (doadoras[inicio:fim] != 1)
+        )
+        valor = (atual + 1).astype(np.uint32)
+        rotulo[atual] = valor
+        while atual.size:
+            receptor, ok = receptores(atual, direcao_plana, largura, altura)
+            receptor, valor = receptor[ok], valor[ok]
+            segue = doadoras[receptor] == 1
+            atual, valor = receptor[segue], valor[segue]
+            rotulo[atual] = valor
+
+    return rotulo.reshape(altura, largura)
+
+
+def ler_direcao(caminho, pasta_memmap=None):
+    """Lê a direção em faixas (na RAM ou num memmap). Retorna (direcao, gt, proj)."""
+    from osgeo import gdal
+
+    gdal.UseExceptions()
+    ds = gdal.Open(caminho)
+    banda = ds.GetRasterBand(1)
+    largura, altura = ds.RasterXSize, ds.RasterYSize
+    nodata = banda.GetNoDataValue()
+
+    direcao = novo_array((altura, largura), np.uint8, pasta_memmap, "direcao")
+    for linha in range(0, altura, LINHAS_POR_FAIXA):
+        n = min(LINHAS_POR_FAIXA, altura - linha)
+        bloco = banda.ReadAsArray(0, linha, largura, n).astype(np.int64)
+        invalido = bloco == nodata if nodata is not None else np.zeros(bloco.shape, dtype=bool)
+        # Códigos negativos (saída pela borda no GRASS) valem como a direção
+        bloco = np.abs(bloco)
+        invalido |= (bloco < 1) | (bloco > 8)
+        bloco[invalido] = NODATA_DIRECAO
+        direcao[linha:linha + n] = bloco
+
+    geotransform, projecao = ds.GetGeoTransform(), ds.GetProjection()
+    ds = None
+    return direcao, geotransform, projecao
+
+
+def watershed(caminho_direcao, saidas, threshold=None, cfg=None, pasta_memmap=None):
+    """
+    Equivalente às saídas accumulation / drainage / stream do r.watershed.
+    - saidas: dict {parâmetro: caminho} só com as saídas desejadas
+    - threshold: obrigatório se 'stream' estiver em saidas
+    Retorna dict com os caminhos gravados e o tempo de cada parte.
+    """
+    desconhecidas = set(saidas) - {"accumulation", "drainage", "stream"}
+    if desconhecidas:
+        raise Exception(f"O motor numpy não gera: {sorted(desconhecidas)}")
+    if "stream" in saidas and not threshold:
+        raise Exception("A saída 'stream' precisa de threshold.")
+
+    tempos = {}
+    try:
+        _watershed(caminho_direcao, saidas, threshold, cfg, pasta_memmap, tempos)
+    finally:
+        if pasta_memmap:
+            limpar_memmaps(pasta_memmap)
+    return {"saidas": dict(saidas), "tempos": tempos}
+
+
+def limpar_memmaps(pasta_memmap):
+    """Apaga os arquivos de memmap deste processo (depois de soltar os arrays)."""
+    import gc
+
+    gc.collect()
+    sufixo = f"_{os.getpid()}.dat"
+    for nome in os.listdir(pasta_memmap):
+        if nome.endswith(sufixo):
+            try:
+                os.remove(os.path.join(pasta_memmap, nome))
+            except OSError:
+                pass
+
+
+def _watershed(caminho_direcao, saidas, threshold, cfg, pasta_memmap, tempos):
+    from hidrologia_numpy import gravar_raster
+
+    inicio = time.perf_counter()
+    direcao, geotransform, projecao = ler_direcao(caminho_direcao, pasta_memmap)
+    tempos["leitura"] = time.perf_counter() - inicio
+
+    if "drainage" in saidas:
+        gravar_raster(saidas["drainage"], np.asarray(direcao), geotransform, projecao, NODATA_DIRECAO, cfg)
+
+    inicio = time.perf_counter()
+    acumulacao = acumular(direcao, pasta_memmap)
+    tempos["acumulacao"] = time.perf_counter() - inicio
+    if "accumulation" in saidas:
+        gravar_raster(saidas["accumulation"], np.asarray(acumulacao), geotransform, projecao,
+                      NODATA_ACUMULACAO, cfg)
+
+    if "stream" in saidas:
+        inicio = time.perf_counter()
+        trechos = extrair_trechos(direcao, acumulacao, threshold, pasta_memmap)
+        tempos["trechos"] = time.perf_counter() - inicio
+        gravar_raster(saidas["stream"], np.asarray(trechos), geotransform, projecao, NODATA_TRECHO, cfg)
@@ -1,5 +1,5 @@
 # Script para substituir siglas de Köppen pelos nomes completos na legenda
-from qgis.core import QgsProject, QgsCategorizedSymbolRenderer, QgsRendererCategory
+from qgis.core import QgsProject, QgsCategorizedSymbolRenderer
 
 # Dicionário com a tradução das siglas para nomes completos
 KOPPEN_NAMES = {
@@ -63,40 +63,30 @@ def atualizar_legenda_koppen():
         print("❌ A camada não possui categorias!")
         return
 
-    novas_categorias = []
+    # Altera só o rótulo de cada categoria, no próprio renderer
+    # (sem criar um renderer novo nem clonar os símbolos)
+    categorias = renderer.categories()
+    alteradas = 0
 
-    for categoria in renderer.categories():
+    for i, categoria in enumerate(categorias):
         simbolo = categoria.value()
-        label_original = categoria.label()
 
         nome_completo = KOPPEN_NAMES.get(str(simbolo))
         if nome_completo:
-            nova_categoria = QgsRendererCategory(
-                simbolo,
-                categoria.symbol().clone(),
-                nome_completo
-            )
+            if categoria.label() != nome_completo:
+                renderer.updateCategoryLabel(i, nome_completo)
+                alteradas += 1
             print(f"Atualizado: {simbolo} → {nome_completo}")
         else:
-            nova_categoria = QgsRendererCategory(
-                simbolo,
-                categoria.symbol().clone(),
-                label_original
-            )
             print(f"Mantido: {simbolo} (não encontrado no dicionário)")
 
-        novas_categorias.append(nova_categoria)
-
-    novo_renderer = QgsCategorizedSymbolRenderer(
-        renderer.classAttribute(),
-        novas_categorias
-    )
-
-    layer.setRenderer(novo_renderer)
-    layer.triggerRepaint()
+    if alteradas:
+        layer.emitStyleChanged()
+        layer.triggerRepaint()
 
     print("\n✓ Legenda atualizada com sucesso!")
-    print("Categorias processadas:", len(novas_categorias))
+    print("Categorias processadas:", len(categorias))
+    print("Rótulos alterados:", alteradas)
 
 # Executa a função
 atualizar_legenda_koppen()
@@ -0,0 +1,143 @@
+"""
+Benchmark do preenchimento de depressões + D8: hidrologia_numpy.py contra
+o grass7:r.fill.dir.
+
+Gera MDEs sintéticos (SIRGAS 2000 / UTM 23S, relevo ondulado com ruído e
+depressões) e, opcionalmente, usa MDEs reais (--mde). Para cada MDE mede
+o tempo dos dois motores e compara as saídas:
+- MDE preenchido: diferença máxima e média
+- direção: % de células com o mesmo código GRASS (graus do r.fill.dir // 45)
+
+Os dois não são idênticos: o r.fill.dir preenche de forma iterativa e
+resolve planos do seu jeito, então espere direções diferentes dentro dos
+planos (depressões preenchidas) e iguais fora deles.
+
+Uso (Python do QGIS, ex.: OSGeo4W Shell com python-qgis):
+    python benchmark_filldir.py
+    python benchmark_filldir.py --tamanhos 1000 4000 --mde D:/mde/recorte.tif
+    python benchmark_filldir.py --sem-grass     # só o motor NumPy (sem QGIS)
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+from osgeo import gdal, osr
+
+from hidrologia_numpy import TEM_NUMBA, fill_dir, ler_mde
+
+gdal.UseExceptions()
+
+EPSG = 31983
+RESOLUCAO = 30.0
+NODATA = -9999
+
+
+def criar_mde_sintetico(caminho, n, semente=42):
+    """MDE n x n com rampa, ondulação, ruído e depressões circulares."""
+    rng = np.random.default_rng(semente)
+    y, x = np.mgrid[0:n, 0:n].astype(np.float32)
+    z = 500 + 0.02 * x + 0.015 * y
+    z += 25 * np.sin(x / (n / 12)) * np.cos(y / (n / 9))
+    z += rng.normal(0, 0.8, z.shape).astype(np.float32)
+    for _ in range(max(1, n // 50)):
+        ci, cj, r = rng.integers(0, n), rng.integers(0, n), rng.integers(3, max(4, n // 40))
+        z -= 10 * np.exp(-((y - ci) ** 2 + (x - cj) ** 2) / (2 * r ** 2))
+
+    ds = gdal.GetDriverByName("GTiff").Create(
+        caminho, n, n, 1, gdal.GDT_Float32, ["TILED=YES", "COMPRESS=DEFLATE", "PREDICTOR=3"]
+    )
+    ds.SetGeoTransform((500000, RESOLUCAO, 0, 7500000, 0, -RESOLUCAO))
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(EPSG)
+    ds.SetProjection(srs.ExportToWkt())
+    banda = ds.GetRasterBand(1)
+    banda.SetNoDataValue(NODATA)
+    banda.WriteArray(z.astype(np.float32))
+    ds = None
+
+
+def rodar_grass(mde, saida_mde, saida_direcao):
+    from qgis import processing
+    from config_raster import config, params_grass
+    from hidrologia_grass import params_filldir
+
+    params = params_filldir(
+        mde, {"output": saida_mde, "direction": saida_direcao}, params_grass(config())
+    )
+    inicio = time.perf_counter()
+    processing.run("grass7:r.fill.dir", params)
+    return time.perf_counter() - inicio
+
+
+def comparar(mde_a, dir_a, mde_b, dir_b):
+    za, valido_a, _, _ = ler_mde(mde_a)
+    zb, valido_b, _, _ = ler_mde(mde_b)
+    valido = valido_a & valido_b
+    diferenca = np.abs(za[valido].astype(np.float64) - zb[valido])
+
+    da = gdal.Open(dir_a).ReadAsArray()
+    db = gdal.Open(dir_b).ReadAsArray()
+    # O r.fill.dir (format=grass) grava a direção em graus (45 * código,
+    # 360 = leste); o motor NumPy grava o código (1 a 8)
+    mesma = da[valido] == db[valido] // 45
+    return {
+        "dif_max": float(diferenca.max()) if diferenca.size else 0.0,
+        "dif_media": float(diferenca.mean()) if diferenca.size else 0.0,
+        "dir_iguais": 100.0 * mesma.mean() if mesma.size else 100.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NumPy (Priority-Flood + D8) x r.fill.dir.")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[500, 1000, 2000, 4000],
+                        help="lado dos MDEs sintéticos, em células")
+    parser.add_argument("--mde", nargs="*", default=[], help="MDEs reais (já recortados)")
+    parser.add_argument("--sem-grass", action="store_true", help="não roda o r.fill.dir")
+    parser.add_argument("--pasta", default=None, help="pasta de trabalho (padrão: temporária)")
+    args = parser.parse_args()
+
+    pasta = args.pasta or tempfile.mkdtemp(prefix="benchmark_filldir_")
+    os.makedirs(pasta, exist_ok=True)
+    print(f"Pasta de trabalho: {pasta}")
+    print(f"Numba: {'sim' if TEM_NUMBA else 'não (Python puro, bem mais lento)'}\n")
+
+    app = None
+    if not args.sem_grass:
+        from hidrologia_lote import inicializar_qgis
+
+        app = inicializar_qgis()
+
+    mdes = []
+    for n in args.tamanhos:
+        caminho = os.path.join(pasta, f"sintetico_{n}.tif")
+        if not os.path.exists(caminho):
+            criar_mde_sintetico(caminho, n)
+        mdes.append((f"sintético {n}x{n}", caminho))
+    mdes += [(os.path.basename(m), m) for m in args.mde]
+
+    print(f"{'MDE':<22}  {'NumPy':>8}  {'GRASS':>8}  {'Dif. máx.':>10}  {'Dif. média':>10}  {'Dir. iguais':>11}")
+    for nome, mde in mdes:
+        base = os.path.join(pasta, os.path.splitext(os.path.basename(mde))[0])
+
+        inicio = time.perf_counter()
+        fill_dir(mde, base + "_np_mde.tif", base + "_np_dir.tif")
+        t_numpy = time.perf_counter() - inicio
+
+        if args.sem_grass:
+            print(f"{nome:<22}  {t_numpy:>7.2f}s")
+            continue
+
+        t_grass = rodar_grass(mde, base + "_grass_mde.tif", base + "_grass_dir.tif")
+        c = comparar(base + "_np_mde.tif", base + "_np_dir.tif",
+                     base + "_grass_mde.tif", base + "_grass_dir.tif")
+        print(f"{nome:<22}  {t_numpy:>7.2f}s  {t_grass:>7.2f}s  {c['dif_max']:>10.3f}  "
+              f"{c['dif_media']:>10.4f}  {c['dir_iguais']:>10.1f}%")
+
+    if app is not None:
+        app.exitQgis()
+
+
+if __name__ == "__main__":
+    main()
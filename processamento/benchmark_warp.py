@@ -0,0 +1,176 @@
+"""
+Benchmark da etapa reprojeção + recorte do MDE com várias configurações
+de config_raster.py.
+
+Gera MDEs sintéticos de tamanho crescente (SIRGAS 2000 geográfico), uma
+máscara circular, e roda reprojetar_recortar (pipeline_mde.py) para UTM 23S
+com cada configuração. Cada caso roda num processo separado, para medir o
+pico de memória de verdade.
+
+Uso (Python com GDAL e NumPy, ex.: OSGeo4W Shell):
+    python benchmark_warp.py
+    python benchmark_warp.py --tamanhos 2000 8000 --pasta D:/tmp/bench
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from osgeo import gdal, ogr, osr
+
+# Módulos compartilhados entre as pastas (comum/)
+PASTA_COMUM = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "comum")
+if PASTA_COMUM not in sys.path:
+    sys.path.insert(0, PASTA_COMUM)
+
+from config_raster import config, aplicar_gdal, opcoes_warp
+from formatacao import formatar_bytes
+from pipeline_mde import reprojetar_recortar
+
+gdal.UseExceptions()
+
+CONFIGURACOES = {
+    "sem_otimizacao": config(threads=1, cache_mb=64, memoria_warp_mb=64,
+                             tiled=False, compressao=None, bigtiff="IF_NEEDED"),
+    "threads": config(tiled=False, compressao=None),
+    "threads_tiled": config(compressao=None),
+    "padrao": config(),
+}
+
+EPSG_ORIGEM = 4674       # SIRGAS 2000 geográfico (como o ANADEM)
+EPSG_DESTINO = 31983     # SIRGAS 2000 / UTM 23S
+RESOLUCAO_GRAUS = 0.0003  # ~30 m
+ORIGEM_LON, ORIGEM_LAT = -48.0, -15.0
+
+
+def criar_mde_sintetico(caminho, n):
+    """MDE n x n (float32) com relevo suave + ruído, gravado em faixas."""
+    driver = gdal.GetDriverByName("GTiff")
+    ds = driver.Create(caminho, n, n, 1, gdal.GDT_Float32, ["TILED=YES", "BIGTIFF=IF_SAFER"])
+    ds.SetGeoTransform((ORIGEM_LON, RESOLUCAO_GRAUS, 0, ORIGEM_LAT, 0, -RESOLUCAO_GRAUS))
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(EPSG_ORIGEM)
+    ds.SetProjection(srs.ExportToWkt())
+    banda = ds.GetRasterBand(1)
+    banda.SetNoDataValue(-9999)
+
+    rng = np.random.default_rng(42)
+    x = np.linspace(0, 8 * np.pi, n, dtype=np.float32)
+    for linha in range(0, n, 512):
+        altura = min(512, n - linha)
+        y = np.linspace(linha, linha + altura - 1, altura, dtype=np.float32)[:, None] / n * 8 * np.pi
+        bloco = 800 + 150 * np.sin(x)[None, :] * np.cos(y) + 40 * np.sin(3 * y + x[None, :] / 2)
+        bloco += rng.normal(0, 2, bloco.shape).astype(np.float32)
+        banda.WriteArray(bloco.astype(np.float32), 0, linha)
+    ds = None
+
+
+def criar_mascara(caminho, n):
+    """Círculo inscrito na extensão do MDE (GeoJSON)."""
+    lado = n * RESOLUCAO_GRAUS
+    cx, cy = ORIGEM_LON + lado / 2, ORIGEM_LAT - lado / 2
+    anel = ogr.Geometry(ogr.wkbLinearRing)
+    for ang in np.linspace(0, 2 * np.pi, 129):
+        anel.AddPoint_2D(cx + 0.45 * lado * np.cos(ang), cy + 0.45 * lado * np.sin(ang))
+    poligono = ogr.Geometry(ogr.wkbPolygon)
+    poligono.AddGeometry(anel)
+
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(EPSG_ORIGEM)
+    srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+    ds = ogr.GetDriverByName("GeoJSON").CreateDataSource(caminho)
+    lyr = ds.CreateLayer("mascara", srs, ogr.wkbPolygon)
+    feat = ogr.Feature(lyr.GetLayerDefn())
+    feat.SetGeometry(poligono)
+    lyr.CreateFeature(feat)
+    ds = None
+
+
+def pico_memoria_mb():
+    """Pico de memória residente deste processo, em MB (None se não der)."""
+    try:
+        import resource
+
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux em KB, macOS em bytes
+        return pico / 1024 if sys.platform != "darwin" else pico / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+    except (ImportError, AttributeError):
+        return None
+
+
+def rodar_caso(nome_config, mde, mascara, saida):
+    """Executa um caso (dentro do processo filho) e imprime o resultado em JSON."""
+    cfg = CONFIGURACOES[nome_config]
+
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(EPSG_DESTINO)
+
+    with aplicar_gdal(cfg):
+        inicio = time.perf_counter()
+        reprojetar_recortar(mde, mascara, srs.ExportToWkt(), saida, opcoes_warp=opcoes_warp(cfg))
+        segundos = time.perf_counter() - inicio
+
+    print(json.dumps({
+        "segundos": segundos,
+        "pico_mb": pico_memoria_mb(),
+        "bytes": os.path.getsize(saida),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de reprojeção + recorte do MDE.")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[1000, 2000, 4000, 8000],
+                        help="lado dos MDEs sintéticos, em células")
+    parser.add_argument("--configs", nargs="+", default=list(CONFIGURACOES),
+                        choices=list(CONFIGURACOES))
+    parser.add_argument("--pasta", default=None, help="pasta de trabalho (padrão: temporária)")
+    # Uso interno: um caso só, rodando no processo filho
+    parser.add_argument("--caso", nargs=4, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.caso:
+        rodar_caso(*args.caso)
+        return
+
+    pasta = args.pasta or tempfile.mkdtemp(prefix="benchmark_warp_")
+    os.makedirs(pasta, exist_ok=True)
+    print(f"Pasta de trabalho: {pasta}\n")
+    print(f"{'Tamanho':>11}  {'Configuração':<16}  {'Tempo':>8}  {'Pico mem.':>10}  {'Saída':>10}")
+
+    for n in args.tamanhos:
+        mde = os.path.join(pasta, f"mde_{n}.tif")
+        mascara = os.path.join(pasta, f"mascara_{n}.geojson")
+        if not os.path.exists(mde):
+            criar_mde_sintetico(mde, n)
+        if not os.path.exists(mascara):
+            criar_mascara(mascara, n)
+
+        for nome_config in args.configs:
+            saida = os.path.join(pasta, f"saida_{n}_{nome_config}.tif")
+            resultado = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--caso", nome_config, mde, mascara, saida],
+                capture_output=True, text=True
+            )
+            if resultado.returncode != 0:
+                print(f"{n:>5}x{n:<5}  {nome_config:<16}  ERRO: {resultado.stderr.strip().splitlines()[-1]}")
+                continue
+
+            r = json.loads(resultado.stdout.strip().splitlines()[-1])
+            pico = f"{r['pico_mb']:.0f} MB" if r["pico_mb"] is not None else "n/d"
+            print(f"{n:>5}x{n:<5}  {nome_config:<16}  {r['segundos']:>7.2f}s  {pico:>10}  "
+                  f"{formatar_bytes(r['bytes']):>10}")
+            os.remove(saida)
+
+
+if __name__ == "__main__":
+    main()
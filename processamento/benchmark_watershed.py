@@ -0,0 +1,137 @@
+"""
+Benchmark da acumulação + trechos: acumulacao_numpy.py contra o
+grass7:r.watershed.
+
+Usa os mesmos MDEs sintéticos do benchmark_filldir.py (e, opcionalmente,
+MDEs reais com --mde). Cada MDE é preenchido uma vez pelo
+hidrologia_numpy.py; os dois motores partem desse mesmo MDE sem depressão:
+- NumPy: direção D8 + acumulação + trechos (tempo total)
+- GRASS: r.watershed com accumulation, drainage e stream
+
+Comparação: % de células com a mesma acumulação (em valor absoluto; o
+r.watershed marca com sinal negativo o fluxo que vem de fora da região) e
+% de células de rio em comum. O r.watershed usa seu próprio roteamento
+(A* com MFD/SFD), então espere diferenças dentro dos planos.
+
+Para 10⁸ células: --tamanhos 10000 (e --memmap numa pasta com espaço, se
+a RAM for pouca).
+
+Uso (Python do QGIS, ex.: OSGeo4W Shell com python-qgis):
+    python benchmark_watershed.py
+    python benchmark_watershed.py --tamanhos 4000 10000 --memmap D:/tmp/memmap
+    python benchmark_watershed.py --sem-grass     # só o motor NumPy (sem QGIS)
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+from osgeo import gdal
+
+import acumulacao_numpy
+from benchmark_filldir import criar_mde_sintetico
+from hidrologia_numpy import TEM_NUMBA, fill_dir, gravar_direcao
+
+gdal.UseExceptions()
+
+THRESHOLD = 1000
+
+
+def rodar_numpy(mde_preenchido, base, memmap):
+    inicio = time.perf_counter()
+    direcao = gravar_direcao(mde_preenchido, base + "_np_dir.tif")
+    acumulacao_numpy.watershed(
+        direcao,
+        {"accumulation": base + "_np_acc.tif", "stream": base + "_np_rio.tif"},
+        THRESHOLD,
+        pasta_memmap=memmap
+    )
+    return time.perf_counter() - inicio
+
+
+def rodar_grass(mde_preenchido, base):
+    from qgis import processing
+    from config_raster import config, params_grass
+    from hidrologia_grass import decidir_memoria_watershed, memoria_livre_mb, params_watershed
+
+    ds = gdal.Open(mde_preenchido)
+    decisao = decidir_memoria_watershed(ds.RasterXSize, ds.RasterYSize, memoria_livre_mb())
+    ds = None
+    params = params_watershed(
+        mde_preenchido, THRESHOLD,
+        {"accumulation": base + "_grass_acc.tif", "drainage": base + "_grass_dir.tif",
+         "stream": base + "_grass_rio.tif"},
+        decisao, params_grass(config())
+    )
+    inicio = time.perf_counter()
+    processing.run("grass7:r.watershed", params)
+    return time.perf_counter() - inicio
+
+
+def comparar(base):
+    acc_np = gdal.Open(base + "_np_acc.tif").ReadAsArray().astype(np.float64)
+    acc_grass = np.abs(gdal.Open(base + "_grass_acc.tif").ReadAsArray().astype(np.float64))
+    valido = acc_np > 0
+    rio_np = gdal.Open(base + "_np_rio.tif").ReadAsArray() > 0
+    rio_grass = gdal.Open(base + "_grass_rio.tif").ReadAsArray() > 0
+    uniao = (rio_np | rio_grass).sum()
+    return {
+        "acc_iguais": 100.0 * (acc_np[valido] == acc_grass[valido]).mean() if valido.any() else 100.0,
+        "rio_comum": 100.0 * (rio_np & rio_grass).sum() / uniao if uniao else 100.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NumPy (Kahn) x r.watershed.")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[1000, 2000, 4000],
+                        help="lado dos MDEs sintéticos, em células")
+    parser.add_argument("--mde", nargs="*", default=[], help="MDEs reais (já recortados)")
+    parser.add_argument("--memmap", default=None, help="pasta para os arrays em disco (np.memmap)")
+    parser.add_argument("--sem-grass", action="store_true", help="não roda o r.watershed")
+    parser.add_argument("--pasta", default=None, help="pasta de trabalho (padrão: temporária)")
+    args = parser.parse_args()
+
+    pasta = args.pasta or tempfile.mkdtemp(prefix="benchmark_watershed_")
+    os.makedirs(pasta, exist_ok=True)
+    print(f"Pasta de trabalho: {pasta}")
+    print(f"Numba: {'sim' if TEM_NUMBA else 'não (Python puro, bem mais lento)'}")
+    print(f"Memmap: {args.memmap or 'não (tudo na RAM)'}\n")
+
+    app = None
+    if not args.sem_grass:
+        from hidrologia_lote import inicializar_qgis
+
+        app = inicializar_qgis()
+
+    mdes = []
+    for n in args.tamanhos:
+        caminho = os.path.join(pasta, f"sintetico_{n}.tif")
+        if not os.path.exists(caminho):
+            criar_mde_sintetico(caminho, n)
+        mdes.append((f"sintético {n}x{n}", caminho))
+    mdes += [(os.path.basename(m), m) for m in args.mde]
+
+    print(f"{'MDE':<22}  {'NumPy':>8}  {'GRASS':>8}  {'Acc. iguais':>11}  {'Rio comum':>9}")
+    for nome, mde in mdes:
+        base = os.path.join(pasta, os.path.splitext(os.path.basename(mde))[0])
+        preenchido = base + "_preenchido.tif"
+        if not os.path.exists(preenchido):
+            fill_dir(mde, preenchido)
+
+        t_numpy = rodar_numpy(preenchido, base, args.memmap)
+        if args.sem_grass:
+            print(f"{nome:<22}  {t_numpy:>7.2f}s")
+            continue
+
+        t_grass = rodar_grass(preenchido, base)
+        c = comparar(base)
+        print(f"{nome:<22}  {t_numpy:>7.2f}s  {t_grass:>7.2f}s  {c['acc_iguais']:>10.1f}%  "
+              f"{c['rio_comum']:>8.1f}%")
+
+    if app is not None:
+        app.exitQgis()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Cache em disco dos rasters intermediários do fluxo do MDE.
+
+A reprojeção e o recorte do ANADEM se repetem com as mesmas entradas
+(mesmo tile, mesmo SRC, mesma máscara) toda vez que uma área é rodada de
+novo, por exemplo só para trocar o threshold. Cada etapa monta uma chave
+com:
+- a identidade dos arquivos de entrada (caminho, tamanho, data de modificação)
+- o hash das geometrias da máscara (e do SRC dela)
+- os SRCs e os parâmetros do algoritmo
+e, se a chave já estiver no cache, usa o raster guardado em vez de refazer.
+
+O cache tem limite de tamanho: ao passar dele, os rasters usados há mais
+tempo são apagados (LRU). O índice é um JSON na pasta do cache, protegido
+por um arquivo de trava porque vários processos do hidrologia_lote.py podem
+usar o mesmo cache ao mesmo tempo.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+PASTA_CACHE_PADRAO = os.environ.get("CODIGOS_QGIS_CACHE") or os.path.join(
+    tempfile.gettempdir(), "codigos_qgis_cache"
+)
+LIMITE_CACHE_MB = 20 * 1024
+
+NOME_INDICE = "indice_cache.json"
+
+# Trava de um processo que morreu sem apagá-la
+TRAVA_EXPIRADA = 120
+
+
+def identidade_arquivo(caminho):
+    """Caminho absoluto, tamanho e data de modificação (sem ler o arquivo)."""
+    info = os.stat(caminho)
+    return [os.path.normcase(os.path.abspath(caminho)), info.st_size, info.st_mtime_ns]
+
+
+def hash_mascara(mascara, camada=None):
+    """
+    Hash das geometrias e do SRC da máscara.
+    - mascara: caminho de arquivo vetorial (lido pelo OGR) ou QgsVectorLayer
+    """
+    h = hashlib.blake2b(digest_size=16)
+
+    if isinstance(mascara, str):
+        from osgeo import ogr
+
+        ds = ogr.Open(mascara)
+        if ds is None:
+            raise Exception(f"Não foi possível abrir a máscara: {mascara}")
+        lyr = ds.GetLayerByName(camada) if camada else ds.GetLayer(0)
+        srs = lyr.GetSpatialRef()
+        h.update((srs.ExportToWkt() if srs else "").encode())
+        lyr.SetIgnoredFields([
+            lyr.GetLayerDefn().GetFieldDefn(i).GetName()
+            for i in range(lyr.GetLayerDefn().GetFieldCount())
+        ])
+        for feat in lyr:
+            geom = feat.GetGeometryRef()
+            if geom is not None:
+                h.update(geom.ExportToWkb())
+        ds = None
+    else:
+        from qgis.core import QgsFeatureRequest
+
+        h.update(mascara.crs().toWkt().encode())
+        requisicao = QgsFeatureRequest().setNoAttributes()
+        for feat in mascara.getFeatures(requisicao):
+            if feat.hasGeometry():
+                h.update(bytes(feat.geometry().asWkb()))
+
+    return h.hexdigest()
+
+
+class CacheIntermediarios:
+    """Rasters intermediários guardados por chave, com limite de tamanho (LRU)."""
+
+    def __init__(self, pasta=None, limite_mb=LIMITE_CACHE_MB, ativo=True):
+        self.pasta = pasta or PASTA_CACHE_PADRAO
+        self.limite_bytes = int(limite_mb * 1024 * 1024)
+        self.ativo = ativo
+
+        self.acertos = 0
+        self.falhas = 0
+        self.bytes_reaproveitados = 0
+        self.removidos = 0
+        self.bytes_removidos = 0
+
+        if self.ativo:
+            os.makedirs(self.pasta, exist_ok=True)
+        self._indice = os.path.join(self.pasta, NOME_INDICE)
+
+    @staticmethod
+    def chave(etapa, **partes):
+        """Chave da etapa a partir de tudo o que define o resultado."""
+        texto = json.dumps({"etapa": etapa, **partes}, sort_keys=True, default=str)
+        return f"{etapa}_{hashlib.blake2b(texto.encode(), digest_size=16).hexdigest()}"
+
+    @contextmanager
+    def _travar(self):
+        trava = self._indice + ".trava"
+        while True:
+            try:
+                fd = os.open(trava, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(trava) > TRAVA_EXPIRADA:
+                        os.remove(trava)
+                        continue
+                except FileNotFoundError:
+                    continue
+                time.sleep(0.05)
+        try:
+            yield
+        finally:
+            os.close(fd)
+            os.remove(trava)
+
+    def _ler(self):
+        if not os.path.exists(self._indice):
+            return {}
+        try:
+            with open(self._indice, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # Índice corrompido: recomeça vazio
+            return {}
+
+    def _gravar(self, indice):
+        temporario = self._indice + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(indice, f, ensure_ascii=False, indent=2)
+        os.replace(temporario, self._indice)
+
+    def obter(self, chave):
+        """Caminho do raster guardado (ou None se não houver / cache desligado)."""
+        if not self.ativo:
+            return None
+
+        with self._travar():
+            indice = self._ler()
+            entrada = indice.get(chave)
+            caminho = os.path.join(self.pasta, entrada["arquivo"]) if entrada else None
+            if caminho and os.path.isfile(caminho):
+                entrada["ultimo_uso"] = time.time()
+                self._gravar(indice)
+            else:
+                if entrada:
+                    del indice[chave]
+                    self._gravar(indice)
+                caminho = None
+
+        if caminho:
+            self.acertos += 1
+            self.bytes_reaproveitados += entrada["bytes"]
+        else:
+            self.falhas += 1
+        return caminho
+
+    def guardar(self, chave, origem, mover=True):
+        """
+        Guarda 'origem' no cache e retorna o caminho guardado (que pode ser
+        usado no lugar da origem). mover=False copia, mantendo a origem.
+        Com o cache desligado retorna a própria origem.
+        """
+        if not self.ativo:
+            return origem
+
+        arquivo = chave + os.path.splitext(origem)[1]
+        destino = os.path.join(self.pasta, arquivo)
+        temporario = destino + ".parcial"
+        if mover:
+            try:
+                os.replace(origem, temporario)
+            except OSError:
+                # Outro disco: copia
+                shutil.copy2(origem, temporario)
+        else:
+            shutil.copy2(origem, temporario)
+        os.replace(temporario, destino)
+
+        with self._travar():
+            indice = self._ler()
+            indice[chave] = {
+                "arquivo": arquivo,
+                "bytes": os.path.getsize(destino),
+                "ultimo_uso": time.time(),
+            }
+            self._limpar(indice, manter=chave)
+            self._gravar(indice)
+
+        return destino
+
+    def entregar(self, caminho_cache, destino):
+        """Copia um raster do cache para o caminho pedido pelo usuário."""
+        if os.path.normcase(os.path.abspath(caminho_cache)) != os.path.normcase(os.path.abspath(destino)):
+            shutil.copy2(caminho_cache, destino)
+        return destino
+
+    def _limpar(self, indice, manter=None):
+        """Apaga os menos usados até caber no limite (chamado com a trava)."""
+        total = sum(e["bytes"] for e in indice.values())
+        for chave in sorted(indice, key=lambda c: indice[c]["ultimo_uso"]):
+            if total <= self.limite_bytes:
+                break
+            if chave == manter:
+                continue
+            entrada = indice[chave]
+            try:
+                os.remove(os.path.join(self.pasta, entrada["arquivo"]))
+            except FileNotFoundError:
+                pass
+            except OSError:
+                # Aberto em outro lugar (ex.: camada no QGIS no Windows): fica
+                continue
+            del indice[chave]
+            total -= entrada["bytes"]
+            self.removidos += 1
+            self.bytes_removidos += entrada["bytes"]
+
+    def estatisticas(self):
+        return {
+            "ativo": self.ativo,
+            "acertos": self.acertos,
+            "falhas": self.falhas,
+            "bytes_reaproveitados": self.bytes_reaproveitados,
+            "removidos": self.removidos,
+            "bytes_removidos": self.bytes_removidos,
+        }
+
+
+def descrever_estatisticas(estatisticas):
+    """Uma linha de texto com as estatísticas (dict de estatisticas())."""
+    from formatacao import formatar_bytes
+
+    if not estatisticas["ativo"]:
+        return "Cache desligado."
+    return (
+        f"Cache: {estatisticas['acertos']} acertos, {estatisticas['falhas']} falhas, "
+        f"{formatar_bytes(estatisticas['bytes_reaproveitados'])} reaproveitados, "
+        f"{estatisticas['removidos']} removidos ({formatar_bytes(estatisticas['bytes_removidos'])})"
+    )
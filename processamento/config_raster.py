@@ -0,0 +1,133 @@
+"""
+Configuração única de processamento raster (GDAL) para os scripts de MDE.
+
+processamento_mde.py e reprojetar_recortar_mde.py usavam cada um uma
+configuração diferente (MULTITHREADING False em um, True no outro, OPTIONS e
+EXTRA vazios). Tudo o que afeta desempenho do warp/recorte fica aqui:
+- threads do warp e da compressão
+- cache de blocos do GDAL (GDAL_CACHEMAX)
+- memória de trabalho do warp (-wm)
+- GeoTIFF em blocos (tiled) e comprimido
+- BIGTIFF
+
+As funções devolvem as opções no formato que cada caminho espera:
+parâmetros do Processing (gdal:warpreproject / gdal:cliprasterbymasklayer),
+kwargs do gdal.WarpOptions e opções de formato das saídas do GRASS.
+"""
+import os
+from contextlib import contextmanager
+
+CONFIG_PADRAO = {
+    "threads": "ALL_CPUS",       # ou um número, ex.: 8
+    "cache_mb": 1024,            # GDAL_CACHEMAX
+    "memoria_warp_mb": 1024,     # -wm
+    "tiled": True,
+    "bloco": 512,                # BLOCKXSIZE / BLOCKYSIZE
+    "compressao": "DEFLATE",     # None para não comprimir
+    "preditor": 3,               # 3 = ponto flutuante (MDE); 2 = inteiros; None = sem
+    "bigtiff": "IF_SAFER",       # YES / NO / IF_NEEDED / IF_SAFER
+}
+
+
+def config(**alteracoes):
+    """CONFIG_PADRAO com alguns valores trocados."""
+    cfg = dict(CONFIG_PADRAO)
+    desconhecidas = set(alteracoes) - set(cfg)
+    if desconhecidas:
+        raise Exception(f"Opções de raster desconhecidas: {sorted(desconhecidas)}")
+    cfg.update(alteracoes)
+    return cfg
+
+
+def n_threads(cfg):
+    """Número de threads efetivo (ALL_CPUS -> núcleos da máquina)."""
+    if str(cfg["threads"]).upper() == "ALL_CPUS":
+        return os.cpu_count() or 1
+    return max(1, int(cfg["threads"]))
+
+
+def multithread(cfg):
+    return n_threads(cfg) > 1
+
+
+def opcoes_criacao(cfg):
+    """Lista de creation options do GeoTIFF (ex.: ['TILED=YES', ...])."""
+    opcoes = []
+    if cfg["tiled"]:
+        opcoes += ["TILED=YES", f"BLOCKXSIZE={cfg['bloco']}", f"BLOCKYSIZE={cfg['bloco']}"]
+    if cfg["compressao"]:
+        opcoes.append(f"COMPRESS={cfg['compressao']}")
+        if cfg["preditor"]:
+            opcoes.append(f"PREDICTOR={cfg['preditor']}")
+        opcoes.append(f"NUM_THREADS={cfg['threads']}")
+    if cfg["bigtiff"]:
+        opcoes.append(f"BIGTIFF={cfg['bigtiff']}")
+    return opcoes
+
+
+@contextmanager
+def aplicar_gdal(cfg):
+    """
+    Cache e threads no GDAL deste processo (chamadas via osgeo.gdal) só
+    dentro do bloco:
+        with aplicar_gdal(cfg):
+            ...
+    São configurações globais do processo (o QGIS usa o mesmo GDAL): os
+    valores anteriores voltam no fim, como nas opções passadas por chamada
+    do GRASS e do Processing.
+    """
+    from osgeo import gdal
+
+    cache_anterior = gdal.GetCacheMax()
+    threads_anterior = gdal.GetConfigOption("GDAL_NUM_THREADS", None)
+    gdal.SetCacheMax(int(cfg["cache_mb"]) * 1024 * 1024)
+    gdal.SetConfigOption("GDAL_NUM_THREADS", str(cfg["threads"]))
+    try:
+        yield
+    finally:
+        gdal.SetCacheMax(cache_anterior)
+        gdal.SetConfigOption("GDAL_NUM_THREADS", threads_anterior)
+
+
+def opcoes_warp(cfg):
+    """kwargs para gdal.WarpOptions."""
+    return {
+        "multithread": multithread(cfg),
+        "warpMemoryLimit": int(cfg["memoria_warp_mb"]),   # < 10000 = MB
+        "warpOptions": [f"NUM_THREADS={cfg['threads']}"],
+        "creationOptions": opcoes_criacao(cfg),
+    }
+
+
+def params_processing(cfg):
+    """
+    Parâmetros de desempenho para gdal:warpreproject e
+    gdal:cliprasterbymasklayer do Processing (MULTITHREADING, OPTIONS, EXTRA).
+    """
+    extra = [
+        f"-wm {int(cfg['memoria_warp_mb'])}",
+        f"-wo NUM_THREADS={cfg['threads']}",
+        f"--config GDAL_CACHEMAX {int(cfg['cache_mb'])}",
+    ]
+    return {
+        "MULTITHREADING": multithread(cfg),
+        "OPTIONS": "|".join(opcoes_criacao(cfg)),
+        "EXTRA": " ".join(extra),
+    }
+
+
+def params_grass(cfg, inteiro=True):
+    """
+    Opções de formato das saídas raster dos algoritmos do GRASS.
+    O GRASS usa as mesmas opções em todas as saídas da chamada, e o libtiff
+    recusa o PREDICTOR=3 (ponto flutuante) em rasters inteiros (direção,
+    bacias, trechos...). inteiro=True (padrão): alguma saída da chamada é
+    inteira -> PREDICTOR=2, que serve para inteiros e ponto flutuante.
+    """
+    preditor = cfg["preditor"]
+    if preditor and inteiro:
+        preditor = 2
+    return {
+        "GRASS_RASTER_FORMAT_OPT": ",".join(opcoes_criacao({**cfg, "preditor": preditor})),
+        "GRASS_RASTER_FORMAT_META": "",
+    }
@@ -0,0 +1,562 @@
+"""
+Fluxo hidrológico do processamento_mde.py como função, sem caixas de diálogo.
+
+ANADEM -> reprojeção + recorte pela máscara -> r.fill.dir -> r.watershed.
+A "tarefa" é um dict com tudo o que antes era perguntado ao usuário. Vem
+das caixas de diálogo (processamento_mde.py) ou de um arquivo JSON/YAML
+(hidrologia_lote.py):
+
+    {
+        "nome": "sub_bacia_01",
+        "entrada": "D:/anadem/anadem_sc.tif",
+        "epsg_origem": 0,                 # 0 = manter o SRC do raster
+        "crs_destino": "EPSG:31982",      # ou só o código: 31982
+        "mascara": "D:/bacias/sub_01.gpkg",
+        "camada_mascara": null,           # camada dentro do GPKG (opcional)
+        "threshold": 1000,
+        "pasta_saida": "D:/saida/sub_01",
+        "saidas_filldir": ["output", "direction"],
+        "saidas_watershed": ["accumulation", "drainage", "stream"],
+        "caminhos": {},                   # caminho próprio por saída (opcional)
+        "modo_pipeline": "cutline",
+        "simular": false,
+        "config_raster": {"threads": 4},  # alterações de CONFIG_PADRAO
+        "limite_memoria_mb": null,        # teto de RAM para o r.watershed
+        "thresholds": [],                 # varredura: vários thresholds de uma vez
+        "metodo_varredura": "numpy",      # ou "r.stream.extract"
+        "saida_varredura": null,          # caminho sem extensão (.tif / .gpkg)
+        "motor_filldir": "grass",         # ou "numpy" (hidrologia_numpy.py, sem GRASS)
+        "motor_watershed": "grass",       # ou "numpy" (acumulacao_numpy.py, sem GRASS)
+        "pasta_memmap": null,             # motor numpy: arrays em disco (raster > RAM)
+        "tamanho_bloco": 0,               # > 0: modo em blocos (hidrologia_blocos.py)
+        "processos_bloco": null,          # processos do modo em blocos (padrão: núcleos)
+        "vetorizar": false,               # bacias e trechos num GPKG (vetorizar_hidrologia.py)
+        "saida_vetores": null,            # padrão: pasta_saida/hidrologia_vetores.gpkg
+        "cache": true,                    # reaproveita o recorte (cache_intermediarios.py)
+        "pasta_cache": null,              # padrão: PASTA_CACHE_PADRAO
+        "limite_cache_mb": null           # padrão: LIMITE_CACHE_MB
+    }
+
+O motor_watershed "numpy" só gera accumulation, drainage e stream; a
+direção vem do hidrologia_numpy.py (a do r.fill.dir não é reaproveitada).
+Com "tamanho_bloco" (os dois motores "numpy"), preenchimento, direção,
+acumulação e trechos rodam em blocos num pool de processos, para MDEs que
+não cabem na RAM; "pasta_memmap" vira a pasta dos blocos intermediários.
+
+Com "thresholds", o r.fill.dir e o r.watershed rodam uma vez só e a rede
+de cada threshold é derivada da acumulação (ver varredura_threshold.py).
+
+Precisa do QGIS inicializado com o Processing e o provedor do GRASS (no
+console do QGIS isso já está feito; fora dele, ver hidrologia_lote.py).
+"""
+import json
+import os
+import time
+
+from qgis.core import (
+    QgsRasterLayer,
+    QgsVectorLayer,
+    QgsCoordinateReferenceSystem,
+    QgsProcessingUtils
+)
+from qgis import processing
+
+from pipeline_mde import MODOS_PIPELINE, RelatorioEtapas, reprojetar_recortar
+from config_raster import config, aplicar_gdal, opcoes_warp, params_processing, params_grass
+from hidrologia_grass import (
+    decidir_memoria_watershed,
+    disco_estimado_mb,
+    descrever_decisao,
+    SAIDAS_FILLDIR,
+    SAIDAS_WATERSHED,
+    validar_saidas,
+    tem_saida_inteira,
+    params_filldir,
+    params_watershed,
+    memoria_livre_mb
+)
+from varredura_threshold import METODOS_VARREDURA, executar_varredura
+from hidrologia_numpy import fill_dir, gravar_direcao
+import acumulacao_numpy
+from hidrologia_blocos import processar_blocos
+from vetorizar_hidrologia import vetorizar
+from cache_intermediarios import (
+    CacheIntermediarios,
+    LIMITE_CACHE_MB,
+    identidade_arquivo,
+    hash_mascara
+)
+
+TOTAL_ETAPAS = 7
+
+# Resultado de cada tarefa, gravado na pasta de saída
+NOME_RESULTADO = "resultado_hidrologia.json"
+
+TAREFA_PADRAO = {
+    "nome": None,
+    "entrada": None,
+    "epsg_origem": 0,
+    "crs_destino": None,
+    "mascara": None,
+    "camada_mascara": None,
+    "threshold": 1000,
+    "pasta_saida": None,
+    "saidas_filldir": ["output", "direction"],
+    "saidas_watershed": ["accumulation", "drainage", "stream"],
+    "caminhos": {},
+    "modo_pipeline": "cutline",
+    "simular": False,
+    "config_raster": {},
+    "limite_memoria_mb": None,
+    "thresholds": [],
+    "metodo_varredura": "numpy",
+    "saida_varredura": None,
+    "motor_filldir": "grass",
+    "motor_watershed": "grass",
+    "pasta_memmap": None,
+    "tamanho_bloco": 0,
+    "processos_bloco": None,
+    "vetorizar": False,
+    "saida_vetores": None,
+    "cache": True,
+    "pasta_cache": None,
+    "limite_cache_mb": None,
+}
+
+NOME_VARREDURA = "varredura_threshold"
+NOME_VETORES = "hidrologia_vetores.gpkg"
+
+MOTORES_FILLDIR = ("grass", "numpy")
+MOTORES_WATERSHED = ("grass", "numpy")
+
+# Saídas do r.watershed que o motor numpy sabe gerar
+SAIDAS_WATERSHED_NUMPY = ("accumulation", "drainage", "stream")
+
+
+def _log_padrao(etapa, texto):
+    print(f"[{etapa}/{TOTAL_ETAPAS}] {texto}", flush=True)
+
+
+def crs_de(valor):
+    """SRC a partir de 31982, '31982', 'EPSG:31982' ou um WKT."""
+    if isinstance(valor, QgsCoordinateReferenceSystem):
+        return valor
+    texto = str(valor).strip()
+    if texto.isdigit():
+        texto = f"EPSG:{texto}"
+    crs = QgsCoordinateReferenceSystem(texto)
+    if not crs.isValid():
+        crs = QgsCoordinateReferenceSystem.fromWkt(texto)
+    if not crs.isValid():
+        raise Exception(f"SRC inválido: {valor}")
+    return crs
+
+
+def normalizar_tarefa(tarefa):
+    """
+    Completa a tarefa com TAREFA_PADRAO, confere os campos obrigatórios e
+    resolve o caminho de cada saída (caminhos[nome] ou pasta_saida/arquivo).
+    """
+    desconhecidas = set(tarefa) - set(TAREFA_PADRAO)
+    if desconhecidas:
+        raise Exception(f"Campos desconhecidos na tarefa: {sorted(desconhecidas)}")
+
+    t = dict(TAREFA_PADRAO)
+    t.update(tarefa)
+    t["caminhos"] = dict(t["caminhos"] or {})
+
+    for campo in ("entrada", "crs_destino", "mascara"):
+        if not t[campo]:
+            raise Exception(f"Tarefa sem '{campo}'.")
+    if not os.path.isfile(t["entrada"]):
+        raise Exception(f"Raster de entrada não encontrado: {t['entrada']}")
+    if t["modo_pipeline"] not in MODOS_PIPELINE:
+        raise Exception(f"modo_pipeline inválido: {t['modo_pipeline']}")
+    if int(t["threshold"]) < 1:
+        raise Exception("threshold deve ser maior que zero.")
+    if t["motor_filldir"] not in MOTORES_FILLDIR:
+        raise Exception(f"motor_filldir inválido: {t['motor_filldir']}. Opções: {MOTORES_FILLDIR}")
+    if t["motor_filldir"] == "numpy" and "areas" in t["saidas_filldir"]:
+        raise Exception("O motor numpy não gera a saída 'areas' do r.fill.dir.")
+    if t["motor_watershed"] not in MOTORES_WATERSHED:
+        raise Exception(f"motor_watershed inválido: {t['motor_watershed']}. Opções: {MOTORES_WATERSHED}")
+    if t["motor_watershed"] == "numpy":
+        outras = set(t["saidas_watershed"]) - set(SAIDAS_WATERSHED_NUMPY)
+        if outras:
+            raise Exception(f"O motor numpy não gera as saídas {sorted(outras)} do r.watershed.")
+    if t["tamanho_bloco"]:
+        if int(t["tamanho_bloco"]) < 3:
+            raise Exception("tamanho_bloco deve ser de pelo menos 3 células.")
+        if t["motor_filldir"] != "numpy" or t["motor_watershed"] != "numpy":
+            raise Exception("O modo em blocos usa os motores numpy: motor_filldir e motor_watershed = 'numpy'.")
+    if t["vetorizar"] and not {"basin", "stream"} & set(t["saidas_watershed"]):
+        raise Exception("Para vetorizar, inclua 'basin' e/ou 'stream' em saidas_watershed.")
+    if t["thresholds"]:
+        if t["metodo_varredura"] not in METODOS_VARREDURA:
+            raise Exception(f"metodo_varredura inválido: {t['metodo_varredura']}")
+        if min(int(v) for v in t["thresholds"]) < 1:
+            raise Exception("thresholds devem ser maiores que zero.")
+        # A rede do r.watershed sai no menor threshold da varredura
+        t["threshold"] = min(int(v) for v in t["thresholds"])
+
+    validar_saidas(t["saidas_filldir"], SAIDAS_FILLDIR)
+    validar_saidas(t["saidas_watershed"], SAIDAS_WATERSHED)
+    validar_saidas(t["caminhos"], {**SAIDAS_FILLDIR, **SAIDAS_WATERSHED})
+
+    if not t["nome"]:
+        t["nome"] = os.path.splitext(os.path.basename(t["mascara"]))[0]
+
+    if t["thresholds"] and not t["saida_varredura"] and not t["simular"]:
+        if not t["pasta_saida"]:
+            raise Exception(f"Tarefa '{t['nome']}' com thresholds e sem pasta_saida nem saida_varredura.")
+        t["saida_varredura"] = os.path.join(t["pasta_saida"], NOME_VARREDURA)
+
+    if not t["simular"]:
+        for nome in list(t["saidas_filldir"]) + list(t["saidas_watershed"]):
+            if nome in t["caminhos"]:
+                continue
+            if not t["pasta_saida"]:
+                raise Exception(f"Tarefa '{t['nome']}' sem pasta_saida nem caminho para '{nome}'.")
+            arquivo = {**SAIDAS_FILLDIR, **SAIDAS_WATERSHED}[nome][1]
+            t["caminhos"][nome] = os.path.join(t["pasta_saida"], arquivo)
+
+    if t["vetorizar"] and not t["saida_vetores"] and not t["simular"]:
+        base = t["caminhos"].get("stream") or t["caminhos"]["basin"]
+        t["saida_vetores"] = os.path.join(t["pasta_saida"] or os.path.dirname(base), NOME_VETORES)
+
+    return t
+
+
+def _reprojetar_recortar_classico(anadem_layer, mascara_layer, crs_destino, cfg, relatorio, log):
+    """gdal:warpreproject + gdal:cliprasterbymasklayer (dois temporários)."""
+    relatorio.iniciar()
+
+    if anadem_layer.crs() != crs_destino:
+        params_reproj = {
+            'INPUT': anadem_layer,
+            'SOURCE_CRS': anadem_layer.crs(),
+            'TARGET_CRS': crs_destino,
+            'RESAMPLING': 0,         # Nearest neighbor
+            'NODATA': None,
+            'TARGET_RESOLUTION': None,
+            'DATA_TYPE': 0,          # mesmo tipo de dado
+            'TARGET_EXTENT': None,
+            'TARGET_EXTENT_CRS': crs_destino,
+            'OUTPUT': 'TEMPORARY_OUTPUT'
+        }
+        params_reproj.update(params_processing(cfg))
+        reproj_path = processing.run("gdal:warpreproject", params_reproj)['OUTPUT']
+        if not QgsRasterLayer(reproj_path, "ANADEM_reprojetado").isValid():
+            raise Exception("Falha ao reprojetar o ANADEM.")
+        relatorio.registrar("Reprojeção (gdal:warpreproject)", reproj_path)
+        log(4, "Reprojeção para o SRC de destino concluída.")
+    else:
+        log(4, "Reprojeção não necessária (ANADEM já no SRC de destino).")
+        reproj_path = anadem_layer.source()
+
+    params_clip = {
+        'INPUT': reproj_path,
+        'MASK': mascara_layer,
+        'SOURCE_CRS': None,
+        'TARGET_CRS': None,
+        'NODATA': None,
+        'ALPHA_BAND': False,
+        'CROP_TO_CUTLINE': True,
+        'KEEP_RESOLUTION': True,
+        'SET_RESOLUTION': False,
+        'X_RESOLUTION': 0,
+        'Y_RESOLUTION': 0,
+        'DATA_TYPE': 0,
+        'OUTPUT': 'TEMPORARY_OUTPUT'
+    }
+    params_clip.update(params_processing(cfg))
+
+    relatorio.iniciar()
+    dem_clip_path = processing.run("gdal:cliprasterbymasklayer", params_clip)['OUTPUT']
+    relatorio.registrar("Recorte (gdal:cliprasterbymasklayer)", dem_clip_path)
+    return dem_clip_path
+
+
+def executar_fluxo(tarefa, log=None):
+    """
+    Roda o fluxo completo de uma tarefa (ver TAREFA_PADRAO).
+    - log(etapa, texto): para onde vai o progresso (padrão: print)
+    Retorna dict com nome, status ("ok" ou "simulado"), saidas
+    {parâmetro: caminho}, memoria (decisão do r.watershed), recorte
+    (largura/altura), etapas (bytes e tempo) e segundos.
+    """
+    log = log or _log_padrao
+    inicio = time.perf_counter()
+    t = normalizar_tarefa(tarefa)
+
+    cfg = config(**t["config_raster"])
+    # Cache e threads do GDAL valem só durante o fluxo (depois voltam ao
+    # que o QGIS usava)
+    with aplicar_gdal(cfg):
+        return _executar_fluxo(t, cfg, log, inicio)
+
+
+def _executar_fluxo(t, cfg, log, inicio):
+    """Corpo de executar_fluxo, com a configuração do GDAL já aplicada."""
+    relatorio = RelatorioEtapas()
+
+    # 1) ANADEM
+    log(1, f"[{t['nome']}] Carregando o raster {t['entrada']}.")
+    anadem_layer = QgsRasterLayer(t["entrada"], "ANADEM_original")
+    if not anadem_layer.isValid():
+        raise Exception(f"Raster ANADEM inválido: {t['entrada']}")
+
+    # 2) SRC
+    if int(t["epsg_origem"]) > 0:
+        anadem_layer.setCrs(QgsCoordinateReferenceSystem.fromEpsgId(int(t["epsg_origem"])))
+    crs_destino = crs_de(t["crs_destino"])
+    log(2, f"[{t['nome']}] SRC {anadem_layer.crs().authid()} -> {crs_destino.authid()}.")
+
+    # 3) MÁSCARA
+    fonte_mascara = t["mascara"]
+    if t["camada_mascara"]:
+        fonte_mascara += f"|layername={t['camada_mascara']}"
+    mascara_layer = QgsVectorLayer(fonte_mascara, "mascara", "ogr")
+    if not mascara_layer.isValid():
+        raise Exception(f"Camada de máscara inválida: {fonte_mascara}")
+    log(3, f"[{t['nome']}] Máscara: {fonte_mascara}.")
+
+    # 4) REPROJEÇÃO + RECORTE
+    # Na simulação basta saber o tamanho do recorte: VRT, sem gravar o raster
+    modo_recorte = "vrt" if t["simular"] else t["modo_pipeline"]
+
+    cache = CacheIntermediarios(
+        t["pasta_cache"],
+        t["limite_cache_mb"] or LIMITE_CACHE_MB,
+        ativo=t["cache"] and modo_recorte != "vrt"   # o VRT já não grava nada
+    )
+    chave_recorte = None
+    if cache.ativo:
+        chave_recorte = cache.chave(
+            "recorte",
+            modo=modo_recorte,
+            entrada=identidade_arquivo(t["entrada"]),
+            crs_origem=anadem_layer.crs().toWkt(),
+            crs_destino=crs_destino.toWkt(),
+            mascara=hash_mascara(t["mascara"], t["camada_mascara"]),
+            criacao=opcoes_warp(cfg)["creationOptions"],
+        )
+    dem_clip_path = cache.obter(chave_recorte) if chave_recorte else None
+
+    if dem_clip_path:
+        log(4, f"[{t['nome']}] Recorte reaproveitado do cache: {dem_clip_path}")
+        relatorio.iniciar()
+        relatorio.registrar("Reprojeção + recorte (cache)")
+    elif modo_recorte == "classico":
+        log(4, f"[{t['nome']}] Reprojetando e recortando (gdal:warpreproject + gdal:cliprasterbymasklayer).")
+        dem_clip_path = _reprojetar_recortar_classico(
+            anadem_layer, mascara_layer, crs_destino, cfg, relatorio, log
+        )
+        dem_clip_path = cache.guardar(chave_recorte, dem_clip_path) if chave_recorte else dem_clip_path
+    else:
+        log(4, f"[{t['nome']}] Reprojetando e recortando numa única chamada do GDAL (modo {modo_recorte}).")
+        extensao = ".vrt" if modo_recorte == "vrt" else ".tif"
+        dem_clip_path = os.path.join(
+            QgsProcessingUtils.tempFolder(), f"ANADEM_recortado_{t['nome']}{extensao}"
+        )
+        relatorio.iniciar()
+        reprojetar_recortar(
+            t["entrada"],
+            t["mascara"],
+            crs_destino.toWkt(QgsCoordinateReferenceSystem.WKT_PREFERRED_GDAL),
+            dem_clip_path,
+            crs_origem_wkt=anadem_layer.crs().toWkt(QgsCoordinateReferenceSystem.WKT_PREFERRED_GDAL),
+            camada_mascara=t["camada_mascara"],
+            virtual=(modo_recorte == "vrt"),
+            opcoes_warp=opcoes_warp(cfg)
+        )
+        relatorio.registrar(f"Reprojeção + recorte (gdal.Warp, {modo_recorte})", dem_clip_path)
+        dem_clip_path = cache.guardar(chave_recorte, dem_clip_path) if chave_recorte else dem_clip_path
+
+    dem_clip_layer = QgsRasterLayer(dem_clip_path, "ANADEM_recortado")
+    if not dem_clip_layer.isValid():
+        raise Exception("Falha ao recortar o raster pela máscara.")
+    log(4, f"[{t['nome']}] Recorte do ANADEM pela máscara concluído.")
+
+    # Memória do r.watershed a partir do tamanho do recorte e da RAM livre
+    largura, altura = dem_clip_layer.width(), dem_clip_layer.height()
+    livre_mb = memoria_livre_mb()
+    if t["limite_memoria_mb"]:
+        livre_mb = min(livre_mb, t["limite_memoria_mb"]) if livre_mb else t["limite_memoria_mb"]
+    decisao_memoria = decidir_memoria_watershed(largura, altura, livre_mb)
+    log(4, f"[{t['nome']}] {descrever_decisao(decisao_memoria)}")
+
+    resultado = {
+        "nome": t["nome"],
+        "status": "ok",
+        "tarefa": t,
+        "saidas": {},
+        "memoria": decisao_memoria,
+        "recorte": {"largura": largura, "altura": altura},
+        "cache": cache.estatisticas(),
+    }
+
+    if t["simular"]:
+        resultado["status"] = "simulado"
+        resultado["disco_estimado_mb"] = disco_estimado_mb(
+            largura, altura, len(t["saidas_watershed"]), decisao_memoria["segmentado"]
+        )
+        resultado["etapas"] = _etapas(relatorio)
+        resultado["relatorio"] = relatorio.linhas()
+        resultado["segundos"] = time.perf_counter() - inicio
+        return resultado
+
+    for caminho in t["caminhos"].values():
+        os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+
+    # 5) r.fill.dir
+    saidas_filldir = {nome: t["caminhos"][nome] for nome in t["saidas_filldir"]}
+    saidas_watershed = {nome: t["caminhos"][nome] for nome in t["saidas_watershed"]}
+    acumulacao_path = None
+    if t["thresholds"]:
+        # A varredura precisa da acumulação, mesmo que ela não seja uma saída
+        acumulacao_path = t["caminhos"].get("accumulation") or os.path.join(
+            QgsProcessingUtils.tempFolder(), f"acumulacao_{t['nome']}.tif"
+        )
+    pedidas = dict(saidas_watershed)
+    if acumulacao_path:
+        pedidas["accumulation"] = acumulacao_path
+    if t["vetorizar"]:
+        # Os trechos seguem a drainage; a accumulation dá o atributo celulas_montante
+        for nome in ("drainage", "accumulation"):
+            if nome not in pedidas:
+                pedidas[nome] = os.path.join(QgsProcessingUtils.tempFolder(), f"{nome}_{t['nome']}.tif")
+
+    relatorio.iniciar()
+    if t["tamanho_bloco"]:
+        log(5, f"[{t['nome']}] Hidrologia em blocos de {t['tamanho_bloco']} células (NumPy).")
+        res_filldir = processar_blocos(
+            dem_clip_path,
+            {
+                "output": saidas_filldir.get("output") or os.path.join(
+                    QgsProcessingUtils.tempFolder(), f"mde_sem_depressao_{t['nome']}.tif"
+                ),
+                **saidas_filldir,
+                **pedidas,
+            },
+            int(t["threshold"]),
+            int(t["tamanho_bloco"]),
+            t["processos_bloco"],
+            cfg,
+            t["pasta_memmap"],
+            log=lambda texto: log(5, f"[{t['nome']}] {texto}")
+        )["saidas"]
+        relatorio.registrar("Hidrologia em blocos (NumPy)", *res_filldir.values())
+    elif t["motor_filldir"] == "numpy":
+        log(5, f"[{t['nome']}] Preenchendo depressões e calculando D8 em NumPy (sem GRASS).")
+        res_filldir = fill_dir(
+            dem_clip_path,
+            saidas_filldir.get("output") or os.path.join(
+                QgsProcessingUtils.tempFolder(), f"mde_sem_depressao_{t['nome']}.tif"
+            ),
+            # O motor numpy do passo 7 reaproveita a direção
+            saidas_filldir.get("direction") or (
+                os.path.join(QgsProcessingUtils.tempFolder(), f"direcao_d8_{t['nome']}.tif")
+                if t["motor_watershed"] == "numpy" else None
+            ),
+            cfg
+        )["saidas"]
+        relatorio.registrar("Preenchimento + D8 (NumPy)", *res_filldir.values())
+    else:
+        log(5, f"[{t['nome']}] Executando r.fill.dir.")
+        res_filldir = processing.run(
+            "grass7:r.fill.dir",
+            params_filldir(dem_clip_layer, saidas_filldir, params_grass(cfg))
+        )
+        relatorio.registrar("r.fill.dir", *res_filldir.values())
+    dem_filled_path = res_filldir['output']
+    log(5, f"[{t['nome']}] MDE sem depressão e direção de fluxo concluídos ({t['motor_filldir']}).")
+
+    # 6) MDE sem depressão
+    dem_filled_layer = QgsRasterLayer(dem_filled_path, "MDE_sem_depressao_base")
+    if not dem_filled_layer.isValid():
+        raise Exception("MDE sem depressão inválido para o r.watershed.")
+    log(6, f"[{t['nome']}] Threshold {t['threshold']} células.")
+
+    # 7) r.watershed
+    relatorio.iniciar()
+    if t["tamanho_bloco"]:
+        log(7, f"[{t['nome']}] Acumulação e trechos já calculados no modo em blocos.")
+    elif t["motor_watershed"] == "numpy":
+        log(7, f"[{t['nome']}] Acumulação e trechos em NumPy (sem GRASS).")
+        direcao_path = res_filldir.get("direction")
+        if not direcao_path or t["motor_filldir"] != "numpy":
+            direcao_path = gravar_direcao(
+                dem_filled_path,
+                os.path.join(QgsProcessingUtils.tempFolder(), f"direcao_d8_{t['nome']}.tif"),
+                cfg
+            )
+        acumulacao_numpy.watershed(
+            direcao_path, pedidas, int(t["threshold"]), cfg, t["pasta_memmap"]
+        )
+        relatorio.registrar("Acumulação + trechos (NumPy)", *pedidas.values())
+    else:
+        log(7, f"[{t['nome']}] Executando r.watershed.")
+        res_watershed = processing.run(
+            "grass7:r.watershed",
+            params_watershed(
+                dem_filled_layer,
+                int(t["threshold"]),
+                pedidas,
+                decisao_memoria,
+                params_grass(cfg, inteiro=tem_saida_inteira(pedidas))
+            )
+        )
+        relatorio.registrar("r.watershed", *res_watershed.values())
+    log(7, f"[{t['nome']}] Acumulação e rede de drenagem concluídas ({t['motor_watershed']}).")
+
+    if t["thresholds"]:
+        log(7, f"[{t['nome']}] Varredura de {len(t['thresholds'])} thresholds ({t['metodo_varredura']}).")
+        relatorio.iniciar()
+        varredura = executar_varredura(
+            t["metodo_varredura"],
+            dem_filled_path,
+            acumulacao_path,
+            t["thresholds"],
+            t["saida_varredura"],
+            memoria_mb=decisao_memoria["memoria_mb"],
+            cfg=cfg
+        )
+        relatorio.registrar(f"Varredura de thresholds ({t['metodo_varredura']})",
+                            varredura["raster"], varredura["gpkg"])
+        resultado["varredura"] = varredura
+        log(7, f"[{t['nome']}] Varredura concluída: {varredura['raster']}")
+
+    if t["vetorizar"]:
+        log(7, f"[{t['nome']}] Vetorizando bacias e trechos em {t['saida_vetores']}.")
+        relatorio.iniciar()
+        camadas = vetorizar(pedidas, t["saida_vetores"], dem_clip_path)
+        relatorio.registrar("Vetorização (GPKG)", t["saida_vetores"])
+        resultado["vetores"] = {"gpkg": t["saida_vetores"], "camadas": camadas}
+        log(7, f"[{t['nome']}] Vetorização concluída: "
+               + ", ".join(f"{nome} ({n:,} feições)" for nome, n in camadas.items()))
+
+    resultado["cache"] = cache.estatisticas()
+    resultado["saidas"] = {**saidas_filldir, **saidas_watershed}
+    resultado["etapas"] = _etapas(relatorio)
+    resultado["relatorio"] = relatorio.linhas()
+    resultado["segundos"] = time.perf_counter() - inicio
+    return resultado
+
+
+def _etapas(relatorio):
+    return [
+        {"etapa": nome, "bytes": total, "segundos": segundos, "arquivos": arquivos}
+        for nome, total, segundos, arquivos in relatorio.etapas
+    ]
+
+
+def gravar_resultado(resultado, pasta):
+    """Grava o resultado da tarefa em pasta/NOME_RESULTADO (troca atômica)."""
+    os.makedirs(pasta, exist_ok=True)
+    caminho = os.path.join(pasta, NOME_RESULTADO)
+    temporario = caminho + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2, default=str)
+    os.replace(temporario, caminho)
+    return caminho
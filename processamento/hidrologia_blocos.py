@@ -0,0 +1,832 @@
+"""
+Hidrologia em blocos para MDEs maiores que a RAM.
+
+O hidrologia_numpy.py e o acumulacao_numpy.py carregam o recorte inteiro;
+um mosaico estadual do ANADEM não cabe. Aqui o MDE é dividido em blocos
+(com 1 célula de borda extra, o "halo", lida dos vizinhos) processados num
+pool de processos, e o que atravessa os blocos é resolvido num grafo das
+bordas, no processo principal. O resultado é idêntico ao do modo inteiro
+(fill_dir + acumulacao_numpy.watershed), célula a célula:
+
+1. Preenchimento (Barnes 2016, Priority-Flood paralelo): cada bloco roda o
+   Priority-Flood com as próprias bordas como sementes; cada semente de
+   borda abre um rótulo (as do raster / vizinhas de NoData são o "oceano").
+   Rótulos vizinhos (no bloco e entre blocos) viram arestas com a cota de
+   transbordamento; um Dijkstra de minimax a partir do oceano dá o nível
+   de cada rótulo, e cada célula sobe para max(cota local, nível).
+2. Direção D8: cada bloco com o halo do MDE preenchido. Os planos que
+   ficam inteiros dentro de um bloco são resolvidos no próprio bloco; só os
+   que encostam na borda de algum bloco (e podem atravessá-la) vão para uma
+   busca em largura única no processo principal, só sobre essas células,
+   na mesma ordem do modo inteiro.
+3. Acumulação: cada bloco calcula a própria e, para cada célula de borda,
+   em que célula o fluxo sai do bloco. O grafo saída -> entrada dá o que
+   entra em cada bloco, e a acumulação final do bloco é refeita com isso.
+4. Trechos: rótulos provisórios onde o trecho vem de outro bloco, trocados
+   pelo rótulo de quem está do outro lado da borda.
+
+Memória por processo: ~40 bytes por célula do bloco (TAMANHO_BLOCO² células).
+No processo principal: as células de borda de todos os blocos mais as
+células dos planos que encostam numa borda de bloco (~40 bytes cada, com as
+filas da busca). Um lago ou várzea grande cortado pela grade entra inteiro
+nessa conta; planos dentro de um bloco não entram.
+"""
+import glob
+import heapq
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+import acumulacao_numpy
+from acumulacao_numpy import receptores, NODATA_ACUMULACAO, NODATA_TRECHO
+from hidrologia_numpy import (
+    _jit,
+    _declive_d8,
+    DESLOC_LINHA,
+    DESLOC_COLUNA,
+    CODIGOS_GRASS,
+    NODATA_DIRECAO,
+    gravar_raster
+)
+
+# Lado do bloco, em células (4096² float32 = 64 MB por bloco)
+TAMANHO_BLOCO = 4096
+
+NODATA_MDE = -9999.0
+
+# Rótulo das células ligadas à borda do raster ou a NoData
+OCEANO = 1
+
+# Marcas da resolução de planos (fase da direção)
+PLANO = 1
+SEMENTE = 2
+
+SAIDAS_BLOCOS = ("output", "direction", "accumulation", "drainage", "stream")
+
+
+# GRADE DE BLOCOS
+
+def grade_blocos(largura, altura, tamanho=TAMANHO_BLOCO):
+    """Blocos (x0, y0, largura, altura), linha a linha."""
+    return [
+        (x0, y0, min(tamanho, largura - x0), min(tamanho, altura - y0))
+        for y0 in range(0, altura, tamanho)
+        for x0 in range(0, largura, tamanho)
+    ]
+
+
+def _janela(ctx, i):
+    """Bloco com halo de 1 célula: (x0, y0, largura, altura, dy, dx do bloco)."""
+    x0, y0, w, h = ctx["blocos"][i]
+    jx0, jy0 = max(0, x0 - 1), max(0, y0 - 1)
+    jx1, jy1 = min(ctx["largura"], x0 + w + 1), min(ctx["altura"], y0 + h + 1)
+    return jx0, jy0, jx1 - jx0, jy1 - jy0, y0 - jy0, x0 - jx0
+
+
+def _indices_globais(ctx, i, locais):
+    x0, y0, w, _ = ctx["blocos"][i]
+    return (y0 + locais // w) * ctx["largura"] + x0 + locais % w
+
+
+def _bloco_de(ctx, indices):
+    """Bloco de cada índice achatado do raster."""
+    tamanho = ctx["tamanho"]
+    por_linha = -(-ctx["largura"] // tamanho)
+    return (indices // ctx["largura"] // tamanho) * por_linha + (indices % ctx["largura"]) // tamanho
+
+
+def _locais(ctx, i, indices):
+    x0, y0, w, _ = ctx["blocos"][i]
+    return (indices // ctx["largura"] - y0) * w + indices % ctx["largura"] - x0
+
+
+def _borda(w, h):
+    """Máscara das células na borda do bloco."""
+    borda = np.zeros((h, w), dtype=bool)
+    borda[0, :] = borda[-1, :] = True
+    borda[:, 0] = borda[:, -1] = True
+    return borda
+
+
+def _por_bloco(ctx, indices, *valores):
+    """Separa índices globais (e valores) por bloco: lista de (locais, valores...)."""
+    blocos = _bloco_de(ctx, indices)
+    ordem = np.argsort(blocos, kind="stable")
+    limites = np.searchsorted(blocos[ordem], np.arange(len(ctx["blocos"]) + 1))
+    grupos = []
+    for i in range(len(ctx["blocos"])):
+        sel = ordem[limites[i]:limites[i + 1]]
+        grupos.append((_locais(ctx, i, indices[sel]),) + tuple(v[sel] for v in valores))
+    return grupos
+
+
+# LEITURA / GRAVAÇÃO (GDAL)
+
+def _info(caminho):
+    from osgeo import gdal
+
+    gdal.UseExceptions()
+    ds = gdal.Open(caminho)
+    info = ds.RasterXSize, ds.RasterYSize, ds.GetGeoTransform(), ds.GetProjection()
+    ds = None
+    return info
+
+
+def _ler_janela(caminho, x0, y0, w, h):
+    """Janela da banda 1 e o NoData dela."""
+    from osgeo import gdal
+
+    gdal.UseExceptions()
+    ds = gdal.Open(caminho)
+    banda = ds.GetRasterBand(1)
+    array, nodata = banda.ReadAsArray(x0, y0, w, h), banda.GetNoDataValue()
+    ds = None
+    return array, nodata
+
+
+def _gravar_bloco(ctx, nome, i, array, nodata):
+    x0, y0, _, _ = ctx["blocos"][i]
+    g = ctx["geotransform"]
+    geotransform = (g[0] + x0 * g[1] + y0 * g[2], g[1], g[2], g[3] + x0 * g[4] + y0 * g[5], g[4], g[5])
+    pasta = os.path.join(ctx["pasta"], nome)
+    os.makedirs(pasta, exist_ok=True)
+    # Blocos intermediários sem compressão: são lidos de novo e apagados
+    gravar_raster(
+        os.path.join(pasta, f"bloco_{i:05d}.tif"), array, geotransform, ctx["projecao"], nodata,
+        {**ctx["cfg"], "compressao": None, "threads": 1}
+    )
+
+
+def _mosaico(ctx, nome):
+    """VRT com os blocos gravados de uma etapa."""
+    from osgeo import gdal
+
+    vrt = os.path.join(ctx["pasta"], nome + ".vrt")
+    ds = gdal.BuildVRT(vrt, sorted(glob.glob(os.path.join(ctx["pasta"], nome, "bloco_*.tif"))))
+    ds = None
+    return vrt
+
+
+def _exportar(vrt, saida, cfg, flutuante):
+    from osgeo import gdal
+    from config_raster import opcoes_criacao
+
+    preditor = cfg["preditor"] if flutuante else (2 if cfg["preditor"] else None)
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    ds = gdal.Translate(saida, vrt, options=gdal.TranslateOptions(
+        creationOptions=opcoes_criacao({**cfg, "preditor": preditor})
+    ))
+    ds = None
+    return saida
+
+
+def _salvar(ctx, nome, i, array):
+    pasta = os.path.join(ctx["pasta"], nome)
+    os.makedirs(pasta, exist_ok=True)
+    np.save(os.path.join(pasta, f"bloco_{i:05d}.npy"), array)
+
+
+def _carregar(ctx, nome, i):
+    return np.load(os.path.join(ctx["pasta"], nome, f"bloco_{i:05d}.npy"))
+
+
+# 1) PREENCHIMENTO
+
+@_jit
+def _preencher_rotulado(z, valido, oceano):
+    """
+    Priority-Flood do bloco com rótulos (Barnes 2016). As bordas do bloco são
+    sementes; cada uma que ainda não tem rótulo abre um novo. Altera z.
+    Retorna (rotulo, próximo rótulo livre).
+    """
+    altura, largura = z.shape
+    fechado = np.zeros((altura, largura), dtype=np.bool_)
+    rotulo = np.zeros((altura, largura), dtype=np.int64)
+    fila_poco = np.empty(altura * largura, dtype=np.int64)
+    inicio = 0
+    fim = 0
+
+    fila = [(np.float64(0.0), np.int64(0))]
+    fila.pop()
+
+    for i in range(altura):
+        for j in range(largura):
+            if not valido[i, j]:
+                continue
+            if oceano[i, j] or i == 0 or j == 0 or i == altura - 1 or j == largura - 1:
+                fechado[i, j] = True
+                if oceano[i, j]:
+                    rotulo[i, j] = OCEANO
+                heapq.heappush(fila, (np.float64(z[i, j]), np.int64(i * largura + j)))
+
+    proximo = OCEANO + 1
+    while inicio < fim or len(fila) > 0:
+        if inicio < fim:
+            c = fila_poco[inicio]
+            inicio += 1
+        else:
+            c = heapq.heappop(fila)[1]
+        ci = c // largura
+        cj = c % largura
+        zc = z[ci, cj]
+        if rotulo[ci, cj] == 0:
+            rotulo[ci, cj] = proximo
+            proximo += 1
+
+        for k in range(8):
+            ni = ci + DESLOC_LINHA[k]
+            nj = cj + DESLOC_COLUNA[k]
+            if ni < 0 or nj < 0 or ni >= altura or nj >= largura:
+                continue
+            if fechado[ni, nj] or not valido[ni, nj]:
+                continue
+            fechado[ni, nj] = True
+            rotulo[ni, nj] = rotulo[ci, cj]
+            if z[ni, nj] <= zc:
+                z[ni, nj] = zc
+                fila_poco[fim] = ni * largura + nj
+                fim += 1
+            else:
+                heapq.heappush(fila, (np.float64(z[ni, nj]), np.int64(ni * largura + nj)))
+
+    return rotulo, proximo
+
+
+def _menores_arestas(a, b, cota):
+    """Uma aresta por par de rótulos (a < b), com a menor cota."""
+    a, b = np.minimum(a, b), np.maximum(a, b)
+    ordem = np.lexsort((cota, b, a))
+    a, b, cota = a[ordem], b[ordem], cota[ordem]
+    primeira = np.ones(a.size, dtype=bool)
+    primeira[1:] = (a[1:] != a[:-1]) | (b[1:] != b[:-1])
+    return a[primeira], b[primeira], cota[primeira]
+
+
+def _arestas_internas(z, rotulo):
+    """
+    Pares de células vizinhas com rótulos diferentes; a cota da passagem é a
+    maior das duas (as mesmas arestas que o Priority-Flood veria).
+    """
+    altura, largura = z.shape
+    rotulo_cercado = np.zeros((altura + 2, largura + 2), dtype=rotulo.dtype)
+    rotulo_cercado[1:-1, 1:-1] = rotulo
+    z_cercado = np.zeros((altura + 2, largura + 2), dtype=z.dtype)
+    z_cercado[1:-1, 1:-1] = z
+
+    a, b, cota = [], [], []
+    # E, NE, N, NW: metade dos vizinhos basta, cada par aparece uma vez
+    for k in range(4):
+        r, c = 1 + DESLOC_LINHA[k], 1 + DESLOC_COLUNA[k]
+        vizinho = rotulo_cercado[r:r + altura, c:c + largura]
+        par = (rotulo > 0) & (vizinho > 0) & (rotulo != vizinho)
+        a.append(rotulo[par])
+        b.append(vizinho[par])
+        cota.append(np.maximum(z[par], z_cercado[r:r + altura, c:c + largura][par]).astype(np.float64))
+    return _menores_arestas(np.concatenate(a), np.concatenate(b), np.concatenate(cota))
+
+
+def _fase_preenchimento(ctx, i):
+    jx0, jy0, jw, jh, dy, dx = _janela(ctx, i)
+    _, _, w, h = ctx["blocos"][i]
+    janela, nodata = _ler_janela(ctx["entrada"], jx0, jy0, jw, jh)
+    janela = janela.astype(np.float32)
+    valido_janela = np.isfinite(janela)
+    if nodata is not None:
+        valido_janela &= janela != np.float32(nodata)
+
+    # Oceano: borda do raster ou vizinha de NoData (o halo diz quem é NoData
+    # do outro lado da borda do bloco)
+    cercado = np.zeros((jh + 2, jw + 2), dtype=bool)
+    cercado[1:-1, 1:-1] = valido_janela
+    oceano = np.zeros((h, w), dtype=bool)
+    for k in range(8):
+        r, c = 1 + dy + DESLOC_LINHA[k], 1 + dx + DESLOC_COLUNA[k]
+        oceano |= ~cercado[r:r + h, c:c + w]
+
+    z = np.ascontiguousarray(janela[dy:dy + h, dx:dx + w])
+    valido = np.ascontiguousarray(valido_janela[dy:dy + h, dx:dx + w])
+    oceano &= valido
+    rotulo, proximo = _preencher_rotulado(z, valido, oceano)
+
+    _salvar(ctx, "z_local", i, z)
+    _salvar(ctx, "rotulo", i, rotulo)
+
+    a, b, cota = _arestas_internas(z, rotulo)
+    borda = np.flatnonzero((_borda(w, h) & valido).reshape(-1))
+    return {
+        "rotulos": int(proximo),
+        "arestas": (a, b, cota),
+        "borda": (_indices_globais(ctx, i, borda), rotulo.reshape(-1)[borda], z.reshape(-1)[borda]),
+    }
+
+
+@_jit
+def _nivel_transbordamento(n, ponteiro, vizinho, cota):
+    """Dijkstra de minimax a partir do OCEANO sobre o grafo dos rótulos."""
+    nivel = np.full(n, np.inf)
+    nivel[OCEANO] = -np.inf
+    fila = [(np.float64(-np.inf), np.int64(OCEANO))]
+    while len(fila) > 0:
+        atual, r = heapq.heappop(fila)
+        if atual > nivel[r]:
+            continue
+        for p in range(ponteiro[r], ponteiro[r + 1]):
+            m = vizinho[p]
+            candidato = max(atual, cota[p])
+            if candidato < nivel[m]:
+                nivel[m] = candidato
+                heapq.heappush(fila, (np.float64(candidato), np.int64(m)))
+    return nivel
+
+
+def _rotulos_globais(rotulo, base):
+    """Rótulos do bloco no grafo global (o oceano é o mesmo em todos)."""
+    return np.where(rotulo == OCEANO, OCEANO, np.where(rotulo > 0, rotulo - (OCEANO + 1) + base, 0))
+
+
+def _resolver_preenchimento(ctx, resultados):
+    """Grafo de rótulos (no bloco e entre blocos) -> nível de cada rótulo."""
+    bases = np.cumsum([OCEANO + 1] + [r["rotulos"] - (OCEANO + 1) for r in resultados])
+    a, b, cota = [], [], []
+    idx, rot, zb, bloco = [], [], [], []
+    for i, r in enumerate(resultados):
+        ra, rb, rc = r["arestas"]
+        a.append(_rotulos_globais(ra, bases[i]))
+        b.append(_rotulos_globais(rb, bases[i]))
+        cota.append(rc)
+        idx.append(r["borda"][0])
+        rot.append(_rotulos_globais(r["borda"][1], bases[i]))
+        zb.append(r["borda"][2])
+        bloco.append(np.full(r["borda"][0].size, i))
+
+    # Arestas entre células vizinhas de blocos diferentes
+    idx, rot, zb, bloco = (np.concatenate(v) for v in (idx, rot, zb, bloco))
+    ordem = np.argsort(idx)
+    idx, rot, zb, bloco = idx[ordem], rot[ordem], zb[ordem], bloco[ordem]
+    linha, coluna = idx // ctx["largura"], idx % ctx["largura"]
+    for k in range(8):
+        nl, nc = linha + DESLOC_LINHA[k], coluna + DESLOC_COLUNA[k]
+        dentro = (nl >= 0) & (nl < ctx["altura"]) & (nc >= 0) & (nc < ctx["largura"])
+        vizinho = np.where(dentro, nl * ctx["largura"] + nc, -1)
+        pos = np.minimum(np.searchsorted(idx, vizinho), idx.size - 1)
+        par = dentro & (idx[pos] == vizinho) & (bloco[pos] != bloco) & (rot[pos] != rot)
+        a.append(rot[par])
+        b.append(rot[pos[par]])
+        cota.append(np.maximum(zb[par], zb[pos[par]]).astype(np.float64))
+
+    a, b, cota = _menores_arestas(np.concatenate(a), np.concatenate(b), np.concatenate(cota))
+    n = int(bases[-1])
+    origem = np.concatenate([a, b])
+    ordem = np.argsort(origem, kind="stable")
+    vizinho = np.concatenate([b, a])[ordem]
+    cota = np.concatenate([cota, cota])[ordem]
+    ponteiro = np.searchsorted(origem[ordem], np.arange(n + 1)).astype(np.int64)
+    nivel = _nivel_transbordamento(n, ponteiro, vizinho.astype(np.int64), cota)
+
+    np.save(os.path.join(ctx["pasta"], "nivel.npy"), nivel)
+    return bases
+
+
+def _fase_cotas(ctx, i, base):
+    z = _carregar(ctx, "z_local", i)
+    rotulo = _carregar(ctx, "rotulo", i)
+    nivel = np.load(os.path.join(ctx["pasta"], "nivel.npy"), mmap_mode="r")
+    valido = rotulo > 0
+    z[valido] = np.maximum(z[valido], nivel[_rotulos_globais(rotulo[valido], base)])
+    z[~valido] = np.float32(NODATA_MDE)
+    _gravar_bloco(ctx, "mde_preenchido", i, z, NODATA_MDE)
+
+
+# 2) DIREÇÃO D8
+
+def _fase_direcao(ctx, i):
+    jx0, jy0, jw, jh, dy, dx = _janela(ctx, i)
+    _, _, w, h = ctx["blocos"][i]
+    janela, nodata = _ler_janela(ctx["mde_preenchido"], jx0, jy0, jw, jh)
+    janela = janela.astype(np.float32)
+    valido = np.isfinite(janela) & (janela != np.float32(nodata))
+
+    g = ctx["geotransform"]
+    direcao = np.ascontiguousarray(_declive_d8(janela, valido, abs(g[1]), abs(g[5]))[dy:dy + h, dx:dx + w])
+
+    # Vizinho válido com a mesma cota: só essas células podem semear um plano
+    cercado = np.full((jh + 2, jw + 2), np.nan, dtype=np.float32)
+    cercado[1:-1, 1:-1] = np.where(valido, janela, np.nan)
+    z = janela[dy:dy + h, dx:dx + w]
+    igual = np.zeros((h, w), dtype=bool)
+    for k in range(8):
+        r, c = 1 + dy + DESLOC_LINHA[k], 1 + dx + DESLOC_COLUNA[k]
+        igual |= cercado[r:r + h, c:c + w] == z
+
+    valido = valido[dy:dy + h, dx:dx + w]
+    marca = np.zeros((h, w), dtype=np.uint8)
+    marca[valido & (direcao != 0) & igual] = SEMENTE
+    marca[valido & (direcao == 0)] = PLANO
+    z = np.ascontiguousarray(z)
+
+    # Planos que não encostam na borda do bloco: a busca em largura fica
+    # toda aqui dentro e dá o mesmo resultado que a busca única do raster
+    externo = _planos_na_borda(marca, z)
+    planos = np.flatnonzero(((marca == PLANO) & ~externo).reshape(-1))
+    sementes = np.flatnonzero(((marca == SEMENTE) & ~externo).reshape(-1))
+    z = z.reshape(-1)
+    codigo = _resolver_planos_esparso(sementes, z[sementes], planos, z[planos], w, h)
+    direcao.reshape(-1)[planos] = codigo
+    _salvar(ctx, "direcao", i, direcao)
+
+    planos = np.flatnonzero(((marca == PLANO) & externo).reshape(-1))
+    sementes = np.flatnonzero(((marca == SEMENTE) & externo).reshape(-1))
+    return {
+        "planos": (_indices_globais(ctx, i, planos), z[planos]),
+        "sementes": (_indices_globais(ctx, i, sementes), z[sementes]),
+    }
+
+
+@_jit
+def _planos_na_borda(marca, z):
+    """
+    Células de plano / semente ligadas (mesma cota, 8 vizinhos, passando por
+    células de plano) a uma célula de plano ou semente da borda do bloco.
+    Esses planos podem continuar no bloco vizinho.
+    """
+    h, w = marca.shape
+    externo = np.zeros((h, w), dtype=np.bool_)
+    fila = np.empty(h * w, dtype=np.int64)
+    fim = 0
+    for i in range(h):
+        for j in range(w):
+            if marca[i, j] != 0 and (i == 0 or j == 0 or i == h - 1 or j == w - 1):
+                externo[i, j] = True
+                fila[fim] = i * w + j
+                fim += 1
+
+    inicio = 0
+    while inicio < fim:
+        c = fila[inicio]
+        inicio += 1
+        ci = c // w
+        cj = c % w
+        for k in range(8):
+            ni = ci + DESLOC_LINHA[k]
+            nj = cj + DESLOC_COLUNA[k]
+            if ni < 0 or nj < 0 or ni >= h or nj >= w:
+                continue
+            if marca[ni, nj] == 0 or externo[ni, nj] or z[ni, nj] != z[ci, cj]:
+                continue
+            # Semente com semente não se liga (a busca só anda para planos)
+            if marca[ni, nj] != PLANO and marca[ci, cj] != PLANO:
+                continue
+            externo[ni, nj] = True
+            fila[fim] = ni * w + nj
+            fim += 1
+
+    return externo
+
+
+@_jit
+def _resolver_planos_esparso(semente, z_semente, plano, z_plano, largura, altura):
+    """
+    A busca em largura do hidrologia_numpy._resolver_planos só sobre as
+    células de plano (índices globais ordenados). As sementes entram em
+    ordem de índice, como lá, então o resultado é o mesmo.
+    """
+    n = plano.size
+    codigo = np.zeros(n, dtype=np.uint8)
+    fila = np.empty(semente.size + n, dtype=np.int64)
+    fila_z = np.empty(semente.size + n, dtype=np.float32)
+    fila[:semente.size] = semente
+    fila_z[:semente.size] = z_semente
+    inicio = 0
+    fim = semente.size
+
+    while inicio < fim:
+        c = fila[inicio]
+        zc = fila_z[inicio]
+        inicio += 1
+        ci = c // largura
+        cj = c % largura
+        for k in range(8):
+            ni = ci + DESLOC_LINHA[k]
+            nj = cj + DESLOC_COLUNA[k]
+            if ni < 0 or nj < 0 or ni >= altura or nj >= largura:
+                continue
+            vizinho = ni * largura + nj
+            p = np.searchsorted(plano, vizinho)
+            if p >= n or plano[p] != vizinho or codigo[p] != 0 or z_plano[p] != zc:
+                continue
+            codigo[p] = CODIGOS_GRASS[(k + 4) % 8]
+            fila[fim] = vizinho
+            fila_z[fim] = zc
+            fim += 1
+
+    return codigo
+
+
+def _resolver_direcao(ctx, resultados):
+    plano = np.concatenate([r["planos"][0] for r in resultados])
+    z_plano = np.concatenate([r["planos"][1] for r in resultados])
+    semente = np.concatenate([r["sementes"][0] for r in resultados])
+    z_semente = np.concatenate([r["sementes"][1] for r in resultados])
+    ordem = np.argsort(plano)
+    plano, z_plano = plano[ordem], z_plano[ordem]
+    ordem = np.argsort(semente)
+    semente, z_semente = semente[ordem], z_semente[ordem]
+
+    codigo = _resolver_planos_esparso(
+        semente, z_semente, plano, z_plano, ctx["largura"], ctx["altura"]
+    )
+    resolvido = codigo != 0
+    return _por_bloco(ctx, plano[resolvido], codigo[resolvido])
+
+
+# 3) ACUMULAÇÃO
+
+def _ate_sair(direcao, indices):
+    """Última célula do bloco no caminho de cada índice (local)."""
+    altura, largura = direcao.shape
+    plana = direcao.reshape(-1)
+    atual = indices.copy()
+    ativos = np.arange(indices.size)
+    while ativos.size:
+        receptor, ok = receptores(atual[ativos], plana, largura, altura)
+        ativos = ativos[ok]
+        atual[ativos] = receptor[ok]
+    return atual
+
+
+def _fase_acumulacao_local(ctx, i, locais, codigos):
+    x0, y0, w, h = ctx["blocos"][i]
+    direcao = _carregar(ctx, "direcao", i)
+    direcao.reshape(-1)[locais] = codigos
+    _salvar(ctx, "direcao", i, direcao)
+    _gravar_bloco(ctx, "direcao", i, direcao, NODATA_DIRECAO)
+
+    acumulacao = acumulacao_numpy.acumular(direcao)
+
+    # Saídas: células da borda que drenam para fora do bloco (e para dentro do raster)
+    borda = np.flatnonzero((_borda(w, h) & (direcao != NODATA_DIRECAO)).reshape(-1))
+    k = direcao.reshape(-1)[borda] % 8
+    linha = y0 + borda // w + DESLOC_LINHA[k]
+    coluna = x0 + borda % w + DESLOC_COLUNA[k]
+    fora = (linha < y0) | (linha >= y0 + h) | (coluna < x0) | (coluna >= x0 + w)
+    fora &= (linha >= 0) & (linha < ctx["altura"]) & (coluna >= 0) & (coluna < ctx["largura"])
+    saida = borda[fora]
+
+    return {
+        "saidas": (
+            _indices_globais(ctx, i, saida),
+            linha[fora] * ctx["largura"] + coluna[fora],
+            acumulacao.reshape(-1)[saida].astype(np.int64),
+        ),
+        # Entradas: qualquer célula da borda pode receber de fora
+        "entradas": (_indices_globais(ctx, i, borda), _indices_globais(ctx, i, _ate_sair(direcao, borda))),
+    }
+
+
+def _resolver_acumulacao(ctx, resultados):
+    """Quanto entra de fora em cada célula de borda (grafo saída -> entrada)."""
+    saida = np.concatenate([r["saidas"][0] for r in resultados])
+    receptor = np.concatenate([r["saidas"][1] for r in resultados])
+    total = np.concatenate([r["saidas"][2] for r in resultados])
+    entrada = np.concatenate([r["entradas"][0] for r in resultados])
+    fim_entrada = np.concatenate([r["entradas"][1] for r in resultados])
+
+    ordem = np.argsort(entrada)
+    entrada, fim_entrada = entrada[ordem], fim_entrada[ordem]
+    ordem = np.argsort(saida)
+    saida, receptor, total = saida[ordem], receptor[ordem], total[ordem]
+
+    def posicao(ordenado, valores):
+        pos = np.minimum(np.searchsorted(ordenado, valores), max(ordenado.size - 1, 0))
+        achou = (ordenado[pos] == valores) if ordenado.size else np.zeros(valores.shape, dtype=bool)
+        return pos, achou
+
+    # Cada saída leva a no máximo uma outra saída (a do bloco em que entra)
+    pos_entrada, recebe = posicao(entrada, receptor)
+    seguinte = np.full(saida.size, -1, dtype=np.int64)
+    pos_saida, achou = posicao(saida, fim_entrada[pos_entrada[recebe]])
+    seguinte[np.flatnonzero(recebe)[achou]] = pos_saida[achou]
+
+    # Kahn sobre as saídas
+    ligada = seguinte >= 0
+    grau = np.bincount(seguinte[ligada], minlength=saida.size)
+    frente = np.flatnonzero(grau == 0)
+    while frente.size:
+        frente = frente[seguinte[frente] >= 0]
+        destino = seguinte[frente]
+        np.add.at(total, destino, total[frente])
+        np.subtract.at(grau, destino, 1)
+        frente = np.unique(destino[grau[destino] == 0])
+
+    vindo_de_fora = np.zeros(entrada.size, dtype=np.int64)
+    np.add.at(vindo_de_fora, pos_entrada[recebe], total[recebe])
+    tem = vindo_de_fora > 0
+    return _por_bloco(ctx, entrada[tem], vindo_de_fora[tem])
+
+
+def _fase_acumulacao(ctx, i, locais, vindo_de_fora):
+    direcao = _carregar(ctx, "direcao", i)
+    entrada = np.zeros(direcao.shape, dtype=np.uint32)
+    entrada.reshape(-1)[locais] = vindo_de_fora
+    _gravar_bloco(ctx, "acumulacao", i, acumulacao_numpy.acumular(direcao, entrada=entrada),
+                  NODATA_ACUMULACAO)
+
+
+# 4) TRECHOS
+
+def _fase_trechos(ctx, i):
+    jx0, jy0, jw, jh, dy, dx = _janela(ctx, i)
+    _, _, w, h = ctx["blocos"][i]
+    direcao_janela = _ler_janela(ctx["direcao"], jx0, jy0, jw, jh)[0].astype(np.uint8)
+    acumulacao_janela = _ler_janela(ctx["acumulacao"], jx0, jy0, jw, jh)[0]
+    threshold = ctx["threshold"]
+
+    # Doadoras de rio de cada célula, contando as do halo
+    rio = np.flatnonzero(acumulacao_janela.reshape(-1) >= threshold)
+    receptor, ok = receptores(rio, direcao_janela.reshape(-1), jw, jh)
+    rio, receptor = rio[ok], receptor[ok]
+    doadoras_janela = np.zeros(jh * jw, dtype=np.uint8)
+    np.add.at(doadoras_janela, receptor, 1)
+
+    # Trechos que vêm do halo: a célula do bloco tem uma doadora, e ela está fora
+    no_bloco = np.zeros((jh, jw), dtype=bool)
+    no_bloco[dy:dy + h, dx:dx + w] = True
+    no_bloco = no_bloco.reshape(-1)
+    vem_de_fora = ~no_bloco[rio] & no_bloco[receptor] & (doadoras_janela[receptor] == 1)
+
+    def do_bloco(indices_janela):
+        return (indices_janela // jw - dy) * w + indices_janela % jw - dx
+
+    def da_janela(indices_janela):
+        return (jy0 + indices_janela // jw) * ctx["largura"] + jx0 + indices_janela % jw
+
+    entrada = do_bloco(receptor[vem_de_fora])
+    doadora = da_janela(rio[vem_de_fora])
+
+    direcao = np.ascontiguousarray(direcao_janela[dy:dy + h, dx:dx + w])
+    acumulacao = acumulacao_janela[dy:dy + h, dx:dx + w].reshape(-1)
+    doadoras = doadoras_janela.reshape(jh, jw)[dy:dy + h, dx:dx + w].reshape(-1)
+    rotulo = np.zeros(h * w, dtype=np.uint32)
+
+    # Como em acumulacao_numpy.extrair_trechos; as entradas levam um rótulo
+    # provisório (índice + 1 da entrada, que não é rótulo de ninguém)
+    atual = np.concatenate([np.flatnonzero((acumulacao >= threshold) & (doadoras != 1)), entrada])
+    valor = (_indices_globais(ctx, i, atual) + 1).astype(np.uint32)
+    rotulo[atual] = valor
+    while atual.size:
+        receptor, ok = receptores(atual, direcao.reshape(-1), w, h)
+        receptor, valor = receptor[ok], valor[ok]
+        segue = doadoras[receptor] == 1
+        atual, valor = receptor[segue], valor[segue]
+        rotulo[atual] = valor
+
+    _salvar(ctx, "trechos", i, rotulo.reshape(h, w))
+    borda = np.flatnonzero(_borda(w, h).reshape(-1) & (rotulo > 0))
+    return {
+        "entradas": (_indices_globais(ctx, i, entrada), doadora),
+        "borda": (_indices_globais(ctx, i, borda), rotulo[borda]),
+    }
+
+
+def _resolver_trechos(resultados):
+    """Rótulo final de cada rótulo provisório: o da doadora, do outro lado."""
+    provisorio = np.concatenate([r["entradas"][0] for r in resultados]) + 1
+    doadora = np.concatenate([r["entradas"][1] for r in resultados])
+    borda = np.concatenate([r["borda"][0] for r in resultados])
+    rotulo_borda = np.concatenate([r["borda"][1] for r in resultados]).astype(np.int64)
+
+    ordem = np.argsort(provisorio)
+    provisorio, doadora = provisorio[ordem], doadora[ordem]
+    ordem = np.argsort(borda)
+    borda, rotulo_borda = borda[ordem], rotulo_borda[ordem]
+
+    final = rotulo_borda[np.searchsorted(borda, doadora)]
+    while provisorio.size:
+        pos = np.minimum(np.searchsorted(provisorio, final), provisorio.size - 1)
+        ainda = provisorio[pos] == final
+        if not ainda.any():
+            break
+        final[ainda] = rotulo_borda[np.searchsorted(borda, doadora[pos[ainda]])]
+    return provisorio, final
+
+
+def _fase_rotulos(ctx, i, provisorio, final):
+    rotulo = _carregar(ctx, "trechos", i)
+    if provisorio.size:
+        pos = np.minimum(np.searchsorted(provisorio, rotulo), provisorio.size - 1)
+        trocar = provisorio[pos] == rotulo
+        rotulo[trocar] = final[pos[trocar]]
+    _gravar_bloco(ctx, "trechos", i, rotulo, NODATA_TRECHO)
+
+
+# EXECUÇÃO
+
+def _mapear(pool, funcao, ctx, argumentos=None):
+    """funcao(ctx, i, *argumentos[i]) em cada bloco, resultados na ordem."""
+    argumentos = argumentos or [()] * len(ctx["blocos"])
+    if pool is None:
+        return [funcao(ctx, i, *a) for i, a in enumerate(argumentos)]
+    futuros = [pool.submit(funcao, ctx, i, *a) for i, a in enumerate(argumentos)]
+    return [f.result() for f in futuros]
+
+
+def processar_blocos(entrada, saidas, threshold=None, tamanho=TAMANHO_BLOCO, processos=None,
+                     cfg=None, pasta_trabalho=None, log=print):
+    """
+    MDE sem depressão, direção, acumulação e trechos de um MDE grande, em blocos.
+    - saidas: dict {parâmetro: caminho} com as de SAIDAS_BLOCOS desejadas
+      ("direction" e "drainage" são a mesma direção D8)
+    - threshold: obrigatório se 'stream' estiver em saidas
+    - processos: tamanho do pool (padrão: núcleos da máquina; 1 = sem pool)
+    Retorna dict com saidas, número de blocos e tempo de cada fase.
+    """
+    from config_raster import config
+
+    desconhecidas = set(saidas) - set(SAIDAS_BLOCOS)
+    if desconhecidas:
+        raise Exception(f"O modo em blocos não gera: {sorted(desconhecidas)}")
+    if "stream" in saidas and not threshold:
+        raise Exception("A saída 'stream' precisa de threshold.")
+
+    cfg = cfg or config()
+    processos = processos or os.cpu_count() or 1
+    largura, altura, geotransform, projecao = _info(entrada)
+    pasta = tempfile.mkdtemp(prefix="hidrologia_blocos_", dir=pasta_trabalho)
+    ctx = {
+        "entrada": entrada,
+        "largura": largura,
+        "altura": altura,
+        "tamanho": tamanho,
+        "blocos": grade_blocos(largura, altura, tamanho),
+        "geotransform": geotransform,
+        "projecao": projecao,
+        "pasta": pasta,
+        "cfg": cfg,
+        "threshold": threshold,
+    }
+    log(f"Modo em blocos: {largura} x {altura} células, {len(ctx['blocos'])} blocos de "
+        f"até {tamanho} x {tamanho}, {processos} processos.")
+
+    pool = None
+    if processos > 1 and len(ctx["blocos"]) > 1:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        from processos import executavel_python
+
+        contexto = multiprocessing.get_context("spawn")
+        contexto.set_executable(executavel_python())
+        pool = ProcessPoolExecutor(processos, mp_context=contexto)
+
+    tempos = {}
+    try:
+        inicio = time.perf_counter()
+        bases = _resolver_preenchimento(ctx, _mapear(pool, _fase_preenchimento, ctx))
+        _mapear(pool, _fase_cotas, ctx, [(b,) for b in bases[:-1]])
+        ctx["mde_preenchido"] = _mosaico(ctx, "mde_preenchido")
+        tempos["preenchimento"] = time.perf_counter() - inicio
+        log("Blocos: preenchimento de depressões concluído.")
+
+        if set(saidas) - {"output"}:
+            inicio = time.perf_counter()
+            planos = _resolver_direcao(ctx, _mapear(pool, _fase_direcao, ctx))
+            locais = _mapear(pool, _fase_acumulacao_local, ctx, planos)
+            ctx["direcao"] = _mosaico(ctx, "direcao")
+            tempos["direcao"] = time.perf_counter() - inicio
+            log("Blocos: direção de fluxo concluída.")
+
+        if {"accumulation", "stream"} & set(saidas):
+            inicio = time.perf_counter()
+            _mapear(pool, _fase_acumulacao, ctx, _resolver_acumulacao(ctx, locais))
+            ctx["acumulacao"] = _mosaico(ctx, "acumulacao")
+            tempos["acumulacao"] = time.perf_counter() - inicio
+            log("Blocos: acumulação concluída.")
+
+        if "stream" in saidas:
+            inicio = time.perf_counter()
+            provisorio, final = _resolver_trechos(_mapear(pool, _fase_trechos, ctx))
+            _mapear(pool, _fase_rotulos, ctx, [(provisorio, final)] * len(ctx["blocos"]))
+            ctx["trechos"] = _mosaico(ctx, "trechos")
+            tempos["trechos"] = time.perf_counter() - inicio
+            log("Blocos: trechos de drenagem concluídos.")
+
+        inicio = time.perf_counter()
+        origens = {
+            "output": ("mde_preenchido", True),
+            "direction": ("direcao", False),
+            "drainage": ("direcao", False),
+            "accumulation": ("acumulacao", False),
+            "stream": ("trechos", False),
+        }
+        for nome, caminho in saidas.items():
+            etapa, flutuante = origens[nome]
+            _exportar(ctx[etapa], caminho, cfg, flutuante)
+        tempos["gravacao"] = time.perf_counter() - inicio
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    return {"saidas": dict(saidas), "blocos": len(ctx["blocos"]), "tempos": tempos}
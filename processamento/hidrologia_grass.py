@@ -0,0 +1,251 @@
+"""
+Parâmetros dos algoritmos hidrológicos do GRASS (r.watershed) calculados
+a partir do tamanho do raster e da memória livre da máquina.
+
+O r.watershed roda todo em memória (modo RAM) ou, com a flag -m, em modo
+segmentado (disco + cache do tamanho de 'memory'). O script usava sempre
+memory=300 e -m desligado: MDEs grandes ficavam lentos e, quando passavam
+da RAM, falhavam em vez de ir para o modo segmentado.
+"""
+import math
+import os
+import sys
+
+# Segundo o manual do r.watershed, o modo RAM usa ~31 bytes por célula
+BYTES_POR_CELULA_RAM = 31
+
+# Folga sobre a estimativa e fração da RAM livre que aceitamos usar
+FOLGA = 1.15
+FRACAO_RAM_LIVRE = 0.8
+
+# Mínimo de cache no modo segmentado (abaixo disso fica lento demais)
+MEMORIA_MINIMA_MB = 300
+
+# Cada saída raster do GRASS ocupa ~4 bytes por célula (CELL/FCELL) no
+# banco do GRASS e de novo no GeoTIFF exportado
+BYTES_POR_CELULA_SAIDA = 4 * 2
+
+
+def memoria_livre_mb():
+    """RAM disponível em MB (None se não for possível descobrir)."""
+    try:
+        import psutil
+
+        return psutil.virtual_memory().available / (1024 * 1024)
+    except ImportError:
+        pass
+
+    if sys.platform.startswith("linux"):
+        with open("/proc/meminfo") as f:
+            for linha in f:
+                if linha.startswith("MemAvailable:"):
+                    return int(linha.split()[1]) / 1024
+
+    if sys.platform == "win32":
+        import ctypes
+
+        class MEMORYSTATUSEX(ctypes.Structure):
+            _fields_ = [
+                ("dwLength", ctypes.c_ulong),
+                ("dwMemoryLoad", ctypes.c_ulong),
+                ("ullTotalPhys", ctypes.c_ulonglong),
+                ("ullAvailPhys", ctypes.c_ulonglong),
+                ("ullTotalPageFile", ctypes.c_ulonglong),
+                ("ullAvailPageFile", ctypes.c_ulonglong),
+                ("ullTotalVirtual", ctypes.c_ulonglong),
+                ("ullAvailVirtual", ctypes.c_ulonglong),
+                ("ullAvailExtendedVirtual", ctypes.c_ulonglong),
+            ]
+
+        status = MEMORYSTATUSEX()
+        status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+        ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status))
+        return status.ullAvailPhys / (1024 * 1024)
+
+    if sys.platform == "darwin" and hasattr(os, "sysconf"):
+        # Sem psutil no macOS: aproximação pelas páginas livres
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_AVPHYS_PAGES") / (1024 * 1024)
+
+    return None
+
+
+def decidir_memoria_watershed(largura, altura, livre_mb=None):
+    """
+    Escolhe 'memory' e a flag -m do r.watershed.
+    Retorna dict com celulas, necessaria_mb, livre_mb, memoria_mb,
+    segmentado e motivo (texto para o log).
+    """
+    celulas = largura * altura
+    necessaria_mb = math.ceil(celulas * BYTES_POR_CELULA_RAM * FOLGA / (1024 * 1024))
+    if livre_mb is None:
+        livre_mb = memoria_livre_mb()
+
+    if livre_mb is None:
+        # Sem informação da máquina: RAM se for pequeno, senão segmentado com folga
+        segmentado = necessaria_mb > 4096
+        memoria_mb = max(MEMORIA_MINIMA_MB, min(necessaria_mb, 4096))
+        motivo = "memória livre desconhecida"
+    else:
+        utilizavel_mb = int(livre_mb * FRACAO_RAM_LIVRE)
+        segmentado = necessaria_mb > utilizavel_mb
+        if segmentado:
+            memoria_mb = max(MEMORIA_MINIMA_MB, utilizavel_mb)
+            motivo = f"precisa de ~{necessaria_mb} MB e só ~{utilizavel_mb} MB estão livres"
+        else:
+            memoria_mb = max(MEMORIA_MINIMA_MB, necessaria_mb)
+            motivo = f"~{necessaria_mb} MB cabem nos ~{utilizavel_mb} MB livres"
+
+    return {
+        "celulas": celulas,
+        "necessaria_mb": necessaria_mb,
+        "livre_mb": livre_mb,
+        "memoria_mb": int(memoria_mb),
+        "segmentado": segmentado,
+        "motivo": motivo,
+    }
+
+
+def disco_estimado_mb(largura, altura, n_saidas, segmentado=False):
+    """Disco temporário aproximado (saídas do GRASS + arquivos de segmento)."""
+    celulas = largura * altura
+    total = celulas * BYTES_POR_CELULA_SAIDA * n_saidas
+    if segmentado:
+        total += celulas * BYTES_POR_CELULA_RAM
+    return math.ceil(total / (1024 * 1024))
+
+
+def descrever_decisao(decisao):
+    modo = "segmentado (-m, disco)" if decisao["segmentado"] else "todo em RAM"
+    return (
+        f"r.watershed: {decisao['celulas']:,} células, modo {modo}, "
+        f"memory={decisao['memoria_mb']} MB ({decisao['motivo']})"
+    )
+
+
+# SELEÇÃO DE SAÍDAS
+#
+# Cada saída pedida ao GRASS é um raster do tamanho do MDE calculado e
+# exportado. Só entram nos parâmetros as saídas escolhidas; as que o
+# algoritmo exige (r.fill.dir: output e direction) vão para
+# TEMPORARY_OUTPUT se não forem escolhidas.
+# nome do parâmetro -> (descrição, arquivo sugerido, nome da camada)
+
+SAIDAS_FILLDIR = {
+    "output": ("MDE sem depressão (r.fill.dir)", "mde_sem_depressao.tif", "MDE_sem_depressao"),
+    "direction": ("direção de fluxo (r.fill.dir)", "direcao_fluxo_filldir.tif", "Direcao_fluxo_filldir"),
+    "areas": ("áreas problemáticas (r.fill.dir)", "areas_problema_filldir.tif", "Areas_problema_filldir"),
+}
+OBRIGATORIAS_FILLDIR = ("output", "direction")
+
+SAIDAS_WATERSHED = {
+    "accumulation": ("número de células que drenam (acumulação)", "acumulacao_celulas.tif", "Acumulacao_celulas"),
+    "drainage": ("direção de drenagem", "direcao_drenagem.tif", "Direcao_drenagem"),
+    "basin": ("bacias", "bacias.tif", "Bacias"),
+    "stream": ("segmentos de fluxo (stream)", "segmentos_fluxo.tif", "Segmentos_fluxo"),
+    "half_basin": ("meias-bacias", "meias_bacias.tif", "Meias_bacias"),
+    "length_slope": ("fator LS (comprimento de rampa)", "fator_ls.tif", "Fator_LS"),
+    "slope_steepness": ("fator S (declividade)", "fator_s.tif", "Fator_S"),
+    "tci": ("índice topográfico (TCI)", "tci.tif", "TCI"),
+    "spi": ("índice de potência do escoamento (SPI)", "spi.tif", "SPI"),
+}
+
+
+# Saídas em ponto flutuante (DCELL); as demais são inteiras (CELL)
+SAIDAS_FLUTUANTES = {"output", "accumulation", "length_slope", "slope_steepness", "tci", "spi"}
+
+
+def tem_saida_inteira(saidas):
+    """True se alguma das saídas pedidas é um raster inteiro (ver params_grass)."""
+    return any(nome not in SAIDAS_FLUTUANTES for nome in saidas)
+
+
+def validar_saidas(selecionadas, disponiveis):
+    desconhecidas = set(selecionadas) - set(disponiveis)
+    if desconhecidas:
+        raise Exception(
+            f"Saídas desconhecidas: {sorted(desconhecidas)}. Opções: {list(disponiveis)}"
+        )
+
+
+def params_filldir(entrada, saidas, opcoes_grass):
+    """
+    Parâmetros do grass7:r.fill.dir.
+    - saidas: dict {parâmetro: caminho} só com as saídas escolhidas
+    """
+    validar_saidas(saidas, SAIDAS_FILLDIR)
+    params = {
+        'input': entrada,                  # Elevation (raster recortado)
+        'format': 0,                       # 0 = grass (formato da direção)
+        'f': False,                        # não usar "Find unresolved areas only"
+        'GRASS_REGION_PARAMETER': entrada,
+        'GRASS_REGION_CELLSIZE_PARAMETER': 0,  # 0 = usar resolução do raster
+        **opcoes_grass
+    }
+    for nome in OBRIGATORIAS_FILLDIR:
+        params[nome] = saidas.get(nome, 'TEMPORARY_OUTPUT')
+    params.update(saidas)
+    return params
+
+
+def params_watershed(elevacao, threshold, saidas, decisao_memoria, opcoes_grass):
+    """
+    Parâmetros do grass7:r.watershed.
+    - saidas: dict {parâmetro: caminho} só com as saídas escolhidas
+      (as demais nem são pedidas ao GRASS)
+    - decisao_memoria: resultado de decidir_memoria_watershed
+    """
+    validar_saidas(saidas, SAIDAS_WATERSHED)
+    if not saidas:
+        raise Exception("Nenhuma saída do r.watershed foi escolhida.")
+
+    params = {
+        'elevation': elevacao,           # DEM sem depressão
+        'depression': None,
+        'flow': None,
+        'disturbed_land': None,
+        'blocking': None,
+        'threshold': threshold,
+        'max_slope_length': 0,
+        'convergence': 5,
+        'memory': decisao_memoria['memoria_mb'],   # calculado pelo tamanho do raster e RAM livre
+        # flags
+        's': False,
+        'm': decisao_memoria['segmentado'],        # modo segmentado só se não couber na RAM
+        '4': False,
+        'a': False,
+        'b': False,
+        'GRASS_REGION_PARAMETER': elevacao,
+        'GRASS_REGION_CELLSIZE_PARAMETER': 0,
+        **opcoes_grass
+    }
+    params.update(saidas)
+    return params
+
+
+def params_stream_extract(elevacao, acumulacao, threshold, saidas, memoria_mb, opcoes_grass):
+    """
+    Parâmetros do grass7:r.stream.extract, usando a acumulação já calculada
+    pelo r.watershed (só extrai a rede; não refaz o fluxo).
+    - saidas: dict com 'stream_raster' e/ou 'stream_vector'
+    """
+    params = {
+        'elevation': elevacao,           # DEM sem depressão
+        'accumulation': acumulacao,      # acumulação do r.watershed
+        'depression': None,
+        'threshold': threshold,
+        'd8cut': None,                   # padrão: infinito (MFD em toda a rede)
+        'mexp': 0,
+        'stream_length': 0,
+        'memory': memoria_mb,
+        'stream_raster': 'TEMPORARY_OUTPUT',
+        'stream_vector': 'TEMPORARY_OUTPUT',
+        'GRASS_REGION_PARAMETER': elevacao,
+        'GRASS_REGION_CELLSIZE_PARAMETER': 0,
+        'GRASS_OUTPUT_TYPE_PARAMETER': 2,   # linhas
+        'GRASS_VECTOR_DSCO': '',
+        'GRASS_VECTOR_LCO': '',
+        'GRASS_VECTOR_EXPORT_NOCAT': False,
+        **opcoes_grass
+    }
+    params.update(saidas)
+    return params
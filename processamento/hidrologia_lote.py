@@ -0,0 +1,287 @@
+"""
+Executa o fluxo hidrológico (fluxo_hidrologia.py) em lote, sem o QGIS aberto
+e sem caixas de diálogo.
+
+Uso (Python do QGIS, ex.: OSGeo4W Shell com python-qgis):
+    python hidrologia_lote.py tarefas.yaml --processos 3
+    python hidrologia_lote.py sub_01.json sub_02.json --processos 2
+
+Cada arquivo de tarefas (JSON ou YAML) pode ter:
+- uma tarefa (dict, ver TAREFA_PADRAO em fluxo_hidrologia.py)
+- uma lista de tarefas
+- {"padrao": {...}, "tarefas": [...]}: 'padrao' vale para todas as tarefas
+
+    padrao:
+      entrada: D:/anadem/anadem_sc.tif
+      crs_destino: 31982
+      threshold: 1000
+    tarefas:
+      - {mascara: D:/bacias/sub_01.gpkg, pasta_saida: D:/saida/sub_01}
+      - {mascara: D:/bacias/sub_02.gpkg, pasta_saida: D:/saida/sub_02, threshold: 500}
+
+Cada tarefa roda num processo próprio (o Processing não é seguro entre
+threads), até --processos ao mesmo tempo. Threads do GDAL e RAM do
+r.watershed são divididas entre os processos, salvo se a tarefa definir
+as suas. Cada tarefa grava resultado_hidrologia.json (sucesso ou erro) e
+hidrologia.log na sua pasta_saida.
+
+Os recortes ficam no cache de cache_intermediarios.py (compartilhado entre
+os processos); --sem-cache refaz tudo sem ler nem gravar no cache.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+
+PASTA_SCRIPT = os.path.dirname(os.path.abspath(__file__))
+if PASTA_SCRIPT not in sys.path:
+    sys.path.insert(0, PASTA_SCRIPT)
+
+# Módulos compartilhados entre as pastas (comum/)
+PASTA_COMUM = os.path.join(os.path.dirname(PASTA_SCRIPT), "comum")
+if PASTA_COMUM not in sys.path:
+    sys.path.insert(0, PASTA_COMUM)
+
+NOME_LOG = "hidrologia.log"
+
+# Mesmo nome usado por fluxo_hidrologia.gravar_resultado (aqui sem importar o QGIS)
+NOME_RESULTADO = "resultado_hidrologia.json"
+
+
+def ler_arquivo_tarefas(caminho):
+    """Lista de tarefas de um arquivo JSON ou YAML."""
+    with open(caminho, encoding="utf-8") as f:
+        if caminho.lower().endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise Exception("Para ler YAML instale o PyYAML (ou use JSON).")
+            dados = yaml.safe_load(f)
+        else:
+            dados = json.load(f)
+
+    if isinstance(dados, dict) and "tarefas" in dados:
+        padrao = dados.get("padrao") or {}
+        return [{**padrao, **tarefa} for tarefa in dados["tarefas"]]
+    if isinstance(dados, dict):
+        return [dados]
+    if isinstance(dados, list):
+        return dados
+    raise Exception(f"Formato de tarefas não reconhecido: {caminho}")
+
+
+def dividir_recursos(tarefas, processos):
+    """
+    Com vários processos ao mesmo tempo, cada um fica com uma parte das
+    threads e da RAM livre (se a tarefa não disser o contrário).
+    """
+    from hidrologia_grass import memoria_livre_mb
+
+    if processos <= 1:
+        return tarefas
+
+    threads = max(1, (os.cpu_count() or 1) // processos)
+    livre = memoria_livre_mb()
+    divididas = []
+    for tarefa in tarefas:
+        tarefa = dict(tarefa)
+        cfg = dict(tarefa.get("config_raster") or {})
+        cfg.setdefault("threads", threads)
+        tarefa["config_raster"] = cfg
+        if livre and not tarefa.get("limite_memoria_mb"):
+            tarefa["limite_memoria_mb"] = int(livre / processos)
+        divididas.append(tarefa)
+    return divididas
+
+
+def pasta_da_tarefa(tarefa, indice):
+    """Pasta onde ficam o resultado e o log da tarefa."""
+    if tarefa.get("pasta_saida"):
+        return tarefa["pasta_saida"]
+    caminhos = tarefa.get("caminhos") or {}
+    if caminhos:
+        return os.path.dirname(os.path.abspath(next(iter(caminhos.values()))))
+    return os.path.abspath(f"tarefa_{indice:03d}")
+
+
+def inicializar_qgis():
+    """QGIS sem interface, com o Processing e o provedor do GRASS."""
+    from qgis.core import QgsApplication
+
+    QgsApplication.setPrefixPath(os.environ.get("QGIS_PREFIX_PATH", ""), True)
+    app = QgsApplication([], False)
+    app.initQgis()
+
+    pasta_plugins = os.path.join(QgsApplication.pkgDataPath(), "python", "plugins")
+    if pasta_plugins not in sys.path:
+        sys.path.append(pasta_plugins)
+
+    from processing.core.Processing import Processing
+
+    Processing.initialize()
+
+    # A partir do QGIS 3.36 o GRASS é um plugin separado
+    registro = QgsApplication.processingRegistry()
+    if not registro.providerById("grass7") and not registro.providerById("grass"):
+        try:
+            from grassprovider.grass_provider import GrassProvider
+
+            registro.addProvider(GrassProvider())
+        except ImportError:
+            raise Exception("Provedor do GRASS não encontrado no Processing.")
+
+    return app
+
+
+def rodar_tarefa(arquivo_tarefa):
+    """Executa uma tarefa (dentro do processo filho) e grava o resultado."""
+    with open(arquivo_tarefa, encoding="utf-8") as f:
+        tarefa = json.load(f)
+    pasta = tarefa.pop("_pasta")
+
+    app = None
+    try:
+        app = inicializar_qgis()
+        from fluxo_hidrologia import executar_fluxo
+
+        resultado = executar_fluxo(tarefa)
+    except Exception as e:
+        traceback.print_exc()
+        resultado = {"nome": tarefa.get("nome"), "status": "erro", "erro": str(e), "tarefa": tarefa}
+
+    # Sem QGIS nem o import de fluxo_hidrologia funciona; o erro fica no log
+    from fluxo_hidrologia import gravar_resultado
+
+    gravar_resultado(resultado, pasta)
+    if app is not None:
+        app.exitQgis()
+    return 0 if resultado["status"] != "erro" else 1
+
+
+def executar_lote(tarefas, processos, ao_concluir=None):
+    """
+    Fila de tarefas com até 'processos' processos ao mesmo tempo.
+    - ao_concluir(indice, nome, codigo, segundos): chamado a cada tarefa
+    Retorna lista de (indice, nome, codigo_saida, pasta).
+    """
+    pendentes = list(range(len(tarefas)))
+    rodando = {}    # indice -> (proc, arquivo_log, inicio)
+    concluidas = []
+
+    with tempfile.TemporaryDirectory(prefix="hidrologia_lote_") as pasta_temp:
+        try:
+            while pendentes or rodando:
+                while pendentes and len(rodando) < processos:
+                    indice = pendentes.pop(0)
+                    tarefa = dict(tarefas[indice])
+                    pasta = pasta_da_tarefa(tarefa, indice)
+                    os.makedirs(pasta, exist_ok=True)
+                    tarefa["_pasta"] = pasta
+
+                    arquivo_tarefa = os.path.join(pasta_temp, f"tarefa_{indice}.json")
+                    with open(arquivo_tarefa, "w", encoding="utf-8") as f:
+                        json.dump(tarefa, f, ensure_ascii=False)
+
+                    arquivo_log = open(os.path.join(pasta, NOME_LOG), "w", encoding="utf-8")
+                    proc = subprocess.Popen(
+                        [sys.executable, os.path.abspath(__file__), "--tarefa", arquivo_tarefa],
+                        stdout=arquivo_log,
+                        stderr=subprocess.STDOUT,
+                        creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0)
+                    )
+                    rodando[indice] = (proc, arquivo_log, time.perf_counter())
+
+                for indice in list(rodando):
+                    proc, arquivo_log, inicio = rodando[indice]
+                    if proc.poll() is None:
+                        continue
+                    arquivo_log.close()
+                    del rodando[indice]
+                    nome = tarefas[indice].get("nome") or f"tarefa_{indice}"
+                    concluidas.append((indice, nome, proc.returncode, pasta_da_tarefa(tarefas[indice], indice)))
+                    if ao_concluir:
+                        ao_concluir(indice, nome, proc.returncode, time.perf_counter() - inicio)
+
+                time.sleep(0.5)
+        finally:
+            # Ctrl+C ou erro: não deixa processos do GRASS soltos
+            for proc, arquivo_log, _ in rodando.values():
+                proc.kill()
+                proc.wait()
+                arquivo_log.close()
+
+    return sorted(concluidas)
+
+
+def resumo_cache(concluidas):
+    """Soma as estatísticas de cache gravadas no resultado de cada tarefa."""
+    from cache_intermediarios import descrever_estatisticas
+
+    total = {"ativo": False, "acertos": 0, "falhas": 0, "bytes_reaproveitados": 0,
+             "removidos": 0, "bytes_removidos": 0}
+    for _, _, _, pasta in concluidas:
+        caminho = os.path.join(pasta, NOME_RESULTADO)
+        if not os.path.exists(caminho):
+            continue
+        with open(caminho, encoding="utf-8") as f:
+            estatisticas = json.load(f).get("cache")
+        if not estatisticas:
+            continue
+        total["ativo"] |= estatisticas["ativo"]
+        for campo in total:
+            if campo != "ativo":
+                total[campo] += estatisticas[campo]
+    return descrever_estatisticas(total)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Fluxo hidrológico (recorte + r.fill.dir + r.watershed) em lote, sem QGIS aberto."
+    )
+    parser.add_argument("arquivos", nargs="*", help="arquivos de tarefas (JSON ou YAML)")
+    parser.add_argument("--processos", type=int, default=1,
+                        help="tarefas rodando ao mesmo tempo (padrão: 1)")
+    parser.add_argument("--sem-cache", action="store_true",
+                        help="não usa o cache dos recortes")
+    # Uso interno: uma tarefa só, rodando no processo filho
+    parser.add_argument("--tarefa", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.tarefa:
+        sys.exit(rodar_tarefa(args.tarefa))
+
+    if not args.arquivos:
+        parser.error("informe ao menos um arquivo de tarefas")
+
+    tarefas = []
+    for caminho in args.arquivos:
+        tarefas += ler_arquivo_tarefas(caminho)
+    if args.sem_cache:
+        tarefas = [{**tarefa, "cache": False} for tarefa in tarefas]
+    processos = max(1, min(args.processos, len(tarefas)))
+    tarefas = dividir_recursos(tarefas, processos)
+    print(f"{len(tarefas)} tarefas, {processos} processos.")
+
+    def ao_concluir(indice, nome, codigo, segundos):
+        situacao = "ok" if codigo == 0 else f"ERRO (código {codigo})"
+        print(f"[{indice + 1}/{len(tarefas)}] {nome}: {situacao} em {segundos:.1f} s", flush=True)
+
+    inicio = time.time()
+    concluidas = executar_lote(tarefas, processos, ao_concluir)
+    print(f"\nConcluído em {time.time() - inicio:.1f} s.")
+
+    print(resumo_cache(concluidas))
+
+    erros = [c for c in concluidas if c[2] != 0]
+    for indice, nome, codigo, pasta in erros:
+        print(f"ERRO em {nome}: ver {os.path.join(pasta, NOME_LOG)}")
+    if erros:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
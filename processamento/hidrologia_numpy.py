@@ -0,0 +1,341 @@
+"""
+Preenchimento de depressões e direção de fluxo D8 em NumPy, sem GRASS.
+
+Alternativa ao grass7:r.fill.dir: cada chamada ao GRASS abre uma sessão
+(alguns segundos) e importa/exporta o raster inteiro. Aqui o MDE recortado
+é lido em faixas pelo GDAL para um array e processado no próprio Python:
+
+1. Priority-Flood (Barnes, Lehman & Mulla, 2014, algoritmo 2): a partir das
+   células da borda (e vizinhas de NoData), uma fila de prioridade visita
+   as células em ordem de elevação; quem estiver abaixo do nível de
+   transbordamento é levantado até ele (depressões viram planos).
+2. D8: cada célula aponta para o vizinho de maior declividade
+   (queda / distância, diagonal = raiz(dx² + dy²)). Empates ficam com o
+   primeiro vizinho na ordem E, NE, N, NW, W, SW, S, SE.
+3. Planos (sem vizinho mais baixo): busca em largura a partir das células
+   que já drenam; cada célula do plano aponta para o vizinho de mesma
+   elevação um passo mais perto da saída.
+
+Células de borda sem vizinho mais baixo apontam para fora do raster.
+
+Códigos de direção iguais aos do drainage do r.watershed (1 a 8): 45° *
+código, anti-horário a partir do leste. O r.fill.dir format=grass grava a
+mesma direção em graus (45 = NE ... 360 = L), ou seja, código = graus // 45.
+
+    3 2 1
+    4 . 8
+    5 6 7
+
+0 = NoData (ou célula sem saída, se o MDE não foi preenchido).
+
+Os laços de 2 e 3 são compilados com o Numba quando ele está instalado
+(bem mais rápido); sem ele rodam em Python puro, com o mesmo resultado.
+
+Memória por célula (alocações reais do fill_dir):
+- preenchimento (pico): MDE lido float32 (4) + cópia preenchida float32
+  (4) + válido (1) + fechado (1) + fila do "poço" int64 (8) = 18 bytes,
+  mais a fila de prioridade, 16 bytes por célula da "frente" do
+  preenchimento com Numba (sem ele, tuplas Python de ~100 bytes); a
+  frente é em geral bem menor que N, mas no pior caso chega a ~N
+- direção: MDE (4) + válido (1) + direção uint8 (1) + fila dos planos
+  int64 (8) = 14 bytes, mais ~35 bytes por célula da faixa do D8
+  (LINHAS_POR_FAIXA linhas de temporários float64)
+Para decidir entre este motor e o GRASS, conte ~25 bytes por célula no
+caso comum (medido com tracemalloc num MDE sintético) e ~35 no pior caso.
+"""
+import heapq
+import math
+
+import numpy as np
+
+try:
+    from numba import njit
+
+    _jit = njit(cache=True)
+    TEM_NUMBA = True
+except ImportError:
+    def _jit(funcao):
+        return funcao
+
+    TEM_NUMBA = False
+
+# Vizinhos na ordem E, NE, N, NW, W, SW, S, SE (linha, coluna)
+DESLOC_LINHA = np.array([0, -1, -1, -1, 0, 1, 1, 1], dtype=np.int64)
+DESLOC_COLUNA = np.array([1, 1, 0, -1, -1, -1, 0, 1], dtype=np.int64)
+
+# Código GRASS de cada vizinho (E = 8, NE = 1, ... SE = 7)
+CODIGOS_GRASS = np.array([8, 1, 2, 3, 4, 5, 6, 7], dtype=np.uint8)
+
+NODATA_DIRECAO = 0
+
+# Linhas por faixa na leitura/gravação e no cálculo do D8
+LINHAS_POR_FAIXA = 1024
+
+
+def indice_do_codigo(codigo):
+    """Posição do código GRASS em DESLOC_LINHA / DESLOC_COLUNA."""
+    return codigo % 8
+
+
+@_jit
+def _preencher(z, valido):
+    """Priority-Flood com fila de "poço" (Barnes 2014, alg. 2). Altera z."""
+    altura, largura = z.shape
+    fechado = np.zeros((altura, largura), dtype=np.bool_)
+    fila_poco = np.empty(altura * largura, dtype=np.int64)
+    inicio = 0
+    fim = 0
+
+    # Lista tipada (o Numba precisa do tipo dos itens)
+    fila = [(np.float64(0.0), np.int64(0))]
+    fila.pop()
+
+    # Sementes: borda do raster e vizinhas de NoData
+    for i in range(altura):
+        for j in range(largura):
+            if not valido[i, j]:
+                continue
+            semente = i == 0 or j == 0 or i == altura - 1 or j == largura - 1
+            if not semente:
+                for k in range(8):
+                    if not valido[i + DESLOC_LINHA[k], j + DESLOC_COLUNA[k]]:
+                        semente = True
+                        break
+            if semente:
+                fechado[i, j] = True
+                heapq.heappush(fila, (np.float64(z[i, j]), np.int64(i * largura + j)))
+
+    while inicio < fim or len(fila) > 0:
+        if inicio < fim:
+            c = fila_poco[inicio]
+            inicio += 1
+        else:
+            c = heapq.heappop(fila)[1]
+        ci = c // largura
+        cj = c % largura
+        zc = z[ci, cj]
+
+        for k in range(8):
+            ni = ci + DESLOC_LINHA[k]
+            nj = cj + DESLOC_COLUNA[k]
+            if ni < 0 or nj < 0 or ni >= altura or nj >= largura:
+                continue
+            if fechado[ni, nj] or not valido[ni, nj]:
+                continue
+            fechado[ni, nj] = True
+            if z[ni, nj] <= zc:
+                # Dentro da depressão: sobe até o nível de transbordamento
+                z[ni, nj] = zc
+                fila_poco[fim] = ni * largura + nj
+                fim += 1
+            else:
+                heapq.heappush(fila, (np.float64(z[ni, nj]), np.int64(ni * largura + nj)))
+
+    return z
+
+
+def preencher_depressoes(z, valido):
+    """MDE sem depressões (float32). Não altera o array de entrada."""
+    return _preencher(np.array(z, dtype=np.float32), np.ascontiguousarray(valido))
+
+
+def _distancias(dx, dy):
+    diagonal = math.hypot(dx, dy)
+    return np.array([dx, diagonal, dy, diagonal, dx, diagonal, dy, diagonal])
+
+
+def _declive_d8(z, valido, dx, dy):
+    """
+    Direção de maior declividade (vetorizado, em faixas). Células de borda
+    sem vizinho mais baixo apontam para fora; planos ficam com 0.
+    """
+    altura, largura = z.shape
+    distancias = _distancias(dx, dy)
+    direcao = np.zeros((altura, largura), dtype=np.uint8)
+
+    for linha in range(0, altura, LINHAS_POR_FAIXA):
+        fim = min(altura, linha + LINHAS_POR_FAIXA)
+        # Faixa com uma linha extra em cima e embaixo (e bordas de NaN)
+        topo, base = max(0, linha - 1), min(altura, fim + 1)
+        zf = np.full((base - topo + 2, largura + 2), np.nan)
+        zf[1:-1, 1:-1] = z[topo:base]
+        vf = np.zeros(zf.shape, dtype=bool)
+        vf[1:-1, 1:-1] = valido[topo:base]
+        zf[~vf] = np.nan
+
+        # Janela central (linhas linha:fim) dentro da faixa
+        i0 = linha - topo + 1
+        n = fim - linha
+        centro = zf[i0:i0 + n, 1:-1]
+        melhor = np.zeros((n, largura))
+        dir_faixa = np.zeros((n, largura), dtype=np.uint8)
+        saida = np.zeros((n, largura), dtype=np.uint8)
+
+        for k in range(8):
+            dr, dc = DESLOC_LINHA[k], DESLOC_COLUNA[k]
+            vizinho = zf[i0 + dr:i0 + dr + n, 1 + dc:1 + dc + largura]
+            with np.errstate(invalid="ignore"):
+                queda = (centro - vizinho) / distancias[k]
+                maior = queda > melhor
+            melhor[maior] = queda[maior]
+            dir_faixa[maior] = CODIGOS_GRASS[k]
+            fora = np.isnan(vizinho) & (saida == 0)
+            saida[fora] = CODIGOS_GRASS[k]
+
+        sem_queda = dir_faixa == 0
+        dir_faixa[sem_queda] = saida[sem_queda]
+        dir_faixa[~valido[linha:fim]] = NODATA_DIRECAO
+        direcao[linha:fim] = dir_faixa
+
+    return direcao
+
+
+@_jit
+def _resolver_planos(z, valido, direcao):
+    """Busca em largura a partir das células que já drenam. Altera direcao."""
+    altura, largura = z.shape
+    fila = np.empty(altura * largura, dtype=np.int64)
+    inicio = 0
+    fim = 0
+    for i in range(altura):
+        for j in range(largura):
+            if direcao[i, j] != 0:
+                fila[fim] = i * largura + j
+                fim += 1
+
+    while inicio < fim:
+        c = fila[inicio]
+        inicio += 1
+        ci = c // largura
+        cj = c % largura
+        for k in range(8):
+            ni = ci + DESLOC_LINHA[k]
+            nj = cj + DESLOC_COLUNA[k]
+            if ni < 0 or nj < 0 or ni >= altura or nj >= largura:
+                continue
+            if direcao[ni, nj] != 0 or not valido[ni, nj] or z[ni, nj] != z[ci, cj]:
+                continue
+            # O vizinho aponta de volta para c (direção oposta a k)
+            direcao[ni, nj] = CODIGOS_GRASS[(k + 4) % 8]
+            fila[fim] = ni * largura + nj
+            fim += 1
+
+    return direcao
+
+
+def direcao_d8(z, valido, dx=1.0, dy=1.0):
+    """
+    Direção D8 (códigos GRASS) do MDE já preenchido.
+    - dx, dy: tamanho da célula (para a distância na diagonal)
+    """
+    direcao = _declive_d8(z, valido, abs(dx), abs(dy))
+    return _resolver_planos(
+        np.ascontiguousarray(z, dtype=np.float32), np.ascontiguousarray(valido), direcao
+    )
+
+
+# LEITURA / GRAVAÇÃO (GDAL)
+
+def ler_mde(caminho):
+    """
+    Lê o MDE em faixas para um array float32.
+    Retorna (z, valido, geotransform, projecao).
+    """
+    from osgeo import gdal
+
+    gdal.UseExceptions()
+    ds = gdal.Open(caminho)
+    banda = ds.GetRasterBand(1)
+    largura, altura = ds.RasterXSize, ds.RasterYSize
+    nodata = banda.GetNoDataValue()
+
+    z = np.empty((altura, largura), dtype=np.float32)
+    for linha in range(0, altura, LINHAS_POR_FAIXA):
+        n = min(LINHAS_POR_FAIXA, altura - linha)
+        z[linha:linha + n] = banda.ReadAsArray(0, linha, largura, n)
+
+    valido = np.isfinite(z)
+    if nodata is not None:
+        valido &= z != np.float32(nodata)
+
+    geotransform, projecao = ds.GetGeoTransform(), ds.GetProjection()
+    ds = None
+    return z, valido, geotransform, projecao
+
+
+def gravar_raster(caminho, array, geotransform, projecao, nodata, cfg=None):
+    """Grava um array 2D em GeoTIFF, em faixas, com as opções de config_raster."""
+    from osgeo import gdal
+    from config_raster import config, opcoes_criacao
+
+    gdal.UseExceptions()
+    cfg = cfg or config()
+    tipos = {
+        np.dtype(np.uint8): gdal.GDT_Byte,
+        np.dtype(np.int16): gdal.GDT_Int16,
+        np.dtype(np.int32): gdal.GDT_Int32,
+        np.dtype(np.uint32): gdal.GDT_UInt32,
+        np.dtype(np.float32): gdal.GDT_Float32,
+        np.dtype(np.float64): gdal.GDT_Float64,
+    }
+    tipo = tipos[array.dtype]
+    # Preditor 3 só vale para ponto flutuante
+    preditor = cfg["preditor"]
+    if preditor and tipo not in (gdal.GDT_Float32, gdal.GDT_Float64):
+        preditor = 2
+    opcoes = opcoes_criacao({**cfg, "preditor": preditor})
+
+    altura, largura = array.shape
+    ds = gdal.GetDriverByName("GTiff").Create(caminho, largura, altura, 1, tipo, opcoes)
+    ds.SetGeoTransform(geotransform)
+    ds.SetProjection(projecao)
+    banda = ds.GetRasterBand(1)
+    if nodata is not None:
+        banda.SetNoDataValue(nodata)
+    for linha in range(0, altura, LINHAS_POR_FAIXA):
+        banda.WriteArray(array[linha:linha + LINHAS_POR_FAIXA], 0, linha)
+    ds.FlushCache()
+    ds = None
+    return caminho
+
+
+def fill_dir(entrada, saida_mde, saida_direcao=None, cfg=None):
+    """
+    Equivalente ao r.fill.dir (MDE sem depressão + direção D8 GRASS).
+    Retorna dict com os caminhos gravados e o tempo de cada parte.
+    """
+    import time
+
+    tempos = {}
+    inicio = time.perf_counter()
+    z, valido, geotransform, projecao = ler_mde(entrada)
+    tempos["leitura"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    z = preencher_depressoes(z, valido)
+    tempos["preenchimento"] = time.perf_counter() - inicio
+
+    nodata = -9999.0
+    inicio = time.perf_counter()
+    gravar_raster(saida_mde, np.where(valido, z, np.float32(nodata)), geotransform, projecao, nodata, cfg)
+    tempos["gravacao_mde"] = time.perf_counter() - inicio
+
+    saidas = {"output": saida_mde}
+    if saida_direcao:
+        inicio = time.perf_counter()
+        direcao = direcao_d8(z, valido, geotransform[1], geotransform[5])
+        tempos["direcao"] = time.perf_counter() - inicio
+        gravar_raster(saida_direcao, direcao, geotransform, projecao, NODATA_DIRECAO, cfg)
+        saidas["direction"] = saida_direcao
+
+    return {"saidas": saidas, "tempos": tempos, "numba": TEM_NUMBA}
+
+
+def gravar_direcao(entrada, saida_direcao, cfg=None):
+    """Só a direção D8 (códigos GRASS) de um MDE que já foi preenchido."""
+    z, valido, geotransform, projecao = ler_mde(entrada)
+    gravar_raster(
+        saida_direcao, direcao_d8(z, valido, geotransform[1], geotransform[5]),
+        geotransform, projecao, NODATA_DIRECAO, cfg
+    )
+    return saida_direcao
@@ -0,0 +1,104 @@
+"""
+Etapas de preparo do MDE sem arquivos temporários intermediários.
+
+O fluxo clássico faz gdal:warpreproject -> TEMPORARY_OUTPUT ->
+gdal:cliprasterbymasklayer -> TEMPORARY_OUTPUT, ou seja, o raster inteiro
+é escrito e lido de volta do disco a cada etapa.
+Aqui a reprojeção e o recorte viram UMA chamada do gdal.Warp com cutline:
+- modo "cutline": grava direto o GeoTIFF já reprojetado e recortado
+- modo "vrt": grava só um VRT (XML); o GRASS lê o VRT ao importar e o
+  raster reprojetado/recortado nunca é escrito por nós
+
+O RelatorioEtapas soma os bytes gravados por etapa, para comparar os modos.
+"""
+import os
+import time
+
+from osgeo import gdal
+
+from formatacao import formatar_bytes
+
+gdal.UseExceptions()
+
+MODOS_PIPELINE = ("classico", "cutline", "vrt")
+
+# NoData usado quando o raster de origem não tem um definido
+NODATA_PADRAO = -9999
+
+
+def tamanho_arquivo(caminho):
+    """Tamanho em bytes (0 se não for arquivo, ex.: 'TEMPORARY_OUTPUT')."""
+    if isinstance(caminho, str) and os.path.isfile(caminho):
+        return os.path.getsize(caminho)
+    return 0
+
+
+class RelatorioEtapas:
+    """Bytes gravados e tempo de cada etapa do fluxo."""
+
+    def __init__(self):
+        self.etapas = []        # (nome, bytes, segundos, arquivos)
+        self._inicio = None
+
+    def iniciar(self):
+        self._inicio = time.perf_counter()
+
+    def registrar(self, nome, *caminhos):
+        segundos = time.perf_counter() - self._inicio if self._inicio else 0.0
+        arquivos = [c for c in caminhos if tamanho_arquivo(c)]
+        total = sum(tamanho_arquivo(c) for c in arquivos)
+        self.etapas.append((nome, total, segundos, arquivos))
+        self._inicio = time.perf_counter()
+
+    def total_bytes(self):
+        return sum(e[1] for e in self.etapas)
+
+    def linhas(self):
+        """Tabela em texto, pronta para print/log."""
+        largura = max([len(e[0]) for e in self.etapas] + [5])
+        saida = [f"{'Etapa':<{largura}}  {'Gravado':>12}  {'Tempo':>8}"]
+        for nome, total, segundos, _ in self.etapas:
+            saida.append(f"{nome:<{largura}}  {formatar_bytes(total):>12}  {segundos:>7.1f}s")
+        saida.append(f"{'TOTAL':<{largura}}  {formatar_bytes(self.total_bytes()):>12}")
+        return saida
+
+
+def reprojetar_recortar(entrada, mascara, crs_destino_wkt, saida,
+                        crs_origem_wkt=None, camada_mascara=None, virtual=False,
+                        opcoes_warp=None):
+    """
+    Reprojeta e recorta o MDE numa única chamada do gdal.Warp.
+    - entrada: caminho do raster de origem
+    - mascara / camada_mascara: arquivo vetorial do recorte (e a camada, se GPKG)
+    - crs_destino_wkt / crs_origem_wkt: SRC em WKT (origem None = o do arquivo)
+    - saida: .tif (materializado) ou .vrt (virtual=True)
+    - opcoes_warp: kwargs extras para gdal.WarpOptions (threads, memória...)
+    Retorna o caminho de saída.
+    """
+    src = gdal.Open(entrada)
+    nodata = src.GetRasterBand(1).GetNoDataValue()
+    src = None
+
+    kwargs = dict(
+        format="VRT" if virtual else "GTiff",
+        dstSRS=crs_destino_wkt,
+        cutlineDSName=mascara,
+        cropToCutline=True,
+        resampleAlg="near",
+        dstNodata=nodata if nodata is not None else NODATA_PADRAO,
+    )
+    if crs_origem_wkt:
+        kwargs["srcSRS"] = crs_origem_wkt
+    if camada_mascara:
+        kwargs["cutlineLayer"] = camada_mascara
+    if opcoes_warp:
+        kwargs.update(opcoes_warp)
+    if virtual:
+        # Opções de criação de GeoTIFF não se aplicam ao VRT
+        kwargs.pop("creationOptions", None)
+
+    ds = gdal.Warp(saida, entrada, options=gdal.WarpOptions(**kwargs))
+    if ds is None:
+        raise Exception(f"gdal.Warp falhou ao reprojetar/recortar {entrada}")
+    ds = None
+    return saida
@@ -8,12 +8,99 @@ from qgis.core import (
 )
 from qgis.PyQt.QtWidgets import QFileDialog, QInputDialog
 from qgis.utils import iface
-from qgis import processing
 import os
+import sys
+
+# CONFIGURAÇÕES
+
+# Como reprojetar e recortar o ANADEM:
+#   "classico" -> gdal:warpreproject + gdal:cliprasterbymasklayer
+#                 (dois GeoTIFFs temporários completos)
+#   "cutline"  -> uma única chamada do gdal.Warp com cutline, gravando
+#                 só o GeoTIFF recortado que entra no r.fill.dir
+#   "vrt"      -> a mesma chamada, mas gravando só um VRT; o GRASS lê
+#                 o VRT ao importar e nada intermediário vai para o disco
+MODO_PIPELINE = "cutline"
+
+# Simulação: recorta só como VRT (instantâneo), mostra a memória e o disco
+# previstos para o r.watershed e para antes de rodar o GRASS
+SIMULAR = False
+
+# Saídas pedidas ao r.fill.dir (as demais nem são calculadas):
+# output, direction, areas (output e direction são exigidos pelo
+# algoritmo; se não estiverem aqui, vão para arquivo temporário)
+SAIDAS_FILLDIR = ["output", "direction"]
+
+# Quem preenche as depressões e calcula a direção de fluxo:
+#   "grass" -> grass7:r.fill.dir
+#   "numpy" -> hidrologia_numpy.py (Priority-Flood + D8 no próprio Python,
+#              direção com os códigos 1 a 8 do drainage do r.watershed, em
+#              vez dos graus do r.fill.dir; não gera 'areas')
+MOTOR_FILLDIR = "grass"
+
+# Saídas pedidas ao r.watershed (as demais nem são calculadas):
+# accumulation, drainage, basin, stream, half_basin, length_slope,
+# slope_steepness, tci, spi
+SAIDAS_WATERSHED = ["accumulation", "drainage", "stream"]
+
+# Quem calcula acumulação, direção de drenagem e trechos de rio:
+#   "grass" -> grass7:r.watershed
+#   "numpy" -> acumulacao_numpy.py (só accumulation, drainage e stream)
+MOTOR_WATERSHED = "grass"
+
+# MDE maior que a RAM: lado do bloco em células (ex.: 4096) para rodar
+# preenchimento, direção, acumulação e trechos em blocos, num pool de
+# processos (hidrologia_blocos.py). Exige os dois motores "numpy". 0 = desligado
+TAMANHO_BLOCO = 0
+
+# Bacias (basin) e trechos (stream) vetorizados num GeoPackage ao lado das
+# saídas, com área, perímetro, cota média e células a montante
+# (vetorizar_hidrologia.py). Precisa de 'basin' e/ou 'stream' acima
+VETORIZAR = False
+
+# Varredura de thresholds: com uma lista aqui (ex.: [250, 500, 1000, 2000])
+# o r.fill.dir e o r.watershed rodam uma vez só e a rede de cada threshold
+# sai da mesma acumulação, tudo num GeoTIFF (uma banda por threshold) e,
+# no "r.stream.extract", num GeoPackage (uma camada por threshold)
+THRESHOLDS_VARREDURA = []
+METODO_VARREDURA = "numpy"      # "numpy" ou "r.stream.extract"
+
+# Cache do recorte (ver cache_intermediarios.py): rodar de novo a mesma área
+# (mesmo ANADEM, SRC e máscara) pula direto para o r.fill.dir
+USAR_CACHE = True
+
+# Permite importar os módulos auxiliares que ficam na mesma pasta
+try:
+    PASTA_SCRIPT = os.path.dirname(os.path.abspath(__file__))
+except NameError:
+    # O editor do console do QGIS nem sempre define __file__
+    PASTA_SCRIPT = QFileDialog.getExistingDirectory(
+        iface.mainWindow(),
+        "Selecione a pasta 'processamento' do codigos_qgis"
+    )
+if PASTA_SCRIPT not in sys.path:
+    sys.path.insert(0, PASTA_SCRIPT)
+
+# Módulos compartilhados entre as pastas (comum/)
+PASTA_COMUM = os.path.join(os.path.dirname(PASTA_SCRIPT), "comum")
+if PASTA_COMUM not in sys.path:
+    sys.path.insert(0, PASTA_COMUM)
+
+from hidrologia_grass import SAIDAS_FILLDIR as DESCRICAO_FILLDIR, SAIDAS_WATERSHED as DESCRICAO_WATERSHED
+from fluxo_hidrologia import TOTAL_ETAPAS, executar_fluxo
+from cache_intermediarios import descrever_estatisticas
+
+# Threads, cache, -wm e GeoTIFF em blocos/comprimido: alterações de
+# config_raster.CONFIG_PADRAO, ex.: {"threads": 8, "memoria_warp_mb": 4096}
+CONFIG_RASTER = {}
+
+# O fluxo em si está em fluxo_hidrologia.py (executar_fluxo); este script só
+# pergunta as entradas. Para rodar várias tarefas sem QGIS aberto, ver
+# hidrologia_lote.py.
 
 # CONTROLE DE PROGRESSO
 
-TOTAL_STEPS = 7  # número de etapas principais do fluxo
+TOTAL_STEPS = TOTAL_ETAPAS  # número de etapas principais do fluxo
 
 def log_step(step, text):
     """
@@ -76,9 +163,25 @@ def escolher_saida_raster(titulo, nome_sugerido):
         path = path + ".tif"
     return path
 
+def escolher_saidas(selecionadas, descricoes, pasta):
+    """Caixa de diálogo de salvamento para cada saída escolhida."""
+    saidas = {}
+    for nome in selecionadas:
+        descricao, arquivo, _ = descricoes[nome]
+        saidas[nome] = escolher_saida_raster(f"Salvar {descricao}", os.path.join(pasta, arquivo))
+    return saidas
+
+def adicionar_saidas(saidas, descricoes):
+    """Adiciona ao projeto as saídas gravadas."""
+    for nome, caminho in saidas.items():
+        if nome not in descricoes:
+            continue
+        lyr = QgsRasterLayer(caminho, descricoes[nome][2])
+        if lyr.isValid():
+            QgsProject.instance().addMapLayer(lyr)
+
 # 1) ESCOLHER ANADEM
 
-log_step(1, "Selecionando e carregando o raster ANADEM.")
 anadem_path = escolher_raster("Selecione o raster ANADEM")
 
 anadem_layer = QgsRasterLayer(anadem_path, "ANADEM_original")
@@ -90,7 +193,6 @@ if not anadem_layer.isValid():
 proj = QgsProject.instance()
 crs_proj = proj.crs()
 
-log_step(2, "Definindo SRC do ANADEM (EPSG).")
 epsg_valor, ok = QInputDialog.getInt(
     iface.mainWindow(),
     "SRC do ANADEM",
@@ -102,201 +204,107 @@ epsg_valor, ok = QInputDialog.getInt(
 if not ok:
     raise Exception("Operação cancelada ao definir SRC.")
 
-if epsg_valor > 0:
-    novo_crs = QgsCoordinateReferenceSystem.fromEpsgId(epsg_valor)
-    anadem_layer.setCrs(novo_crs)
-
-# 3) REPROJETAR PARA O SRC DO PROJETO, SE NECESSÁRIO
-
-log_step(3, "Verificando necessidade de reprojeção para o SRC do projeto.")
-target_crs = crs_proj
-reproj_layer = anadem_layer
-reproj_path = anadem_path
-
-if anadem_layer.crs() != target_crs:
-    params_reproj = {
-        'INPUT': anadem_layer,
-        'SOURCE_CRS': anadem_layer.crs(),
-        'TARGET_CRS': target_crs,
-        'RESAMPLING': 0,         # Nearest neighbor
-        'NODATA': None,
-        'TARGET_RESOLUTION': None,
-        'OPTIONS': '',
-        'DATA_TYPE': 0,          # mesmo tipo de dado
-        'TARGET_EXTENT': None,
-        'TARGET_EXTENT_CRS': target_crs,
-        'MULTITHREADING': False,
-        'EXTRA': '',
-        'OUTPUT': 'TEMPORARY_OUTPUT'
-    }
-    reproj_res = processing.run("gdal:warpreproject", params_reproj)
-    reproj_path = reproj_res['OUTPUT']
-    reproj_layer = QgsRasterLayer(reproj_path, "ANADEM_reprojetado")
-    if not reproj_layer.isValid():
-        raise Exception("Falha ao reprojetar o ANADEM.")
-    log_step(3, "Reprojeção para o SRC do projeto concluída.")
-else:
-    log_step(3, "Reprojeção não necessária (ANADEM já no SRC do projeto).")
-    reproj_layer = anadem_layer
-    reproj_path = anadem_path
-
-# 4) RECORTAR A PARTIR DE UMA CAMADA DE MÁSCARA (CAIXA DE DIÁLOGO)
-
-log_step(4, "Selecionando camada de máscara e recortando o ANADEM.")
-mask_path = escolher_vetor("Selecione a camada de máscara (vetor)")
-mask_layer = QgsVectorLayer(mask_path, "mascara", "ogr")
-if not mask_layer.isValid():
-    raise Exception("Camada de máscara inválida.")
-
-params_clip = {
-    'INPUT': reproj_path,
-    'MASK': mask_layer,
-    'SOURCE_CRS': None,
-    'TARGET_CRS': None,
-    'NODATA': None,
-    'ALPHA_BAND': False,
-    'CROP_TO_CUTLINE': True,
-    'KEEP_RESOLUTION': True,
-    'SET_RESOLUTION': False,
-    'X_RESOLUTION': 0,
-    'Y_RESOLUTION': 0,
-    'MULTITHREADING': False,
-    'OPTIONS': '',
-    'DATA_TYPE': 0,
-    'EXTRA': '',
-    'OUTPUT': 'TEMPORARY_OUTPUT'
-}
-
-clip_res = processing.run("gdal:cliprasterbymasklayer", params_clip)
-dem_clip_path = clip_res['OUTPUT']
-dem_clip_layer = QgsRasterLayer(dem_clip_path, "ANADEM_recortado")
-if not dem_clip_layer.isValid():
-    raise Exception("Falha ao recortar o raster pela máscara.")
-log_step(4, "Recorte do ANADEM pela máscara concluído.")
-
-# 5) r.fill.dir – MDE SEM DEPRESSÃO + DIREÇÃO DE FLUXO
-#    (ESCOLHER SAÍDA EM CAIXA DE DIÁLOGO)
-
-log_step(5, "Configurando saídas e executando r.fill.dir.")
-saida_mde_sem_dep = escolher_saida_raster(
-    "Salvar MDE sem depressão (r.fill.dir)",
-    os.path.join(os.path.dirname(dem_clip_path), "mde_sem_depressao.tif")
-)
-
-saida_dir_fluxo_filldir = escolher_saida_raster(
-    "Salvar direção de fluxo (r.fill.dir)",
-    os.path.join(os.path.dirname(dem_clip_path), "direcao_fluxo_filldir.tif")
-)
-
-params_filldir = {
-    'input': dem_clip_layer,           # Elevation (raster recortado)
-    'format': 0,                       # 0 = grass (formato da direção)
-    'f': False,                        # não usar "Find unresolved areas only"
-    'output': saida_mde_sem_dep,       # Depressionless DEM
-    'direction': saida_dir_fluxo_filldir,  # Flow direction
-    'areas': 'TEMPORARY_OUTPUT',       # problem areas (não precisamos salvar)
-    'GRASS_REGION_PARAMETER': dem_clip_layer,
-    'GRASS_REGION_CELLSIZE_PARAMETER': 0,  # 0 = usar resolução do raster
-    'GRASS_RASTER_FORMAT_OPT': '',
-    'GRASS_RASTER_FORMAT_META': ''
-}
-
-res_filldir = processing.run("grass7:r.fill.dir", params_filldir)
-
-dem_filled_path = res_filldir['output']
-dem_filled_layer = QgsRasterLayer(dem_filled_path, "MDE_sem_depressao")
-dir_fluxo_layer = QgsRasterLayer(saida_dir_fluxo_filldir, "Direcao_fluxo_filldir")
-
-if dem_filled_layer.isValid():
-    QgsProject.instance().addMapLayer(dem_filled_layer)
-if dir_fluxo_layer.isValid():
-    QgsProject.instance().addMapLayer(dir_fluxo_layer)
+# 3) ESCOLHER A CAMADA DE MÁSCARA (CAIXA DE DIÁLOGO)
 
-log_step(5, "r.fill.dir concluído – MDE sem depressão e direção de fluxo gerados.")
-
-# 6) r.watershed – DEFINIÇÃO DO THRESHOLD E PREPARO DO DEM
-
-log_step(6, "Definindo limiar (threshold) para r.watershed.")
-threshold, ok = QInputDialog.getInt(
-    iface.mainWindow(),
-    "r.watershed - Threshold",
-    "Tamanho mínimo do exterior da bacia (nº de células):",
-    value=1000,   # valor pré-definido
-    min=1
-)
-if not ok:
-    raise Exception("Operação cancelada ao definir o threshold.")
-
-dem_filled_layer = QgsRasterLayer(dem_filled_path, "MDE_sem_depressao_base")
-if not dem_filled_layer.isValid():
-    raise Exception("MDE sem depressão inválido para o r.watershed.")
-
-log_step(6, "Threshold definido e MDE sem depressão preparado para r.watershed.")
-
-# 7) r.watershed – SAÍDAS COM CAIXA DE DIÁLOGO
-#    - número de células que drenam -> accumulation
-#    - direção de drenagem          -> drainage
-#    - segmento de fluxo            -> stream
-
-log_step(7, "Configurando saídas e executando r.watershed.")
-saida_acumulacao = escolher_saida_raster(
-    "Salvar número de células que drenam (acumulação)",
-    os.path.join(os.path.dirname(dem_filled_path), "acumulacao_celulas.tif")
-)
-
-saida_direcao_drenagem = escolher_saida_raster(
-    "Salvar direção de drenagem",
-    os.path.join(os.path.dirname(dem_filled_path), "direcao_drenagem.tif")
-)
-
-saida_stream_segmentos = escolher_saida_raster(
-    "Salvar segmentos de fluxo (stream)",
-    os.path.join(os.path.dirname(dem_filled_path), "segmentos_fluxo.tif")
-)
+mask_path = escolher_vetor("Selecione a camada de máscara (vetor)")
 
-params_watershed = {
-    'elevation': dem_filled_layer,           # DEM sem depressão
-    'depression': None,
-    'flow': None,
-    'disturbed_land': None,
-    'blocking': None,
-    'threshold': threshold,
-    'max_slope_length': 0,
-    'convergence': 5,
-    'memory': 300,
-    # flags
-    's': False,
-    'm': False,
-    '4': False,
-    'a': False,
-    'b': False,
-    # saídas de interesse
-    'accumulation': saida_acumulacao,           # número de células que drenam
-    'drainage': saida_direcao_drenagem,         # direção de drenagem
-    'basin': 'TEMPORARY_OUTPUT',
-    'stream': saida_stream_segmentos,           # segmentos de fluxo
-    'half_basin': 'TEMPORARY_OUTPUT',
-    'length_slope': 'TEMPORARY_OUTPUT',
-    'slope_steepness': 'TEMPORARY_OUTPUT',
-    'tci': 'TEMPORARY_OUTPUT',
-    'spi': 'TEMPORARY_OUTPUT',
-    'GRASS_REGION_PARAMETER': dem_filled_layer,
-    'GRASS_REGION_CELLSIZE_PARAMETER': 0,
-    'GRASS_RASTER_FORMAT_OPT': '',
-    'GRASS_RASTER_FORMAT_META': ''
+# 4) SAÍDAS E THRESHOLD (NA SIMULAÇÃO NÃO SÃO NECESSÁRIOS)
+
+caminhos = {}
+threshold = 1000
+saida_varredura = None
+if not SIMULAR:
+    pasta_sugerida = os.path.dirname(anadem_path)
+    caminhos.update(escolher_saidas(SAIDAS_FILLDIR, DESCRICAO_FILLDIR, pasta_sugerida))
+    caminhos.update(escolher_saidas(SAIDAS_WATERSHED, DESCRICAO_WATERSHED, pasta_sugerida))
+
+if not SIMULAR and THRESHOLDS_VARREDURA:
+    saida_varredura = escolher_saida_raster(
+        "Salvar varredura de thresholds (uma banda por threshold)",
+        os.path.join(pasta_sugerida, "varredura_threshold.tif")
+    )[:-len(".tif")]
+elif not SIMULAR:
+    threshold, ok = QInputDialog.getInt(
+        iface.mainWindow(),
+        "r.watershed - Threshold",
+        "Tamanho mínimo do exterior da bacia (nº de células):",
+        value=1000,   # valor pré-definido
+        min=1
+    )
+    if not ok:
+        raise Exception("Operação cancelada ao definir o threshold.")
+
+# EXECUÇÃO DO FLUXO (ver fluxo_hidrologia.py)
+
+tarefa = {
+    "nome": os.path.splitext(os.path.basename(mask_path))[0],
+    "entrada": anadem_path,
+    "epsg_origem": epsg_valor,
+    "crs_destino": crs_proj.authid() or crs_proj.toWkt(QgsCoordinateReferenceSystem.WKT_PREFERRED_GDAL),
+    "mascara": mask_path,
+    "threshold": threshold,
+    "saidas_filldir": SAIDAS_FILLDIR,
+    "saidas_watershed": SAIDAS_WATERSHED,
+    "caminhos": caminhos,
+    "modo_pipeline": MODO_PIPELINE,
+    "simular": SIMULAR,
+    "config_raster": CONFIG_RASTER,
+    "thresholds": THRESHOLDS_VARREDURA,
+    "metodo_varredura": METODO_VARREDURA,
+    "saida_varredura": saida_varredura,
+    "motor_filldir": MOTOR_FILLDIR,
+    "motor_watershed": MOTOR_WATERSHED,
+    "tamanho_bloco": TAMANHO_BLOCO,
+    "vetorizar": VETORIZAR,
+    "cache": USAR_CACHE,
 }
 
-res_watershed = processing.run("grass7:r.watershed", params_watershed)
-
-# Adiciona saídas principais ao projeto
-lyr_acc = QgsRasterLayer(saida_acumulacao, "Acumulacao_celulas")
-lyr_drn = QgsRasterLayer(saida_direcao_drenagem, "Direcao_drenagem")
-lyr_str = QgsRasterLayer(saida_stream_segmentos, "Segmentos_fluxo")
-
-for lyr in (lyr_acc, lyr_drn, lyr_str):
+resultado = executar_fluxo(tarefa, log=log_step)
+
+if resultado["status"] == "simulado":
+    decisao_memoria = resultado["memoria"]
+    largura, altura = resultado["recorte"]["largura"], resultado["recorte"]["altura"]
+    livre = decisao_memoria["livre_mb"]
+    print("\nSIMULAÇÃO – previsão para este recorte:")
+    print(f"  Raster recortado: {largura} x {altura} = {decisao_memoria['celulas']:,} células")
+    print(f"  RAM necessária (modo RAM): ~{decisao_memoria['necessaria_mb']:,} MB")
+    print(f"  RAM livre agora: {f'~{livre:,.0f} MB' if livre is not None else 'desconhecida'}")
+    print(f"  Modo escolhido: {'segmentado (-m)' if decisao_memoria['segmentado'] else 'RAM'}, memory={decisao_memoria['memoria_mb']} MB")
+    print(f"  Disco temporário estimado: ~{resultado['disco_estimado_mb']:,} MB")
+    raise Exception("Simulação concluída (SIMULAR = True): r.fill.dir e r.watershed não foram executados.")
+
+# Adiciona saídas escolhidas ao projeto
+adicionar_saidas(resultado["saidas"], DESCRICAO_FILLDIR)
+adicionar_saidas(resultado["saidas"], DESCRICAO_WATERSHED)
+
+# Varredura: a pilha de redes e, no r.stream.extract, uma camada por threshold
+if "varredura" in resultado:
+    varredura = resultado["varredura"]
+    lyr = QgsRasterLayer(varredura["raster"], "Varredura_threshold")
     if lyr.isValid():
         QgsProject.instance().addMapLayer(lyr)
-
-log_step(7, "r.watershed concluído – camadas de acumulação, direção e segmentos de fluxo criadas.")
+    if varredura["gpkg"]:
+        for t in varredura["thresholds"]:
+            lyr = QgsVectorLayer(f"{varredura['gpkg']}|layername=rede_t{t}", f"Rede_t{t}", "ogr")
+            if lyr.isValid():
+                QgsProject.instance().addMapLayer(lyr)
+    for t, n in varredura["contagem"].items():
+        print(f"  threshold {t}: {n:,} {'células de rio' if varredura['metodo'] == 'numpy' else 'trechos'}")
+
+# Bacias e trechos vetorizados
+if "vetores" in resultado:
+    for camada, n in resultado["vetores"]["camadas"].items():
+        lyr = QgsVectorLayer(f"{resultado['vetores']['gpkg']}|layername={camada}", camada.capitalize(), "ogr")
+        if lyr.isValid():
+            QgsProject.instance().addMapLayer(lyr)
+        print(f"  {camada}: {n:,} feições")
+
+# RELATÓRIO DE BYTES GRAVADOS POR ETAPA
+
+print("\nBytes gravados por etapa:")
+for linha in resultado["relatorio"]:
+    print(linha)
+    QgsMessageLog.logMessage(linha, 'Hidrologia', Qgis.Info)
+print(descrever_estatisticas(resultado["cache"]))
 
 print("Fluxo completo concluído com sucesso.")
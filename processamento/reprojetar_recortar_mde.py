@@ -8,6 +8,41 @@ from qgis.core import (
 )
 from qgis import processing
 import os
+import sys
+
+# Permite importar os módulos auxiliares que ficam na mesma pasta
+try:
+    PASTA_SCRIPT = os.path.dirname(os.path.abspath(__file__))
+except NameError:
+    # O editor do console do QGIS nem sempre define __file__
+    PASTA_SCRIPT = QFileDialog.getExistingDirectory(
+        None,
+        "Selecione a pasta 'processamento' do codigos_qgis"
+    )
+if PASTA_SCRIPT not in sys.path:
+    sys.path.insert(0, PASTA_SCRIPT)
+
+# Módulos compartilhados entre as pastas (comum/)
+PASTA_COMUM = os.path.join(os.path.dirname(PASTA_SCRIPT), "comum")
+if PASTA_COMUM not in sys.path:
+    sys.path.insert(0, PASTA_COMUM)
+
+from config_raster import config, params_processing, opcoes_criacao
+from cache_intermediarios import (
+    CacheIntermediarios,
+    identidade_arquivo,
+    hash_mascara,
+    descrever_estatisticas
+)
+
+# Threads, cache, -wm e GeoTIFF em blocos/comprimido (ver config_raster.py)
+# ex.: config(threads=8, memoria_warp_mb=4096)
+CONFIG_RASTER = config()
+
+# Cache da reprojeção e do recorte (ver cache_intermediarios.py): com o mesmo
+# ANADEM, SRC e máscara o resultado guardado é reaproveitado
+USAR_CACHE = True
+cache = CacheIntermediarios(ativo=USAR_CACHE)
 
 # 1. ESCOLHER O RASTER ANADEM
 
@@ -37,6 +72,14 @@ if proj_dlg.exec_() != proj_dlg.Accepted:
 
 target_crs = proj_dlg.crs()
 
+chave_reproj = cache.chave(
+    "reprojecao",
+    entrada=identidade_arquivo(anadem_path),
+    crs_origem=anadem_layer.crs().toWkt(),
+    crs_destino=target_crs.toWkt(),
+    criacao=opcoes_criacao(CONFIG_RASTER),
+)
+
 # Reprojetar usando algoritmo GDAL "Warpreproject"
 params_reproj = {
     'INPUT': anadem_layer,
@@ -45,17 +88,19 @@ params_reproj = {
     'RESAMPLING': 0,           # 0 = Nearest neighbour (ajuste se quiser outro)
     'NODATA': None,
     'TARGET_RESOLUTION': None,
-    'OPTIONS': '',
     'DATA_TYPE': 0,            # 0 = manter tipo de dado
     'TARGET_EXTENT': None,
     'TARGET_EXTENT_CRS': None,
-    'MULTITHREADING': True,
-    'EXTRA': '',
     'OUTPUT': 'TEMPORARY_OUTPUT'
 }
+params_reproj.update(params_processing(CONFIG_RASTER))
 
-reproj_result = processing.run("gdal:warpreproject", params_reproj)
-reproj_path = reproj_result['OUTPUT']
+reproj_path = cache.obter(chave_reproj)
+if reproj_path:
+    print("Reprojeção reaproveitada do cache:", reproj_path)
+else:
+    reproj_result = processing.run("gdal:warpreproject", params_reproj)
+    reproj_path = cache.guardar(chave_reproj, reproj_result['OUTPUT'])
 
 anadem_reproj = QgsRasterLayer(reproj_path, "ANADEM_REPROJETADO")
 if not anadem_reproj.isValid():
@@ -124,14 +169,25 @@ params_clip = {
     'SET_RESOLUTION': False,
     'X_RESOLUTION': None,
     'Y_RESOLUTION': None,
-    'MULTITHREADING': True,
-    'OPTIONS': '',
     'DATA_TYPE': 0,
-    'EXTRA': '',
     'OUTPUT': output_path
 }
+params_clip.update(params_processing(CONFIG_RASTER))
 
-clip_result = processing.run("gdal:cliprasterbymasklayer", params_clip)
+chave_recorte = cache.chave(
+    "recorte_mde",
+    reprojecao=chave_reproj,
+    mascara=hash_mascara(mask_layer),
+    criacao=opcoes_criacao(CONFIG_RASTER),
+)
+recorte_cache = cache.obter(chave_recorte)
+if recorte_cache:
+    print("Recorte reaproveitado do cache:", recorte_cache)
+    cache.entregar(recorte_cache, output_path)
+else:
+    clip_result = processing.run("gdal:cliprasterbymasklayer", params_clip)
+    # Cópia: o arquivo do usuário continua onde ele escolheu
+    cache.guardar(chave_recorte, output_path, mover=False)
 
 final_raster = QgsRasterLayer(output_path, os.path.basename(output_path))
 if final_raster.isValid():
@@ -141,3 +197,4 @@ else:
 
 print("Processo concluído com sucesso!")
 print("Arquivo salvo em:", output_path)
+print(descrever_estatisticas(cache.estatisticas()))
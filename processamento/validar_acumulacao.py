@@ -0,0 +1,70 @@
+"""
+Confere a acumulação do acumulacao_numpy.py contra uma referência que
+segue o caminho de cada célula até a saída (lenta, mas óbvia).
+
+A acumulação semeia as nascentes faixa por faixa (LINHAS_POR_FAIXA
+linhas); o fluxo que atravessa de uma faixa para outra é o caso que já
+quebrou (células contadas duas vezes). Aqui a faixa é reduzida para
+poucas linhas, e cada MDE sintético é rodado também numa faixa só.
+
+Só NumPy (sem GDAL):
+    python validar_acumulacao.py
+Sai com código 1 se alguma comparação falhar.
+"""
+import sys
+
+import numpy as np
+
+import acumulacao_numpy
+from hidrologia_numpy import NODATA_DIRECAO, direcao_d8, preencher_depressoes
+
+FAIXAS = [1, 3, 7, 16]
+
+
+def referencia(direcao):
+    """Soma 1 em cada célula do caminho de cada célula válida."""
+    altura, largura = direcao.shape
+    plana = direcao.reshape(-1)
+    acumulacao = np.zeros(plana.size, dtype=np.int64)
+    atual = np.flatnonzero(plana != NODATA_DIRECAO)
+    while atual.size:
+        np.add.at(acumulacao, atual, 1)
+        receptor, ok = acumulacao_numpy.receptores(atual, plana, largura, altura)
+        atual = receptor[ok]
+    return acumulacao.reshape(altura, largura)
+
+
+def criar_direcao(altura, largura, semente):
+    rng = np.random.default_rng(semente)
+    y, x = np.mgrid[0:altura, 0:largura]
+    z = 0.05 * x + 0.03 * y + 3 * np.sin(x / 7) * np.cos(y / 5) + rng.normal(0, 0.5, (altura, largura))
+    z = np.round(z, 1)                       # empates e planos
+    valido = rng.random(z.shape) > 0.01      # NoData espalhado
+    valido[altura // 2, : largura // 2] = False
+    z = preencher_depressoes(z, valido)
+    return direcao_d8(z, valido)
+
+
+def main():
+    original = acumulacao_numpy.LINHAS_POR_FAIXA
+    falhas = 0
+    try:
+        for semente, (altura, largura) in enumerate([(60, 60), (97, 41), (33, 120)], start=1):
+            direcao = criar_direcao(altura, largura, semente)
+            esperado = referencia(direcao)
+            for faixa in FAIXAS + [altura]:
+                acumulacao_numpy.LINHAS_POR_FAIXA = faixa
+                obtido = acumulacao_numpy.acumular(direcao).astype(np.int64)
+                igual = np.array_equal(obtido, esperado)
+                falhas += not igual
+                situacao = "OK" if igual else f"DIFERENTE (máx {obtido.max()} x {esperado.max()})"
+                print(f"MDE {altura}x{largura} (semente {semente}), faixas de {faixa} linha(s): {situacao}")
+    finally:
+        acumulacao_numpy.LINHAS_POR_FAIXA = original
+
+    print("\nAcumulação igual à referência." if not falhas else f"\n{falhas} comparação(ões) falharam.")
+    sys.exit(1 if falhas else 0)
+
+
+if __name__ == "__main__":
+    main()
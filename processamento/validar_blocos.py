@@ -0,0 +1,134 @@
+"""
+Confere que o modo em blocos (hidrologia_blocos.py) dá o mesmo resultado
+do modo inteiro (hidrologia_numpy.fill_dir + acumulacao_numpy.watershed).
+
+Gera MDEs sintéticos com o que costuma quebrar a divisão em blocos:
+- cotas arredondadas (empates e planos atravessando os blocos)
+- um lago grande (depressão que vira plano em vários blocos)
+- NoData espalhado e uma faixa de NoData
+e compara célula a célula o MDE preenchido, a direção, a drenagem, a
+acumulação e os trechos, com blocos pequenos (muitas bordas) e de tamanhos
+que não dividem o raster.
+
+A acumulação anda em faixas de LINHAS_POR_FAIXA linhas (1024); o fluxo
+que passa de uma faixa para a outra precisa ser testado também:
+- a faixa deste processo é reduzida (--linhas-faixa, padrão 16), o que
+  vale para o modo inteiro e para os blocos quando --processos 1
+- um MDE alto (1100 linhas) roda com blocos de 1050 linhas, mais altos que
+  a faixa padrão, o que vale também dentro dos processos do pool
+
+Uso (Python com GDAL, ex.: OSGeo4W Shell):
+    python validar_blocos.py
+    python validar_blocos.py --processos 4 --blocos 7 16 37 64
+Sai com código 1 se alguma comparação falhar.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+import numpy as np
+from osgeo import gdal, osr
+
+# Módulos compartilhados entre as pastas (comum/), para o pool de processos
+PASTA_COMUM = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "comum")
+if PASTA_COMUM not in sys.path:
+    sys.path.insert(0, PASTA_COMUM)
+
+import acumulacao_numpy
+import hidrologia_numpy
+from hidrologia_blocos import processar_blocos
+from hidrologia_numpy import fill_dir
+
+gdal.UseExceptions()
+
+NODATA = -9999
+THRESHOLD = 30
+
+SAIDAS = ("output", "direction", "drainage", "accumulation", "stream")
+
+# (altura, largura, lados de bloco); None = os de --blocos
+CASOS = [
+    (120, 150, None),
+    (200, 173, None),
+    (97, 131, None),
+    (1100, 40, [1050]),
+]
+
+
+def criar_mde(caminho, altura, largura, semente):
+    rng = np.random.default_rng(semente)
+    y, x = np.mgrid[0:altura, 0:largura].astype(np.float32)
+    z = 100 + 0.02 * x + 0.015 * y + 5 * np.sin(x / 9) * np.cos(y / 7)
+    z += rng.normal(0, 0.6, z.shape)
+    z = np.round(z, 1)
+    z[altura // 3:altura // 3 + 25, largura // 4:largura // 4 + 40] = 90.0
+    z[rng.random(z.shape) < 0.003] = NODATA
+    z[altura // 2:altura // 2 + 6, 10:30] = NODATA
+
+    ds = gdal.GetDriverByName("GTiff").Create(caminho, largura, altura, 1, gdal.GDT_Float32)
+    ds.SetGeoTransform((500000, 30.0, 0, 7500000, 0, -30.0))
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(31983)
+    ds.SetProjection(srs.ExportToWkt())
+    banda = ds.GetRasterBand(1)
+    banda.SetNoDataValue(NODATA)
+    banda.WriteArray(z.astype(np.float32))
+    ds = None
+
+
+def inteiro(mde, base):
+    saidas = {nome: f"{base}_inteiro_{nome}.tif" for nome in SAIDAS}
+    fill_dir(mde, saidas["output"], saidas["direction"])
+    acumulacao_numpy.watershed(
+        saidas["direction"],
+        {nome: saidas[nome] for nome in ("drainage", "accumulation", "stream")},
+        THRESHOLD
+    )
+    return saidas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Modo em blocos x modo inteiro.")
+    parser.add_argument("--blocos", type=int, nargs="+", default=[7, 16, 37, 64],
+                        help="lados de bloco a testar, em células")
+    parser.add_argument("--processos", type=int, default=1, help="processos do pool (1 = sem pool)")
+    parser.add_argument("--linhas-faixa", type=int, default=16,
+                        help="linhas por faixa neste processo (menor = mais bordas de faixa)")
+    parser.add_argument("--pasta", default=None, help="pasta de trabalho (padrão: temporária)")
+    args = parser.parse_args()
+
+    hidrologia_numpy.LINHAS_POR_FAIXA = args.linhas_faixa
+    acumulacao_numpy.LINHAS_POR_FAIXA = args.linhas_faixa
+
+    pasta = args.pasta or tempfile.mkdtemp(prefix="validar_blocos_")
+    os.makedirs(pasta, exist_ok=True)
+    print(f"Pasta de trabalho: {pasta}\n")
+
+    falhas = 0
+    for semente, (altura, largura, blocos) in enumerate(CASOS, start=1):
+        mde = os.path.join(pasta, f"mde_{semente}.tif")
+        criar_mde(mde, altura, largura, semente)
+        referencia = inteiro(mde, os.path.join(pasta, f"mde_{semente}"))
+
+        for tamanho in blocos or args.blocos:
+            base = os.path.join(pasta, f"mde_{semente}_blocos_{tamanho}")
+            saidas = {nome: f"{base}_{nome}.tif" for nome in SAIDAS}
+            processar_blocos(mde, saidas, THRESHOLD, tamanho, args.processos, log=lambda texto: None)
+
+            diferentes = []
+            for nome in SAIDAS:
+                a = gdal.Open(referencia[nome]).ReadAsArray()
+                b = gdal.Open(saidas[nome]).ReadAsArray()
+                if a.shape != b.shape or not np.array_equal(a, b):
+                    diferentes.append(nome)
+            falhas += bool(diferentes)
+            situacao = "OK" if not diferentes else f"DIFERENTE em {', '.join(diferentes)}"
+            print(f"MDE {altura}x{largura} (semente {semente}), blocos de {tamanho}: {situacao}")
+
+    print("\nModo em blocos idêntico ao modo inteiro." if not falhas else f"\n{falhas} comparação(ões) falharam.")
+    sys.exit(1 if falhas else 0)
+
+
+if __name__ == "__main__":
+    main()
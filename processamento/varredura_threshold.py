@@ -0,0 +1,181 @@
+"""
+Varredura de thresholds do r.watershed sem refazer o fluxo.
+
+Para escolher a densidade da rede de drenagem o processamento_mde.py era
+rodado várias vezes, uma por threshold, e cada vez refazia recorte,
+r.fill.dir e r.watershed inteiros. O threshold só decide quais células
+com acumulação suficiente viram rio, então a acumulação é calculada uma
+vez e cada threshold é derivado dela:
+
+- "numpy": |acumulação| >= threshold, lendo a acumulação UMA vez em faixas
+  e gravando uma banda por threshold num GeoTIFF (1 = rio, 0 = não)
+- "r.stream.extract": rede do GRASS para cada threshold, a partir da mesma
+  acumulação; linhas numa camada por threshold dentro de um GeoPackage e
+  os rasters dos segmentos empilhados num GeoTIFF (uma banda por threshold)
+
+No r.watershed a acumulação negativa indica fluxo que vem de fora da região
+(borda do recorte); o valor absoluto continua sendo a área drenada.
+"""
+import os
+
+import numpy as np
+from osgeo import gdal
+
+from config_raster import config, opcoes_criacao
+from hidrologia_grass import params_stream_extract
+
+gdal.UseExceptions()
+
+METODOS_VARREDURA = ("numpy", "r.stream.extract")
+
+# Memória usada por faixa de leitura da acumulação
+BYTES_POR_FAIXA = 64 * 1024 * 1024
+
+NODATA_REDE = 255
+
+
+def nome_camada(threshold):
+    return f"rede_t{threshold}"
+
+
+def _normalizar(thresholds):
+    thresholds = sorted({int(t) for t in thresholds})
+    if not thresholds or thresholds[0] < 1:
+        raise Exception("Informe ao menos um threshold maior que zero.")
+    return thresholds
+
+
+def limiar_numpy(acumulacao, thresholds, saida, cfg=None):
+    """
+    Uma banda Byte por threshold: 1 onde |acumulação| >= threshold.
+    Retorna dict {threshold: número de células de rio}.
+    """
+    thresholds = _normalizar(thresholds)
+    cfg = cfg or config()
+
+    src = gdal.Open(acumulacao)
+    banda_acc = src.GetRasterBand(1)
+    nodata = banda_acc.GetNoDataValue()
+    largura, altura = src.RasterXSize, src.RasterYSize
+
+    # Preditor 3 é só para ponto flutuante; a saída é Byte
+    opcoes = opcoes_criacao({**cfg, "preditor": 2 if cfg["preditor"] else None})
+    dst = gdal.GetDriverByName("GTiff").Create(
+        saida, largura, altura, len(thresholds), gdal.GDT_Byte, opcoes
+    )
+    dst.SetGeoTransform(src.GetGeoTransform())
+    dst.SetProjection(src.GetProjection())
+    bandas = []
+    for i, threshold in enumerate(thresholds, start=1):
+        banda = dst.GetRasterBand(i)
+        banda.SetNoDataValue(NODATA_REDE)
+        banda.SetDescription(f"threshold={threshold}")
+        banda.SetMetadataItem("THRESHOLD", str(threshold))
+        bandas.append(banda)
+
+    celulas = dict.fromkeys(thresholds, 0)
+    linhas_por_faixa = max(1, BYTES_POR_FAIXA // (largura * 8))
+    for linha in range(0, altura, linhas_por_faixa):
+        n_linhas = min(linhas_por_faixa, altura - linha)
+        faixa = banda_acc.ReadAsArray(0, linha, largura, n_linhas)
+        invalido = ~np.isfinite(faixa)
+        if nodata is not None:
+            invalido |= faixa == nodata
+        faixa = np.abs(faixa)
+
+        for threshold, banda in zip(thresholds, bandas):
+            rede = (faixa >= threshold).astype(np.uint8)
+            rede[invalido] = 0              # NoData não entra na contagem
+            celulas[threshold] += int(rede.sum())
+            rede[invalido] = NODATA_REDE
+            banda.WriteArray(rede, 0, linha)
+
+    dst.FlushCache()
+    dst = None
+    src = None
+    return celulas
+
+
+def rede_stream_extract(mde_sem_depressao, acumulacao, thresholds, saida_gpkg, saida_raster,
+                        memoria_mb=300, cfg=None):
+    """
+    r.stream.extract para cada threshold, reaproveitando a acumulação.
+    Linhas -> camada nome_camada(threshold) em saida_gpkg; segmentos ->
+    uma banda por threshold em saida_raster.
+    Retorna dict {threshold: número de trechos}.
+    """
+    from qgis import processing
+    from config_raster import params_grass
+
+    thresholds = _normalizar(thresholds)
+    cfg = cfg or config()
+
+    if os.path.exists(saida_gpkg):
+        os.remove(saida_gpkg)
+
+    rasters = []
+    trechos = {}
+    for threshold in thresholds:
+        res = processing.run(
+            "grass7:r.stream.extract",
+            params_stream_extract(
+                mde_sem_depressao, acumulacao, threshold, {}, memoria_mb, params_grass(cfg)
+            )
+        )
+        rasters.append(res["stream_raster"])
+
+        gdal.VectorTranslate(
+            saida_gpkg,
+            res["stream_vector"],
+            options=gdal.VectorTranslateOptions(
+                format="GPKG",
+                layerName=nome_camada(threshold),
+                accessMode="update" if os.path.exists(saida_gpkg) else None,
+            )
+        )
+        ds = gdal.OpenEx(saida_gpkg, gdal.OF_VECTOR)
+        trechos[threshold] = ds.GetLayerByName(nome_camada(threshold)).GetFeatureCount()
+        ds = None
+
+    # Empilha os segmentos (uma banda por threshold) sem intermediário no disco
+    pilha = gdal.BuildVRT("", rasters, separate=True)
+    for i, threshold in enumerate(thresholds, start=1):
+        pilha.GetRasterBand(i).SetDescription(f"threshold={threshold}")
+    gdal.Translate(
+        saida_raster, pilha,
+        options=gdal.TranslateOptions(creationOptions=opcoes_criacao(
+            {**cfg, "preditor": 2 if cfg["preditor"] else None}
+        ))
+    )
+    pilha = None
+    return trechos
+
+
+def executar_varredura(metodo, mde_sem_depressao, acumulacao, thresholds, base_saida,
+                       memoria_mb=300, cfg=None):
+    """
+    Roda a varredura com o método escolhido.
+    - base_saida: caminho sem extensão (gera .tif e, no r.stream.extract, .gpkg)
+    Retorna dict com metodo, thresholds, raster, gpkg e contagem por threshold.
+    """
+    if metodo not in METODOS_VARREDURA:
+        raise Exception(f"Método de varredura desconhecido: {metodo}. Opções: {METODOS_VARREDURA}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(base_saida)), exist_ok=True)
+    raster = base_saida + ".tif"
+    if metodo == "numpy":
+        contagem = limiar_numpy(acumulacao, thresholds, raster, cfg)
+        gpkg = None
+    else:
+        gpkg = base_saida + ".gpkg"
+        contagem = rede_stream_extract(
+            mde_sem_depressao, acumulacao, thresholds, gpkg, raster, memoria_mb, cfg
+        )
+
+    return {
+        "metodo": metodo,
+        "thresholds": _normalizar(thresholds),
+        "raster": raster,
+        "gpkg": gpkg,
+        "contagem": {str(t): n for t, n in contagem.items()},
+    }
@@ -0,0 +1,293 @@
+"""
+Vetorização das saídas do r.watershed (ou do motor numpy) num GeoPackage,
+sem carregar os rasters inteiros na memória.
+
+- "bacias": gdal.Polygonize do raster basin (o polygonizer do GDAL lê uma
+  linha por vez e grava direto na camada). Atributos: bacia, area e
+  perimetro (unidades do SRC: m² e m no UTM), cota_media (do MDE) e
+  celulas_montante (maior |acumulação| da bacia = células que drenam pelo
+  exutório).
+- "trechos": uma linha por trecho do raster stream, ligando os centros das
+  células na ordem do fluxo (drainage) até a célula seguinte, onde o trecho
+  encontra o próximo. Os rasters são lidos em faixas; só as células de rio
+  (poucos % do raster) ficam na memória. Atributos: trecho, celulas,
+  comprimento, cota_media e celulas_montante.
+
+As camadas são criadas com índice espacial (R-tree do GeoPackage) e
+gravadas dentro de uma transação.
+"""
+import os
+
+import numpy as np
+from osgeo import gdal, ogr, osr
+
+from hidrologia_numpy import DESLOC_LINHA, DESLOC_COLUNA, LINHAS_POR_FAIXA
+
+gdal.UseExceptions()
+ogr.UseExceptions()
+
+CAMADA_BACIAS = "bacias"
+CAMADA_TRECHOS = "trechos"
+
+OPCOES_CAMADA = ["SPATIAL_INDEX=YES", "GEOMETRY_NAME=geom", "FID=fid"]
+
+
+def _faixas(caminhos):
+    """
+    Lê os rasters (mesma grade) em faixas de linhas. Gera (linha, arrays, nodatas);
+    caminhos None viram arrays None.
+    """
+    abertos = [gdal.Open(c) if c else None for c in caminhos]
+    referencia = next(ds for ds in abertos if ds is not None)
+    largura, altura = referencia.RasterXSize, referencia.RasterYSize
+    bandas = [ds.GetRasterBand(1) if ds else None for ds in abertos]
+    nodatas = [b.GetNoDataValue() if b else None for b in bandas]
+    for linha in range(0, altura, LINHAS_POR_FAIXA):
+        n = min(LINHAS_POR_FAIXA, altura - linha)
+        yield linha, [b.ReadAsArray(0, linha, largura, n) if b else None for b in bandas], nodatas
+
+
+def _validos(array, nodata):
+    valido = np.isfinite(array) if array.dtype.kind == "f" else np.ones(array.shape, dtype=bool)
+    if nodata is not None:
+        valido &= array != nodata
+    return valido
+
+
+def _reduzir(rotulos, soma, n, maximo):
+    """Junta os parciais das faixas: uma linha por rótulo."""
+    rotulos, inverso = np.unique(np.concatenate(rotulos), return_inverse=True)
+    total_soma = np.bincount(inverso, weights=np.concatenate(soma), minlength=rotulos.size)
+    total_n = np.bincount(inverso, weights=np.concatenate(n), minlength=rotulos.size)
+    total_max = np.zeros(rotulos.size)
+    np.maximum.at(total_max, inverso, np.concatenate(maximo))
+    return rotulos, total_soma, total_n, total_max
+
+
+def estatisticas_bacias(basin, mde=None, acumulacao=None):
+    """
+    Cota média e |acumulação| máxima de cada bacia, faixa por faixa.
+    Retorna dict {bacia: (cota_media ou None, celulas_montante ou None)}.
+    """
+    rotulos, soma, n, maximo = [], [], [], []
+    for _, (bacia, z, acc), (nd_bacia, nd_z, nd_acc) in _faixas([basin, mde, acumulacao]):
+        valido = _validos(bacia, nd_bacia)
+        if z is not None:
+            valido_z = valido & _validos(z, nd_z)
+        u, inverso = np.unique(bacia[valido], return_inverse=True)
+        rotulos.append(u)
+        if z is not None:
+            soma.append(np.bincount(inverso, weights=np.where(valido_z, z, 0)[valido], minlength=u.size))
+            n.append(np.bincount(inverso, weights=valido_z[valido], minlength=u.size))
+        else:
+            soma.append(np.zeros(u.size))
+            n.append(np.zeros(u.size))
+        parcial = np.zeros(u.size)
+        if acc is not None:
+            np.maximum.at(parcial, inverso, np.abs(np.where(_validos(acc, nd_acc), acc, 0)[valido]))
+        maximo.append(parcial)
+
+    if not rotulos:
+        return {}
+    rotulos, soma, n, maximo = _reduzir(rotulos, soma, n, maximo)
+    return {
+        int(r): (float(s / c) if c else None, int(m) if acumulacao else None)
+        for r, s, c, m in zip(rotulos, soma, n, maximo)
+    }
+
+
+def _abrir_gpkg(gpkg):
+    if os.path.exists(gpkg):
+        return ogr.Open(gpkg, 1)
+    return ogr.GetDriverByName("GPKG").CreateDataSource(gpkg)
+
+
+def _criar_camada(ds, nome, srs, tipo, campos):
+    if ds.GetLayerByName(nome) is not None:
+        ds.DeleteLayer(nome)
+    lyr = ds.CreateLayer(nome, srs, tipo, OPCOES_CAMADA)
+    for campo, tipo_campo in campos:
+        lyr.CreateField(ogr.FieldDefn(campo, tipo_campo))
+    return lyr
+
+
+def poligonizar_bacias(basin, gpkg, mde=None, acumulacao=None):
+    """Camada CAMADA_BACIAS em gpkg. Retorna o número de polígonos."""
+    estatisticas = estatisticas_bacias(basin, mde, acumulacao)
+
+    src = gdal.Open(basin)
+    banda = src.GetRasterBand(1)
+    srs = osr.SpatialReference(wkt=src.GetProjection())
+
+    ds = _abrir_gpkg(gpkg)
+    lyr = _criar_camada(ds, CAMADA_BACIAS, srs, ogr.wkbPolygon, [
+        ("bacia", ogr.OFTInteger64),
+        ("area", ogr.OFTReal),
+        ("perimetro", ogr.OFTReal),
+        ("cota_media", ogr.OFTReal),
+        ("celulas_montante", ogr.OFTInteger64),
+    ])
+
+    ds.StartTransaction()
+    gdal.Polygonize(banda, banda.GetMaskBand(), lyr, 0, [], callback=None)
+    ds.CommitTransaction()
+
+    ds.StartTransaction()
+    lyr.ResetReading()
+    for feat in lyr:
+        geom = feat.GetGeometryRef()
+        cota, montante = estatisticas.get(feat.GetField("bacia"), (None, None))
+        feat.SetField("area", geom.GetArea())
+        feat.SetField("perimetro", geom.Boundary().Length())
+        if cota is not None:
+            feat.SetField("cota_media", cota)
+        if montante is not None:
+            feat.SetField("celulas_montante", montante)
+        lyr.SetFeature(feat)
+    ds.CommitTransaction()
+
+    total = lyr.GetFeatureCount()
+    ds = None
+    src = None
+    return total
+
+
+def _celulas_de_rio(stream, drainage, mde, acumulacao):
+    """Índice, trecho, receptora, cota e |acumulação| de cada célula de rio."""
+    ds = gdal.Open(stream)
+    largura, altura = ds.RasterXSize, ds.RasterYSize
+    ds = None
+
+    partes = {nome: [] for nome in ("indice", "trecho", "receptora", "cota", "acumulacao")}
+    for linha, (rio, direcao, z, acc), (nd_rio, nd_dir, nd_z, nd_acc) in _faixas(
+        [stream, drainage, mde, acumulacao]
+    ):
+        valido = _validos(rio, nd_rio) & (rio > 0)
+        i, j = np.nonzero(valido)
+
+        # Códigos GRASS; negativos (saída pela borda) valem como a direção
+        codigo = np.abs(direcao[i, j].astype(np.int64))
+        if nd_dir is not None:
+            codigo[direcao[i, j] == nd_dir] = 0
+        tem = (codigo >= 1) & (codigo <= 8)
+        k = codigo % 8
+        ri, rj = linha + i + DESLOC_LINHA[k], j + DESLOC_COLUNA[k]
+        tem &= (ri >= 0) & (ri < altura) & (rj >= 0) & (rj < largura)
+
+        partes["indice"].append((linha + i) * largura + j)
+        partes["trecho"].append(rio[i, j].astype(np.int64))
+        partes["receptora"].append(np.where(tem, ri * largura + rj, -1))
+        partes["cota"].append(
+            np.where(_validos(z, nd_z)[i, j], z[i, j], np.nan) if z is not None else np.full(i.size, np.nan)
+        )
+        partes["acumulacao"].append(
+            np.abs(np.where(_validos(acc, nd_acc)[i, j], acc[i, j], 0)) if acc is not None else np.zeros(i.size)
+        )
+
+    return largura, {nome: np.concatenate(v) for nome, v in partes.items()}
+
+
+def _distancia_ao_fim(seguinte):
+    """Quantas células faltam até o fim do trecho (list ranking por saltos)."""
+    distancia = (seguinte >= 0).astype(np.int64)
+    salto = seguinte.copy()
+    while (salto >= 0).any():
+        tem = salto >= 0
+        nova = distancia.copy()
+        nova[tem] += distancia[salto[tem]]
+        salto_novo = np.full(salto.size, -1, dtype=np.int64)
+        salto_novo[tem] = salto[salto[tem]]
+        distancia, salto = nova, salto_novo
+    return distancia
+
+
+def vetorizar_trechos(stream, drainage, gpkg, mde=None, acumulacao=None):
+    """Camada CAMADA_TRECHOS em gpkg. Retorna o número de linhas."""
+    largura, c = _celulas_de_rio(stream, drainage, mde, acumulacao)
+
+    ordem = np.argsort(c["indice"])
+    c = {nome: v[ordem] for nome, v in c.items()}
+
+    # Próxima célula do mesmo trecho (ou -1 no fim do trecho)
+    seguinte = np.full(c["indice"].size, -1, dtype=np.int64)
+    if c["indice"].size:
+        pos = np.minimum(np.searchsorted(c["indice"], c["receptora"]), c["indice"].size - 1)
+        mesmo = (c["receptora"] >= 0) & (c["indice"][pos] == c["receptora"]) & (c["trecho"][pos] == c["trecho"])
+        seguinte[mesmo] = pos[mesmo]
+
+    # Do início ao fim de cada trecho
+    ordem = np.lexsort((-_distancia_ao_fim(seguinte), c["trecho"]))
+    trechos = np.split(ordem, np.flatnonzero(np.diff(c["trecho"][ordem])) + 1) if ordem.size else []
+
+    src = gdal.Open(stream)
+    g = src.GetGeoTransform()
+    srs = osr.SpatialReference(wkt=src.GetProjection())
+    src = None
+
+    def centro(indice):
+        i, j = indice // largura, indice % largura
+        return g[0] + (j + 0.5) * g[1] + (i + 0.5) * g[2], g[3] + (j + 0.5) * g[4] + (i + 0.5) * g[5]
+
+    ds = _abrir_gpkg(gpkg)
+    lyr = _criar_camada(ds, CAMADA_TRECHOS, srs, ogr.wkbLineString, [
+        ("trecho", ogr.OFTInteger64),
+        ("celulas", ogr.OFTInteger),
+        ("comprimento", ogr.OFTReal),
+        ("cota_media", ogr.OFTReal),
+        ("celulas_montante", ogr.OFTInteger64),
+    ])
+    defn = lyr.GetLayerDefn()
+
+    ds.StartTransaction()
+    for celulas in trechos:
+        linha = ogr.Geometry(ogr.wkbLineString)
+        for indice in c["indice"][celulas]:
+            linha.AddPoint_2D(*centro(indice))
+        # Até a célula seguinte (encontro com o próximo trecho)
+        receptora = c["receptora"][celulas[-1]]
+        if receptora >= 0:
+            linha.AddPoint_2D(*centro(receptora))
+        if linha.GetPointCount() < 2:
+            continue
+
+        feat = ogr.Feature(defn)
+        feat.SetGeometry(linha)
+        feat.SetField("trecho", int(c["trecho"][celulas[0]]))
+        feat.SetField("celulas", int(celulas.size))
+        feat.SetField("comprimento", linha.Length())
+        cotas = c["cota"][celulas]
+        if np.isfinite(cotas).any():
+            feat.SetField("cota_media", float(np.nanmean(cotas)))
+        if acumulacao:
+            feat.SetField("celulas_montante", int(c["acumulacao"][celulas].max()))
+        lyr.CreateFeature(feat)
+    ds.CommitTransaction()
+
+    total = lyr.GetFeatureCount()
+    ds = None
+    return total
+
+
+def vetorizar(saidas, gpkg, mde=None):
+    """
+    Vetoriza o que houver em saidas ({parâmetro do r.watershed: caminho}):
+    - basin -> camada de bacias
+    - stream + drainage -> camada de trechos
+    accumulation (se houver) e mde dão os atributos.
+    Retorna dict {camada: número de feições}.
+    """
+    if "basin" not in saidas and not {"stream", "drainage"} <= set(saidas):
+        raise Exception("Para vetorizar é preciso 'basin' ou 'stream' + 'drainage'.")
+
+    os.makedirs(os.path.dirname(os.path.abspath(gpkg)), exist_ok=True)
+    if os.path.exists(gpkg):
+        os.remove(gpkg)
+
+    camadas = {}
+    if "basin" in saidas:
+        camadas[CAMADA_BACIAS] = poligonizar_bacias(saidas["basin"], gpkg, mde, saidas.get("accumulation"))
+    if {"stream", "drainage"} <= set(saidas):
+        camadas[CAMADA_TRECHOS] = vetorizar_trechos(
+            saidas["stream"], saidas["drainage"], gpkg, mde, saidas.get("accumulation")
+        )
+    return camadas
@@ -0,0 +1,147 @@
+"""
+Consultas por retângulo num GPKG antes e depois da regravação em ordem
+espacial (gpkg_espacial.py).
+
+Gera um GPKG com polígonos gravados em ordem aleatória e R-tree criado
+durante a carga (como sai de uma exportação comum), regrava em ordem de
+Hilbert e mede, nos dois arquivos, a mesma série de consultas por
+retângulo (SetSpatialFilterRect + leitura das feições, o equivalente OGR
+de getFeatures(rect)).
+
+Para medir o efeito na rede, use --pasta apontando para a pasta
+compartilhada. O cache do sistema operacional favorece a segunda leitura
+de cada arquivo; por isso cada arquivo é lido uma vez antes das medições
+(--sem-aquecer desliga isso).
+
+Uso (Python com GDAL, ex.: OSGeo4W Shell):
+    python benchmark_gpkg_espacial.py
+    python benchmark_gpkg_espacial.py --feicoes 500000 --consultas 500 --pasta X:/rede/teste
+"""
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from osgeo import ogr, osr
+
+# Módulos compartilhados entre as pastas (comum/)
+PASTA_COMUM = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "comum")
+if PASTA_COMUM not in sys.path:
+    sys.path.insert(0, PASTA_COMUM)
+
+from gpkg_espacial import reescrever_ordenado
+
+ogr.UseExceptions()
+
+NOME_CAMADA = "poligonos"
+EXTENSAO = (300000.0, 7300000.0, 800000.0, 7800000.0)
+
+
+def criar_gpkg(caminho, n, semente):
+    """n polígonos (octógonos com um campo de texto) em ordem aleatória."""
+    rng = np.random.default_rng(semente)
+    xmin, ymin, xmax, ymax = EXTENSAO
+    cx = rng.uniform(xmin, xmax, n)
+    cy = rng.uniform(ymin, ymax, n)
+    raio = rng.uniform(50, 1500, n)
+
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(31983)
+    driver = ogr.GetDriverByName("GPKG")
+    if os.path.exists(caminho):
+        driver.DeleteDataSource(caminho)
+    ds = driver.CreateDataSource(caminho)
+    lyr = ds.CreateLayer(NOME_CAMADA, srs, ogr.wkbPolygon)
+    lyr.CreateField(ogr.FieldDefn("descricao", ogr.OFTString))
+    defn = lyr.GetLayerDefn()
+
+    ds.StartTransaction()
+    for i in range(n):
+        anel = ogr.Geometry(ogr.wkbLinearRing)
+        for k in range(9):
+            a = 2 * math.pi * (k % 8) / 8
+            anel.AddPoint_2D(cx[i] + raio[i] * math.cos(a), cy[i] + raio[i] * math.sin(a))
+        poligono = ogr.Geometry(ogr.wkbPolygon)
+        poligono.AddGeometry(anel)
+        feat = ogr.Feature(defn)
+        feat.SetGeometry(poligono)
+        feat.SetField("descricao", f"poligono {i} " + "x" * 40)
+        lyr.CreateFeature(feat)
+    ds.CommitTransaction()
+    ds = None
+
+
+def retangulos(n, lado, semente):
+    rng = np.random.default_rng(semente)
+    xmin, ymin, xmax, ymax = EXTENSAO
+    x = rng.uniform(xmin, xmax - lado, n)
+    y = rng.uniform(ymin, ymax - lado, n)
+    return [(x0, y0, x0 + lado, y0 + lado) for x0, y0 in zip(x.tolist(), y.tolist())]
+
+
+def consultar(caminho, rets):
+    """Tempo total das consultas e número de feições lidas."""
+    ds = ogr.Open(caminho, 0)
+    lyr = ds.GetLayerByName(NOME_CAMADA)
+    lidas = 0
+    inicio = time.perf_counter()
+    for ret in rets:
+        lyr.SetSpatialFilterRect(*ret)
+        for feat in lyr:
+            feat.GetGeometryRef()
+            lidas += 1
+    tempo = time.perf_counter() - inicio
+    ds = None
+    return tempo, lidas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consultas por retângulo: GPKG original x ordem de Hilbert.")
+    parser.add_argument("--feicoes", type=int, default=200000, help="número de polígonos")
+    parser.add_argument("--consultas", type=int, default=300, help="número de retângulos")
+    parser.add_argument("--lado", type=float, default=10000.0, help="lado do retângulo, em metros")
+    parser.add_argument("--chave", default="hilbert", choices=["hilbert", "morton"])
+    parser.add_argument("--sem-aquecer", action="store_true", help="não lê os arquivos antes de medir")
+    parser.add_argument("--pasta", default=None, help="pasta de trabalho (padrão: temporária)")
+    args = parser.parse_args()
+
+    pasta = args.pasta or tempfile.mkdtemp(prefix="benchmark_gpkg_espacial_")
+    os.makedirs(pasta, exist_ok=True)
+    print(f"Pasta de trabalho: {pasta}\n")
+
+    original = os.path.join(pasta, "original.gpkg")
+    ordenado = os.path.join(pasta, f"{args.chave}.gpkg")
+
+    inicio = time.perf_counter()
+    criar_gpkg(original, args.feicoes, semente=1)
+    print(f"GPKG original ({args.feicoes} feições, ordem aleatória): {time.perf_counter() - inicio:.1f} s")
+
+    inicio = time.perf_counter()
+    reescrever_ordenado(original, ordenado, NOME_CAMADA, args.chave)
+    print(f"Regravação em ordem de {args.chave}: {time.perf_counter() - inicio:.1f} s\n")
+
+    rets = retangulos(args.consultas, args.lado, semente=2)
+    if not args.sem_aquecer:
+        for caminho in (original, ordenado):
+            consultar(caminho, [EXTENSAO])
+
+    resultados = {}
+    for rotulo, caminho in (("original", original), (args.chave, ordenado)):
+        tempo, lidas = consultar(caminho, rets)
+        resultados[rotulo] = (tempo, lidas)
+        tamanho = os.path.getsize(caminho) / 1024 ** 2
+        print(f"{rotulo:>10}: {tempo:8.2f} s em {args.consultas} consultas "
+              f"({1000 * tempo / args.consultas:.1f} ms/consulta, {lidas} feições lidas, {tamanho:.1f} MB)")
+
+    (t_antes, n_antes), (t_depois, n_depois) = resultados.values()
+    if n_antes != n_depois:
+        print(f"\nATENÇÃO: número de feições lidas diferente ({n_antes} x {n_depois}).")
+    elif t_depois > 0:
+        print(f"\nGanho: {t_antes / t_depois:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Estratégias para entregar um raster na pasta de saída sem copiar à toa.
+
+- "hardlink": mesmo arquivo no disco, com dois nomes (mesmo sistema de arquivos;
+  se o original for editado no lugar, a entrega muda junto)
+- "reflink": cópia copy-on-write (Btrfs, XFS, APFS...), instantânea
+- "vrt": um .vrt pequeno apontando para o arquivo original (GDAL)
+- "copia": cópia de verdade (sempre funciona)
+- "auto": reflink -> hardlink -> cópia, conforme o sistema de arquivos
+
+Os arquivos auxiliares do raster (.aux.xml, .ovr, .tfw etc.) vão junto.
+"""
+import os
+import shutil
+import subprocess
+import sys
+
+ESTRATEGIAS = ("auto", "hardlink", "reflink", "vrt", "copia")
+
+# Extensões auxiliares que acompanham o raster (nome.tif + extensão)
+SUFIXOS_AUXILIARES = (".aux.xml", ".ovr", ".msk", ".aux")
+
+# Auxiliares grandes (pirâmides, máscaras) seguem a mesma estratégia do raster;
+# os pequenos (.aux.xml, .tfw, .prj) são sempre copiados de verdade, porque
+# o QGIS às vezes reescreve o .aux.xml e um hardlink alteraria o original
+SUFIXOS_GRANDES = (".ovr", ".msk")
+
+# Arquivos de georreferência que substituem a extensão (nome.tfw)
+EXTENSOES_MUNDO = {
+    ".tif": (".tfw", ".tifw"),
+    ".tiff": (".tfw", ".tiffw"),
+    ".jpg": (".jgw", ".jpgw"),
+    ".jpeg": (".jgw", ".jpegw"),
+    ".png": (".pgw", ".pngw"),
+    ".img": (".igw",),
+}
+
+# ioctl FICLONE do Linux (copy-on-write de arquivo inteiro)
+FICLONE = 0x40049409
+
+
+def arquivos_auxiliares(origem):
+    """Lista os arquivos auxiliares existentes ao lado do raster."""
+    base, ext = os.path.splitext(origem)
+    candidatos = [origem + sufixo for sufixo in SUFIXOS_AUXILIARES]
+    candidatos += [base + ext_mundo for ext_mundo in EXTENSOES_MUNDO.get(ext.lower(), ())]
+    candidatos.append(base + ".prj")
+    return [c for c in candidatos if os.path.isfile(c)]
+
+
+def mesmo_sistema_de_arquivos(origem, pasta_destino):
+    return os.stat(origem).st_dev == os.stat(pasta_destino).st_dev
+
+
+def _remover_destino(destino):
+    if os.path.lexists(destino):
+        os.remove(destino)
+
+
+def hardlink(origem, destino):
+    _remover_destino(destino)
+    os.link(origem, destino)
+
+
+def reflink(origem, destino):
+    """
+    Cópia copy-on-write. Levanta OSError se o sistema de arquivos não suportar.
+    """
+    _remover_destino(destino)
+
+    if sys.platform.startswith("linux"):
+        import fcntl
+
+        with open(origem, "rb") as f_origem, open(destino, "wb") as f_destino:
+            try:
+                fcntl.ioctl(f_destino.fileno(), FICLONE, f_origem.fileno())
+            except OSError:
+                f_destino.close()
+                os.remove(destino)
+                raise
+        shutil.copystat(origem, destino)
+        return
+
+    if sys.platform == "darwin":
+        # 'cp -c' usa clonefile() no APFS
+        resultado = subprocess.run(["cp", "-c", origem, destino], capture_output=True)
+        if resultado.returncode != 0:
+            raise OSError(resultado.stderr.decode(errors="replace").strip())
+        return
+
+    raise OSError("reflink não suportado neste sistema operacional")
+
+
+def copia(origem, destino):
+    # Remove antes: se o destino for um hardlink de uma entrega anterior,
+    # copiar por cima escreveria dentro do arquivo original
+    _remover_destino(destino)
+    shutil.copy2(origem, destino)
+
+
+def vrt(origem, destino_vrt):
+    """Cria um VRT com caminho absoluto para o raster original."""
+    from osgeo import gdal
+
+    _remover_destino(destino_vrt)
+    ds = gdal.BuildVRT(destino_vrt, [origem])
+    if ds is None:
+        raise OSError(f"GDAL não conseguiu criar o VRT de {origem}")
+    ds = None
+
+
+def _entregar_arquivo(origem, destino, estrategia):
+    """Entrega um único arquivo. Retorna a estratégia que funcionou."""
+    if estrategia == "auto":
+        tentativas = ["reflink", "hardlink"] if mesmo_sistema_de_arquivos(
+            origem, os.path.dirname(destino)
+        ) else ["reflink"]
+        tentativas.append("copia")
+    else:
+        tentativas = [estrategia]
+
+    funcoes = {"hardlink": hardlink, "reflink": reflink, "copia": copia}
+    ultimo_erro = None
+    for nome in tentativas:
+        try:
+            funcoes[nome](origem, destino)
+            return nome
+        except OSError as e:
+            ultimo_erro = e
+
+    raise ultimo_erro
+
+
+def entregar_raster(origem, pasta_destino, estrategia="auto"):
+    """
+    Entrega o raster (e seus auxiliares) em 'pasta_destino'.
+    Retorna (caminho_principal, estrategia_usada, arquivos_gravados).
+    'arquivos_gravados' são os arquivos que ocupam espaço novo no disco
+    (vazio para hardlink/reflink; o .vrt no caso de VRT).
+    """
+    if estrategia not in ESTRATEGIAS:
+        raise Exception(f"Estratégia de entrega desconhecida: {estrategia}")
+
+    nome = os.path.basename(origem)
+
+    if estrategia == "vrt":
+        destino = os.path.join(pasta_destino, os.path.splitext(nome)[0] + ".vrt")
+        vrt(origem, destino)
+        # O .aux.xml guarda estatísticas/metadados; vai junto com o nome do VRT
+        aux = origem + ".aux.xml"
+        if os.path.isfile(aux):
+            shutil.copy2(aux, destino + ".aux.xml")
+        return destino, "vrt", [destino]
+
+    destino = os.path.join(pasta_destino, nome)
+    usada = _entregar_arquivo(origem, destino, estrategia)
+
+    gravados = [destino] if usada == "copia" else []
+    for auxiliar in arquivos_auxiliares(origem):
+        destino_aux = os.path.join(pasta_destino, os.path.basename(auxiliar))
+        if auxiliar.lower().endswith(SUFIXOS_GRANDES):
+            usada_aux = _entregar_arquivo(auxiliar, destino_aux, estrategia)
+        else:
+            copia(auxiliar, destino_aux)
+            usada_aux = "copia"
+        if usada_aux == "copia":
+            gravados.append(destino_aux)
+
+    return destino, usada, gravados
@@ -1,13 +1,66 @@
 from qgis.core import (
+    Qgis,
+    QgsApplication,
+    QgsFeatureRequest,
     QgsProject,
+    QgsProviderRegistry,
+    QgsTask,
     QgsVectorLayer,
-    QgsFeature,
     QgsWkbTypes,
-    QgsVectorFileWriter
+    QgsCoordinateReferenceSystem
 )
-from qgis.PyQt.QtWidgets import QFileDialog
+from qgis.PyQt.QtCore import Qt, QVariant, QDate, QDateTime, QTime
+from qgis.PyQt.QtWidgets import QFileDialog, QProgressBar, QPushButton
+from osgeo import ogr, osr
 import os
 import re
+import sys
+
+# --------------------------------------------------------
+# CONFIGURAÇÕES
+# --------------------------------------------------------
+# Quantos GeoPackages gerar. Cada polígono vira uma TABELA dentro deles.
+#   1 -> todos os polígonos num único GPKG
+#   N -> polígonos divididos em N GPKGs (fatias contíguas)
+#   0 -> um GPKG por polígono (comportamento antigo)
+NUM_ARQUIVOS = 1
+
+# Adicionar as tabelas geradas ao projeto ao final?
+# As camadas entram num grupo próprio, desmarcadas, e só são lidas
+# do disco quando o usuário liga a visibilidade.
+CARREGAR_NO_PROJETO = False
+
+# A cada quantas feições imprimir o progresso
+INTERVALO_PROGRESSO = 500
+
+# Quantos processos usar. 1 = tudo aqui no QGIS, numa leitura só.
+# > 1 = modo paralelo: os ids são divididos em NUM_ARQUIVOS blocos e cada
+# processo abre a fonte pelo OGR e grava o GPKG do seu bloco (ou um por
+# polígono se NUM_ARQUIVOS = 0). No máximo NUM_ARQUIVOS processos trabalham
+# ao mesmo tempo: com NUM_ARQUIVOS = 1 o paralelo não ajuda. Só funciona
+# com camadas de arquivo.
+PROCESSOS = 1
+
+# Regras para enxugar a tabela na exportação
+# ex.: RENOMEAR_CAMPOS = {"CD_SETOR": "setor"}; REMOVER_CAMPOS = ["V001", "V002"]
+RENOMEAR_CAMPOS = {}
+REMOVER_CAMPOS = []
+
+# Permite importar os módulos auxiliares que ficam na mesma pasta
+try:
+    PASTA_SCRIPT = os.path.dirname(os.path.abspath(__file__))
+except NameError:
+    # O editor do console do QGIS nem sempre define __file__
+    PASTA_SCRIPT = QFileDialog.getExistingDirectory(
+        iface.mainWindow(),
+        "Selecione a pasta 'salvamento' do codigos_qgis"
+    )
+if PASTA_SCRIPT not in sys.path:
+    sys.path.insert(0, PASTA_SCRIPT)
+
+from gpkg_lote import EscritorGpkg, fatiar, caminho_fatia
+from worker_exportacao import PoolExportacao
+from mapeamento_campos import MapeamentoCampos
 
 # --------------------------------------------------------
 # FUNÇÃO AUXILIAR PARA "LIMPAR" NOMES DE ARQUIVO
@@ -24,6 +77,42 @@ def slugify(text):
         text = "layer"
     return text
 
+# --------------------------------------------------------
+# FUNÇÕES AUXILIARES PARA CONVERTER QGIS -> OGR
+# --------------------------------------------------------
+TIPOS_OGR = {
+    QVariant.Int: ogr.OFTInteger,
+    QVariant.UInt: ogr.OFTInteger64,
+    QVariant.LongLong: ogr.OFTInteger64,
+    QVariant.ULongLong: ogr.OFTInteger64,
+    QVariant.Double: ogr.OFTReal,
+    QVariant.Bool: ogr.OFTInteger,
+    QVariant.Date: ogr.OFTDate,
+    QVariant.DateTime: ogr.OFTDateTime,
+    QVariant.Time: ogr.OFTTime,
+}
+
+def campo_para_ogr(field):
+    """Cria a definição OGR equivalente a um QgsField."""
+    defn = ogr.FieldDefn(field.name(), TIPOS_OGR.get(field.type(), ogr.OFTString))
+    if field.type() == QVariant.Bool:
+        defn.SetSubType(ogr.OFSTBoolean)
+    if field.type() == QVariant.String and field.length() > 0:
+        defn.SetWidth(field.length())
+    return defn
+
+def valor_para_ogr(valor):
+    """Converte um valor de atributo do QGIS para algo que o OGR aceita."""
+    if valor is None or (isinstance(valor, QVariant) and valor.isNull()):
+        return None
+    if isinstance(valor, (QDate, QDateTime, QTime)):
+        if valor.isNull():
+            return None
+        return valor.toString(Qt.ISODate)
+    if isinstance(valor, (bool, int, float, str)):
+        return valor
+    return str(valor)
+
 # --------------------------------------------------------
 # 0) PEGAR CAMADA ATIVA
 # --------------------------------------------------------
@@ -38,16 +127,22 @@ if layer.geometryType() != QgsWkbTypes.PolygonGeometry:
 # --------------------------------------------------------
 # 1) DEFINIR CONJUNTO DE FEIÇÕES (SELECIONADAS OU TODAS)
 # --------------------------------------------------------
-selected_feats = layer.selectedFeatures()
+# Não monta lista: as feições são lidas uma única vez, direto do provedor
+total = layer.selectedFeatureCount()
 
-if selected_feats:
-    feats = selected_feats
-    print(f"Usando {len(feats)} feições SELECIONADAS.")
+if total:
+    feats = layer.getSelectedFeatures()
+    print(f"Usando {total} feições SELECIONADAS.")
 else:
-    feats = list(layer.getFeatures())
-    print(f"Nenhuma seleção encontrada. Usando TODAS as {len(feats)} feições.")
+    total = layer.featureCount()
+    if total < 0:
+        # Contagem desconhecida no provedor (-1): conta sem geometria nem atributos
+        pedido = QgsFeatureRequest().setFlags(QgsFeatureRequest.NoGeometry).setNoAttributes()
+        total = sum(1 for _ in layer.getFeatures(pedido))
+    feats = layer.getFeatures()
+    print(f"Nenhuma seleção encontrada. Usando TODAS as {total} feições.")
 
-if not feats:
+if not total:
     raise Exception("Não há feições para processar.")
 
 # --------------------------------------------------------
@@ -72,56 +167,217 @@ base_name = slugify(layer.name())
 
 project = QgsProject.instance()
 
+srs = osr.SpatialReference()
+srs.ImportFromWkt(crs.toWkt(QgsCoordinateReferenceSystem.WKT_PREFERRED_GDAL))
+srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+
+tipo_geometria = int(layer.wkbType())
+
+# Índices de origem compilados uma vez; cada feição copia o vetor inteiro
+mapa_campos = MapeamentoCampos(fields.names(), RENOMEAR_CAMPOS, REMOVER_CAMPOS)
+definicoes_campos = [campo_para_ogr(f) for f in mapa_campos.campos_qgis(fields)]
+
 # --------------------------------------------------------
-# 4) CRIAR ARQUIVO PARA CADA POLÍGONO
+# 4) GRAVAR CADA POLÍGONO COMO UMA TABELA (UMA LEITURA SÓ)
 # --------------------------------------------------------
-for feat in feats:
-    feat_id = feat.id()
+def exportar_em_serie():
+    """
+    Lê as feições uma vez e grava tudo neste processo.
+    As fatias são contíguas, então só existe um escritor aberto por vez.
+    Com NUM_ARQUIVOS = 0, um GPKG por feição, com o nome antigo
+    ({base}_id{fid}.gpkg, o mesmo do modo paralelo).
+    Retorna a lista de (caminho, [tabelas]).
+    """
+    um_por_feicao = NUM_ARQUIVOS == 0
+    fatias = fatiar(total, NUM_ARQUIVOS)
+    print(f"Gravando {total} polígonos em {len(fatias)} GeoPackage(s).")
 
-    # Nome base do arquivo
-    file_name = f"{base_name}_id{feat_id}"
-    file_name = slugify(file_name)
+    saidas = []
+    escritor = None
+    indice_fatia = -1
+    fim_fatia = 0
 
-    # Caminho completo do arquivo GPKG
-    out_path = os.path.join(out_dir, f"{file_name}.gpkg")
+    for i, feat in enumerate(feats):
+        feat_id = feat.id()
+        table_name = slugify(f"{base_name}_id{feat_id}")
 
-    # Criar camada em memória
-    uri = f"Polygon?crs={crs.authid()}"
-    mem_layer = QgsVectorLayer(uri, file_name, "memory")
-    prov = mem_layer.dataProvider()
+        if um_por_feicao:
+            if escritor is not None:
+                escritor.fechar()
+                saidas.append((escritor.caminho, escritor.tabelas))
+            out_path = os.path.join(out_dir, f"{table_name}.gpkg")
+            escritor = EscritorGpkg(out_path, srs, tipo_geometria, definicoes_campos)
+        # Se a contagem do provedor vier menor, o excedente fica na última fatia
+        elif i >= fim_fatia and indice_fatia + 1 < len(fatias):
+            if escritor is not None:
+                escritor.fechar()
+                saidas.append((escritor.caminho, escritor.tabelas))
+            indice_fatia += 1
+            fim_fatia = fatias[indice_fatia][1]
+            out_path = caminho_fatia(out_dir, base_name, indice_fatia, len(fatias))
+            escritor = EscritorGpkg(out_path, srs, tipo_geometria, definicoes_campos)
 
-    # Copiar estrutura de campos
-    prov.addAttributes(fields)
-    mem_layer.updateFields()
+        geom = feat.geometry()
+        wkb = bytes(geom.asWkb()) if geom and not geom.isEmpty() else None
+        valores = [valor_para_ogr(v) for v in mapa_campos.converter(feat.attributes())]
 
-    # Criar nova feição com mesma geometria e atributos
-    new_feat = QgsFeature(mem_layer.fields())
-    new_feat.setGeometry(feat.geometry())
+        escritor.gravar_tabela(table_name, wkb, valores, fid=feat_id)
 
-    for field in fields:
-        new_feat[field.name()] = feat[field.name()]
+        if (i + 1) % INTERVALO_PROGRESSO == 0:
+            print(f"  {i + 1}/{total} polígonos gravados...")
 
-    prov.addFeature(new_feat)
-    mem_layer.updateExtents()
+    if escritor is not None:
+        escritor.fechar()
+        saidas.append((escritor.caminho, escritor.tabelas))
 
-    # Salvar em disco como GPKG
-    error = QgsVectorFileWriter.writeAsVectorFormat(
-        mem_layer,
-        out_path,
-        "UTF-8",
-        crs,
-        "GPKG"
-    )
+    return saidas
+
+# --------------------------------------------------------
+# 5) (OPCIONAL) ADICIONAR AO PROJETO
+# --------------------------------------------------------
+def carregar_saidas(saidas):
+    """Adiciona as tabelas gravadas num grupo próprio, desligadas."""
+    root = project.layerTreeRoot()
+    grupo = root.insertGroup(0, base_name)
+    grupo.setExpanded(False)
+
+    opcoes = QgsVectorLayer.LayerOptions(project.transformContext())
+    opcoes.loadDefaultStyle = False
+
+    camadas = []
+    for out_path, tabelas in saidas:
+        for table_name in tabelas:
+            uri = f"{out_path}|layername={table_name}"
+            saved_layer = QgsVectorLayer(uri, table_name, "ogr", opcoes)
+            if saved_layer.isValid():
+                camadas.append(saved_layer)
+            else:
+                print(f"Aviso: tabela salva, mas não foi possível carregar no QGIS: {uri}")
+
+    # Um único addMapLayers, fora da árvore, e depois tudo no grupo desmarcado
+    project.addMapLayers(camadas, False)
+    for saved_layer in camadas:
+        node = grupo.addLayer(saved_layer)
+        node.setItemVisibilityChecked(False)
 
-    if error == QgsVectorFileWriter.NoError:
-        print(f"Salvo: {out_path}")
-        # Adicionar arquivo salvo ao projeto
-        saved_layer = QgsVectorLayer(out_path, file_name, "ogr")
-        if saved_layer.isValid():
-            project.addMapLayer(saved_layer)
+    print(f"{len(camadas)} camadas adicionadas ao grupo '{base_name}' (desligadas).")
+
+def finalizar(saidas):
+    for out_path, tabelas in saidas:
+        print(f"Salvo: {out_path} ({len(tabelas)} tabela(s))")
+
+    if CARREGAR_NO_PROJETO:
+        carregar_saidas(saidas)
+
+    print("Concluído: cada polígono gravado como uma tabela de GeoPackage.")
+
+# --------------------------------------------------------
+# 6) MODO PARALELO (PROCESSOS > 1)
+# --------------------------------------------------------
+class TarefaExportacaoParalela(QgsTask):
+    """
+    Roda o PoolExportacao em segundo plano. Cada processo abre a fonte
+    pelo OGR e grava os seus próprios GeoPackages.
+    """
+
+    def __init__(self, pool):
+        super().__init__("Exportando polígonos em paralelo", QgsTask.CanCancel)
+        self.pool = pool
+        self.resultado = None
+        self.erro = None
+
+    def run(self):
+        try:
+            self.resultado = self.pool.executar(
+                ao_progredir=lambda feitos, total: self.setProgress(100.0 * feitos / total),
+                cancelado=self.isCanceled
+            )
+        except Exception as e:
+            self.erro = e
+            return False
+        return not self.resultado["cancelado"] and not self.resultado["erros"]
+
+    def finished(self, ok):
+        barra_mensagens.popWidget(item_mensagem)
+
+        if self.erro is not None:
+            print(f"ERRO na exportação paralela: {self.erro}")
+            barra_mensagens.pushMessage("Exportação", str(self.erro), level=Qgis.Critical)
+            return
+
+        for indice, erro in self.resultado["erros"]:
+            print(f"ERRO no bloco {indice}: {erro}")
+
+        if self.resultado["cancelado"]:
+            print("Exportação cancelada. Blocos já concluídos foram mantidos.")
+            barra_mensagens.pushMessage("Exportação", "Cancelada pelo usuário.", level=Qgis.Warning)
+        elif not ok:
+            barra_mensagens.pushMessage(
+                "Exportação",
+                f"{len(self.resultado['erros'])} bloco(s) com erro. Veja o console.",
+                level=Qgis.Critical
+            )
         else:
-            print(f"Aviso: arquivo salvo, mas não foi possível carregar no QGIS: {out_path}")
+            barra_mensagens.pushMessage(
+                "Exportação",
+                f"{total} polígonos exportados em {PROCESSOS} processos.",
+                level=Qgis.Success,
+                duration=10
+            )
+
+        finalizar(self.resultado["saidas"])
+
+def exportar_em_paralelo():
+    """Monta o pool de processos e dispara a tarefa em segundo plano."""
+    global tarefa_exportacao, barra_mensagens, item_mensagem
+
+    if layer.providerType() != "ogr":
+        raise Exception("O modo paralelo precisa de uma camada de arquivo (provedor OGR).")
+
+    partes = QgsProviderRegistry.instance().decodeUri("ogr", layer.source())
+    fonte = partes["path"]
+    camada = partes.get("layerName") or None
+
+    # No provedor OGR o id da feição no QGIS é o FID do OGR
+    if layer.selectedFeatureCount():
+        fids = sorted(layer.selectedFeatureIds())
     else:
-        print(f"ERRO ao salvar: {out_path}")
+        fids = sorted(layer.allFeatureIds())
+
+    pool = PoolExportacao(
+        fonte, camada, fids, out_dir, base_name, PROCESSOS,
+        um_arquivo_por_feicao=(NUM_ARQUIVOS == 0),
+        renomear=RENOMEAR_CAMPOS,
+        remover=REMOVER_CAMPOS,
+        n_arquivos=NUM_ARQUIVOS
+    )
+    print(f"Exportando {len(fids)} polígonos com {PROCESSOS} processos ({len(pool.blocos)} blocos).")
 
-print("Concluído: um arquivo GPKG criado para cada polígono.")
+    # Barra de progresso com botão de cancelar na barra de mensagens
+    barra_mensagens = iface.messageBar()
+    item_mensagem = barra_mensagens.createMessage("Exportação", "Gravando polígonos...")
+    barra_progresso = QProgressBar()
+    barra_progresso.setRange(0, 100)
+    botao_cancelar = QPushButton("Cancelar")
+    item_mensagem.layout().addWidget(barra_progresso)
+    item_mensagem.layout().addWidget(botao_cancelar)
+    barra_mensagens.pushWidget(item_mensagem, Qgis.Info)
+
+    # Guarda referência global para a tarefa não ser coletada pelo Python
+    tarefa_exportacao = TarefaExportacaoParalela(pool)
+    botao_cancelar.clicked.connect(tarefa_exportacao.cancel)
+
+    gerenciador = QgsApplication.taskManager()
+    id_tarefa = gerenciador.addTask(tarefa_exportacao)
+
+    # O sinal do gerenciador chega na thread principal (pode mexer na barra)
+    def ao_progredir(id_recebido, progresso):
+        if id_recebido == id_tarefa:
+            barra_progresso.setValue(int(progresso))
+
+    gerenciador.progressChanged.connect(ao_progredir)
+
+if PROCESSOS > 1:
+    exportar_em_paralelo()
+else:
+    finalizar(exportar_em_serie())
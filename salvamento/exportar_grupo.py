@@ -1,16 +1,78 @@
 import os
-import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from qgis.core import (
+    Qgis,
+    QgsApplication,
     QgsProject,
+    QgsFeature,
+    QgsFeatureRequest,
+    QgsTask,
     QgsVectorLayer,
     QgsRasterLayer,
     QgsVectorFileWriter,
     QgsLayerTreeGroup
 )
+from qgis.PyQt.QtCore import QTimer
 from qgis.PyQt.QtWidgets import QFileDialog, QInputDialog
 from qgis.utils import iface
 
+# CONFIGURAÇÕES
+
+# Regras de campos aplicadas a todas as camadas vetoriais do grupo
+# (campos que não existem numa camada são ignorados nela)
+# ex.: RENOMEAR_CAMPOS = {"CD_MUN": "cod_mun"}; REMOVER_CAMPOS = ["OBJECTID"]
+RENOMEAR_CAMPOS = {}
+REMOVER_CAMPOS = []
+
+# Como entregar os rasters na pasta de saída:
+#   "auto"     -> reflink (copy-on-write) ou hardlink se der, senão cópia
+#   "hardlink" -> mesmo arquivo no disco (mesmo sistema de arquivos)
+#   "reflink"  -> cópia copy-on-write (Btrfs, XFS, APFS)
+#   "vrt"      -> .vrt apontando para o original (não copia nada)
+#   "copia"    -> cópia fiel do arquivo (comportamento antigo)
+ENTREGA_RASTER = "auto"
+
+# Quantas camadas exportar ao mesmo tempo (vetores em tarefas do QGIS,
+# rasters num pool de threads). A interface continua livre durante a exportação.
+LIMITE_CONCORRENCIA = 4
+
+# Ordem física das feições nos GPKGs vetoriais (ver gpkg_espacial.py):
+#   None      -> ordem da camada de origem (comportamento antigo)
+#   "hilbert" -> feições vizinhas no mapa ficam vizinhas no arquivo; o R-tree
+#                é criado depois da carga e o arquivo passa por VACUUM/ANALYZE.
+#                Renderização e consultas por retângulo ficam mais rápidas
+#                (principalmente em pastas de rede). Os fids são renumerados.
+#   "morton"  -> idem, com a curva Z
+ORDEM_ESPACIAL = None
+
+# Permite importar os módulos auxiliares que ficam na mesma pasta
+try:
+    PASTA_SCRIPT = os.path.dirname(os.path.abspath(__file__))
+except NameError:
+    # O editor do console do QGIS nem sempre define __file__
+    PASTA_SCRIPT = QFileDialog.getExistingDirectory(
+        iface.mainWindow(),
+        "Selecione a pasta 'salvamento' do codigos_qgis"
+    )
+if PASTA_SCRIPT not in sys.path:
+    sys.path.insert(0, PASTA_SCRIPT)
+
+# Módulos compartilhados entre as pastas (comum/)
+PASTA_COMUM = os.path.join(os.path.dirname(PASTA_SCRIPT), "comum")
+if PASTA_COMUM not in sys.path:
+    sys.path.insert(0, PASTA_COMUM)
+
+from mapeamento_campos import MapeamentoCampos
+from formatacao import formatar_bytes
+from manifesto_exportacao import Manifesto, hash_estilo
+from entrega_raster import entregar_raster
+if ORDEM_ESPACIAL:
+    import numpy as np
+    from gpkg_espacial import ordem_espacial, indexar_e_compactar
+
 # 0. ESCOLHER GRUPO EM CAIXA DE DIÁLOGO
 
 project = QgsProject.instance()
@@ -79,20 +141,22 @@ if not output_folder:
 os.makedirs(output_folder, exist_ok=True)
 print(f"Arquivos serão salvos em:\n{output_folder}\n")
 
-# 2. EXPORTAR CAMADAS DO GRUPO
-
-transform_context = project.transformContext()
+# Manifesto da pasta: o que não mudou desde a última exportação é pulado
+manifesto = Manifesto(output_folder)
 
-for node in layer_nodes:
-    layer = node.layer()
-    if layer is None:
-        continue
+# 2. PLANEJAR A EXPORTAÇÃO (THREAD PRINCIPAL)
+#
+# Vetores: uma QgsTask por camada (writeAsVectorFormatV3 em segundo plano)
+#          (com edições não salvas ou em memória: na thread principal)
+# Rasters: uma QgsTask com um pool de threads para as entregas de arquivo
+# Estilos: fila própria na thread principal (saveNamedStyle mexe na camada),
+#          só depois que os dados da camada foram gravados
 
-    layer_name = layer.name()
-    print(f"Processando camada: {layer_name}")
+transform_context = project.transformContext()
 
-    # Cria um nome "seguro" para arquivo
-    safe_name = (
+def nome_seguro(layer_name):
+    """Cria um nome "seguro" para arquivo."""
+    return (
         layer_name.replace(" ", "_")
         .replace("/", "_")
         .replace("\\", "_")
@@ -105,51 +169,167 @@ for node in layer_nodes:
         .replace("|", "_")
     )
 
+# Feições lidas por vez ao gravar em ordem espacial
+LOTE_ORDEM_ESPACIAL = 10000
+
+def feicoes_em_ordem_espacial(layer, chave):
+    """
+    Feições da camada na ordem da curva 'chave' (ver gpkg_espacial.py).
+    A ordem sai dos centros dos envelopes (uma leitura sem atributos); as
+    feições vêm em lotes de LOTE_ORDEM_ESPACIAL fids e são entregues na
+    ordem, sem a camada inteira na memória.
+    """
+    fids, x, y = [], [], []
+    for feat in layer.getFeatures(QgsFeatureRequest().setNoAttributes()):
+        fids.append(feat.id())
+        geom = feat.geometry()
+        if geom.isNull() or geom.isEmpty():
+            x.append(np.nan)
+            y.append(np.nan)
+            continue
+        centro = geom.boundingBox().center()
+        x.append(centro.x())
+        y.append(centro.y())
+    ordem = ordem_espacial(np.array(fids, dtype=np.int64), np.array(x), np.array(y), chave).tolist()
+
+    for inicio in range(0, len(ordem), LOTE_ORDEM_ESPACIAL):
+        lote = ordem[inicio:inicio + LOTE_ORDEM_ESPACIAL]
+        # setFilterFids não devolve as feições na ordem pedida
+        feicoes = {feat.id(): feat for feat in layer.getFeatures(QgsFeatureRequest().setFilterFids(lote))}
+        for fid in lote:
+            yield feicoes[fid]
+
+def gravar_vetor_mapeado(layer, data_path, mapa, options, feicoes=None):
+    """
+    Grava a camada aplicando o mapa de campos feição a feição
+    (usado quando o QGIS não tem SaveVectorOptions.attributesExportNames,
+    e na gravação em ordem espacial).
+    - feicoes: feições a gravar, na ordem; None = layer.getFeatures().
+      Com feicoes, o campo "fid" (GPKG de origem) recebe a posição na
+      gravação: os fids são renumerados na ordem nova.
+    Retorna a mesma tupla do writeAsVectorFormatV3.
+    """
+    campos = mapa.campos_qgis(layer.fields())
+    writer = QgsVectorFileWriter.create(
+        data_path,
+        campos,
+        layer.wkbType(),
+        layer.crs(),
+        transform_context,
+        options
+    )
+    if writer.hasError() != QgsVectorFileWriter.NoError:
+        return writer.hasError(), writer.errorMessage(), data_path, ""
+
+    indice_fid = campos.lookupField("fid") if feicoes is not None else -1
+    if feicoes is None:
+        feicoes = layer.getFeatures()
+
+    # Uma feição de destino reaproveitada; os atributos vão num setAttributes só
+    feat_destino = QgsFeature(campos)
+    for posicao, feat in enumerate(feicoes, start=1):
+        feat_destino.setGeometry(feat.geometry())
+        mapa.copiar(feat, feat_destino)
+        if indice_fid >= 0:
+            feat_destino.setAttribute(indice_fid, posicao)
+        writer.addFeature(feat_destino)
+
+    del writer  # fecha o arquivo
+    return QgsVectorFileWriter.NoError, "", data_path, options.layerName
+
+class ItemExportacao:
+    """Uma camada do grupo: o que fazer com ela e quanto tempo levou."""
+
+    def __init__(self, layer, tipo, chave, data_path, style_path):
+        self.layer = layer
+        self.nome = layer.name()
+        self.tipo = tipo                # "vetor" ou "raster"
+        self.chave = chave              # chave no manifesto
+        self.data_path = data_path
+        self.style_path = style_path
+        self.dados = None               # assinatura para o manifesto
+        self.acao_dados = "pulado"      # pulado / gravado / erro
+        self.acao_estilo = "pulado"
+        self.tempo_dados = 0.0
+        self.tempo_estilo = 0.0
+        self.bytes = 0
+        self.erro = ""
+        self.thread_principal = False   # vetor gravado fora das tarefas
+
+itens = []
+itens_vetor = []     # precisam regravar dados
+itens_raster = []
+
+for node in layer_nodes:
+    layer = node.layer()
+    if layer is None:
+        continue
+
+    layer_name = layer.name()
+    safe_name = nome_seguro(layer_name)
+
     # CAMADAS VETORIAIS
     if isinstance(layer, QgsVectorLayer):
-        print(f"  → Salvando VETOR como GeoPackage...")
-
-        data_path = os.path.join(output_folder, f"{safe_name}.gpkg")
-        style_path = os.path.join(output_folder, f"{safe_name}.qml")
+        item = ItemExportacao(
+            layer, "vetor", safe_name,
+            os.path.join(output_folder, f"{safe_name}.gpkg"),
+            os.path.join(output_folder, f"{safe_name}.qml")
+        )
 
         options = QgsVectorFileWriter.SaveVectorOptions()
         options.driverName = "GPKG"
         options.fileEncoding = "UTF-8"
         options.layerName = safe_name  # nome da camada dentro do GPKG
-
-        result = QgsVectorFileWriter.writeAsVectorFormatV3(
-            layer,
-            data_path,
-            transform_context,
-            options
+        if ORDEM_ESPACIAL:
+            # O R-tree é criado depois da carga ordenada
+            options.layerOptions = ["SPATIAL_INDEX=NO"]
+
+        mapa = MapeamentoCampos(
+            layer.fields().names(),
+            RENOMEAR_CAMPOS,
+            REMOVER_CAMPOS,
+            ignorar_ausentes=True
         )
-
-        # (error_code, error_message, new_path, new_layer)
-        error = result[0]
-        error_message = result[1]
-        new_path = result[2]
-
-        if error == QgsVectorFileWriter.NoError:
-            print(f"    Vetor salvo em: {new_path}")
+        if not mapa.identidade:
+            options.attributes = mapa.indices
+            if mapa.renomeia_campos and hasattr(options, "attributesExportNames"):
+                options.attributesExportNames = mapa.nomes
+        item.options = options
+        item.mapa = mapa
+
+        # Edições não salvas e camadas em memória não passam para o clone()
+        # da tarefa em segundo plano: essas são gravadas na thread principal,
+        # com a própria camada
+        if layer.isModified():
+            print(f"Aviso: '{layer_name}' tem edições não salvas; será gravada com elas, na thread principal.")
+            item.thread_principal = True
+        elif layer.providerType() == "memory":
+            item.thread_principal = True
+
+        # Regras de campos e filtro também mudam o arquivo de saída
+        extra = f"{mapa.indices}|{mapa.nomes}|{layer.subsetString()}|{ORDEM_ESPACIAL}"
+        # Com edições não salvas o arquivo de origem não representa a camada:
+        # sem assinatura, a camada sempre é gravada e sai do manifesto (se as
+        # edições forem descartadas, a próxima exportação grava de novo)
+        if layer.isModified():
+            item.dados = None
+            manifesto.esquecer_dados(safe_name)
         else:
-            print(f"    Erro ao salvar vetor '{layer_name}': {error_message}")
-            continue
+            item.dados = manifesto.assinatura_dados(safe_name, layer, extra)
 
-        # Salva simbologia em QML
-        if layer.saveNamedStyle(style_path):
-            print(f"    Estilo salvo em: {style_path}")
+        if manifesto.dados_iguais(safe_name, item.dados, [item.data_path]):
+            manifesto.contar_pulado(item.data_path)
+            manifesto.registrar(safe_name, dados=item.dados)   # data nova, se só foi "tocado"
         else:
-            print(f"    Não foi possível salvar o estilo da camada '{layer_name}'.")
+            itens_vetor.append(item)
 
     # CAMADAS RASTER
     elif isinstance(layer, QgsRasterLayer):
-        print(f"  → Salvando RASTER (cópia fiel do original)...")
-
         origem = layer.source()
 
         # Pula fontes não-arquivo (WMS, XYZ, etc.)
         if not os.path.isfile(origem):
-            print(f"    Raster '{layer_name}' não é um arquivo local simples (origem: {origem}). Pulando.")
+            print(f"Raster '{layer_name}' não é um arquivo local simples (origem: {origem}). Pulando.")
             continue
 
         # Mesmo nome base do arquivo original
@@ -157,24 +337,243 @@ for node in layer_nodes:
         if not ext:
             ext = ".tif"  # fallback
 
-        raster_path = os.path.join(output_folder, base_name + ext)
-        style_path = os.path.join(output_folder, base_name + ".qml")
-
-        try:
-            shutil.copy(origem, raster_path)
-            print(f"    Raster copiado fielmente: {raster_path}")
-        except Exception as e:
-            print(f"    Erro ao copiar raster '{layer_name}': {e}")
-            continue
+        ext_saida = ".vrt" if ENTREGA_RASTER == "vrt" else ext
+        item = ItemExportacao(
+            layer, "raster", base_name + ext,
+            os.path.join(output_folder, base_name + ext_saida),
+            os.path.join(output_folder, base_name + ".qml")
+        )
+        item.origem = origem
+        item.dados = manifesto.assinatura_dados(item.chave, layer, ENTREGA_RASTER)
 
-        # Salva simbologia em QML (mesmo nome do raster)
-        if layer.saveNamedStyle(style_path):
-            print(f"    Estilo do raster salvo em: {style_path}")
+        if manifesto.dados_iguais(item.chave, item.dados, [item.data_path]):
+            manifesto.contar_pulado(item.data_path)
+            manifesto.registrar(item.chave, dados=item.dados)
         else:
-            print(f"    Não foi possível salvar o estilo do raster '{layer_name}'.")
+            itens_raster.append(item)
 
     # TIPO DE CAMADA NÃO RECONHECIDO
     else:
-        print(f"  Tipo de camada não suportado: {type(layer).__name__}")
+        print(f"Tipo de camada não suportado: {layer_name} ({type(layer).__name__})")
+        continue
+
+    itens.append(item)
+
+print(
+    f"{len(itens)} camada(s): {len(itens_vetor)} vetor(es) e {len(itens_raster)} raster(s) "
+    f"para regravar, até {LIMITE_CONCORRENCIA} ao mesmo tempo.\n"
+)
+
+# 3. TAREFAS EM SEGUNDO PLANO
+
+def gravar_vetor(item, layer):
+    """Grava 'layer' no GPKG do item. Retorna True/False (erro em item.erro)."""
+    inicio = time.perf_counter()
+    try:
+        if ORDEM_ESPACIAL:
+            # Ordem calculada na origem e arquivo gravado uma vez, já nela
+            result = gravar_vetor_mapeado(
+                layer, item.data_path, item.mapa, item.options,
+                feicoes_em_ordem_espacial(layer, ORDEM_ESPACIAL)
+            )
+        elif item.mapa.renomeia_campos and not hasattr(item.options, "attributesExportNames"):
+            result = gravar_vetor_mapeado(layer, item.data_path, item.mapa, item.options)
+        else:
+            result = QgsVectorFileWriter.writeAsVectorFormatV3(
+                layer,
+                item.data_path,
+                transform_context,
+                item.options
+            )
+
+        # (error_code, error_message, new_path, new_layer)
+        if result[0] != QgsVectorFileWriter.NoError:
+            item.erro = result[1]
+            return False
+
+        if ORDEM_ESPACIAL:
+            indexar_e_compactar(item.data_path, item.options.layerName)
+    except Exception as e:
+        item.erro = str(e)
+        return False
+    finally:
+        item.tempo_dados = time.perf_counter() - inicio
+    return True
+
+class TarefaVetor(QgsTask):
+    """Grava um vetor em GPKG numa thread do gerenciador de tarefas."""
+
+    def __init__(self, item):
+        super().__init__(f"Exportando {item.nome}", QgsTask.CanCancel)
+        self.item = item
+        # Cópia própria da camada: a original continua só na thread principal
+        # (camadas editadas ou em memória não vêm para cá; ver thread_principal)
+        self.copia = item.layer.clone()
+
+    def run(self):
+        return gravar_vetor(self.item, self.copia)
+
+    def finished(self, ok):
+        pipeline.vetor_concluido(self.item, ok)
+
+class TarefaRasters(QgsTask):
+    """Entrega todos os rasters com um pool de threads (operações de arquivo)."""
+
+    def __init__(self, itens_raster, n_threads):
+        super().__init__("Entregando rasters", QgsTask.CanCancel)
+        self.itens_raster = itens_raster
+        self.n_threads = n_threads
+
+    def entregar(self, item):
+        if self.isCanceled():
+            item.erro = "cancelado"
+            return item
+        inicio = time.perf_counter()
+        try:
+            item.data_path, item.estrategia, item.gravados = entregar_raster(
+                item.origem, output_folder, ENTREGA_RASTER
+            )
+        except Exception as e:
+            item.erro = str(e)
+        item.tempo_dados = time.perf_counter() - inicio
+        return item
+
+    def run(self):
+        with ThreadPoolExecutor(max_workers=self.n_threads) as pool:
+            for n, _ in enumerate(pool.map(self.entregar, self.itens_raster), start=1):
+                self.setProgress(100.0 * n / len(self.itens_raster))
+        return not self.isCanceled()
+
+    def finished(self, ok):
+        pipeline.rasters_concluidos(self.itens_raster)
+
+class PipelineExportacao:
+    """
+    Controla as filas: no máximo LIMITE_CONCORRENCIA vetores ao mesmo tempo,
+    rasters num pool com o mesmo limite e estilos um por vez na thread
+    principal (um QTimer por item, para a interface não congelar).
+    O estilo de um item só entra na fila depois que os dados dele foram
+    gravados (ou pulados por não terem mudado); se a gravação falha, o QML
+    não é salvo.
+    """
+
+    def __init__(self):
+        self.fila_vetores = list(itens_vetor)
+        regravar = {id(item) for item in itens_vetor + itens_raster}
+        self.fila_estilos = [item for item in itens if id(item) not in regravar]
+        self.estilo_agendado = False
+        self.vetores_rodando = 0
+        self.rasters_pendentes = bool(itens_raster)
+        self.tarefas = []   # referências: a tarefa não pode ser coletada pelo Python
+        self.inicio = time.perf_counter()
+
+    def iniciar(self):
+        gerenciador = QgsApplication.taskManager()
+        if itens_raster:
+            tarefa = TarefaRasters(itens_raster, LIMITE_CONCORRENCIA)
+            self.tarefas.append(tarefa)
+            gerenciador.addTask(tarefa)
+        self.lancar_vetores()
+        self.agendar_estilo()
+
+    def lancar_vetores(self):
+        while self.fila_vetores and self.vetores_rodando < LIMITE_CONCORRENCIA:
+            item = self.fila_vetores.pop(0)
+            self.vetores_rodando += 1
+            if item.thread_principal:
+                QTimer.singleShot(0, lambda item=item: self.vetor_concluido(item, gravar_vetor(item, item.layer)))
+                continue
+            tarefa = TarefaVetor(item)
+            self.tarefas.append(tarefa)
+            QgsApplication.taskManager().addTask(tarefa)
+        self.verificar_fim()
+
+    def vetor_concluido(self, item, ok):
+        self.vetores_rodando -= 1
+        if ok:
+            item.acao_dados = "gravado"
+            item.bytes += os.path.getsize(item.data_path)
+            manifesto.contar_gravado(item.data_path)
+            manifesto.registrar(item.chave, dados=item.dados)
+            self.enfileirar_estilo(item)
+        else:
+            item.acao_dados = "erro"
+            item.erro = item.erro or "cancelado"
+            print(f"Erro ao salvar vetor '{item.nome}': {item.erro}")
+        self.lancar_vetores()
+
+    def rasters_concluidos(self, lista):
+        self.rasters_pendentes = False
+        for item in lista:
+            if item.erro:
+                item.acao_dados = "erro"
+                print(f"Erro ao entregar raster '{item.nome}': {item.erro}")
+                continue
+            item.acao_dados = f"gravado ({item.estrategia})"
+            item.bytes += sum(os.path.getsize(c) for c in item.gravados)
+            manifesto.contar_gravado(*item.gravados)
+            manifesto.registrar(item.chave, dados=item.dados)
+            self.enfileirar_estilo(item)
+        self.verificar_fim()
+
+    def enfileirar_estilo(self, item):
+        self.fila_estilos.append(item)
+        self.agendar_estilo()
+
+    def agendar_estilo(self):
+        if self.fila_estilos and not self.estilo_agendado:
+            self.estilo_agendado = True
+            QTimer.singleShot(0, self.proximo_estilo)
+
+    def proximo_estilo(self):
+        """Salva o QML de um item e agenda o próximo (thread principal)."""
+        self.estilo_agendado = False
+        if self.fila_estilos:
+            item = self.fila_estilos.pop(0)
+            inicio = time.perf_counter()
+            estilo = hash_estilo(item.layer)
+            if manifesto.estilo_igual(item.chave, estilo, item.style_path):
+                manifesto.contar_pulado(item.style_path)
+            elif item.layer.saveNamedStyle(item.style_path):
+                item.acao_estilo = "gravado"
+                item.bytes += os.path.getsize(item.style_path)
+                manifesto.contar_gravado(item.style_path)
+                manifesto.registrar(item.chave, estilo=estilo)
+            else:
+                item.acao_estilo = "erro"
+                print(f"Não foi possível salvar o estilo da camada '{item.nome}'.")
+            item.tempo_estilo = time.perf_counter() - inicio
+            self.agendar_estilo()
+        self.verificar_fim()
+
+    def verificar_fim(self):
+        if self.fila_vetores or self.vetores_rodando or self.rasters_pendentes or self.fila_estilos:
+            return
+        if getattr(self, "concluido", False):
+            return
+        self.concluido = True
+        self.resumo()
+
+    def resumo(self):
+        manifesto.salvar()
+
+        largura = max([len(item.nome) for item in itens] + [6])
+        print(f"{'Camada':<{largura}}  {'Tipo':<6}  {'Dados':<20}  {'Estilo':<8}  {'t dados':>8}  {'t estilo':>8}  {'Bytes':>10}")
+        for item in itens:
+            print(
+                f"{item.nome:<{largura}}  {item.tipo:<6}  {item.acao_dados:<20}  {item.acao_estilo:<8}  "
+                f"{item.tempo_dados:>7.2f}s  {item.tempo_estilo:>7.2f}s  {formatar_bytes(item.bytes):>10}"
+            )
+
+        print(f"\nExportação concluída em {time.perf_counter() - self.inicio:.1f} s! Arquivos salvos em: {output_folder}")
+        print(f"Regravados: {manifesto.regravados} arquivo(s), {formatar_bytes(manifesto.bytes_copiados)}")
+        print(f"Pulados (sem alteração): {manifesto.pulados} arquivo(s), {formatar_bytes(manifesto.bytes_pulados)}")
+        iface.messageBar().pushMessage(
+            "Exportação",
+            f"Grupo '{group_name}' exportado ({len(itens)} camadas).",
+            level=Qgis.Success,
+            duration=10
+        )
 
-print(f"\nExportação concluída! Arquivos salvos em: {output_folder}")
+pipeline = PipelineExportacao()
+pipeline.iniciar()
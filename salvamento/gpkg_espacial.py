@@ -0,0 +1,139 @@
+"""
+GeoPackage com as feições em ordem espacial.
+
+No GPKG a tabela é guardada na ordem do fid (é o rowid do SQLite): feições
+gravadas em ordem de curva de Hilbert ficam vizinhas também no arquivo, e
+uma leitura por retângulo (renderização, getFeatures(rect)) toca poucas
+páginas em vez de páginas espalhadas pelo arquivo todo. Faz diferença
+principalmente em pastas de rede.
+
+Passos:
+1. lê só os envelopes da origem (atributos ignorados) e calcula a ordem
+   (ordenacao_espacial.py, na pasta 'comum')
+2. grava as feições nessa ordem, numa transação, sem índice espacial
+   (os fids são renumerados 1, 2, 3... na ordem nova)
+3. cria o R-tree de uma vez no final, em vez de atualizá-lo a cada feição
+4. VACUUM e ANALYZE
+
+O exportar_grupo.py faz o passo 1 na camada do QGIS e grava o GPKG uma
+vez só, já na ordem (ordem_espacial + indexar_e_compactar);
+reescrever_ordenado faz tudo pelo OGR, a partir de um arquivo já gravado.
+
+Este módulo não depende do QGIS (só do GDAL/OGR e NumPy).
+"""
+import os
+
+import numpy as np
+from osgeo import ogr
+
+from ordenacao_espacial import ordenar
+
+ogr.UseExceptions()
+
+# Chaves que fazem sentido para organizar o arquivo
+CHAVES_GPKG = ("hilbert", "morton")
+
+
+def _abrir_camada(ds, camada):
+    lyr = ds.GetLayerByName(camada) if camada else ds.GetLayer(0)
+    if lyr is None:
+        raise Exception(f"Camada '{camada}' não encontrada em: {ds.GetDescription()}")
+    return lyr
+
+
+def centros_envelopes(lyr):
+    """
+    (fids, x, y) do centro do envelope de cada feição, lendo só geometrias.
+    Feições sem geometria ficam com x = y = NaN.
+    """
+    defn = lyr.GetLayerDefn()
+    lyr.SetIgnoredFields([defn.GetFieldDefn(i).GetName() for i in range(defn.GetFieldCount())])
+    fids, x, y = [], [], []
+    lyr.ResetReading()
+    for feat in lyr:
+        geom = feat.GetGeometryRef()
+        fids.append(feat.GetFID())
+        if geom is None or geom.IsEmpty():
+            x.append(np.nan)
+            y.append(np.nan)
+            continue
+        xmin, xmax, ymin, ymax = geom.GetEnvelope()
+        x.append((xmin + xmax) / 2)
+        y.append((ymin + ymax) / 2)
+    lyr.SetIgnoredFields([])
+    return np.array(fids, dtype=np.int64), np.array(x), np.array(y)
+
+
+def ordem_espacial(fids, x, y, chave="hilbert"):
+    """fids na ordem da chave; feições sem geometria vão para o fim."""
+    if chave not in CHAVES_GPKG:
+        raise Exception(f"Chave de ordem espacial inválida: '{chave}'. Use uma de {CHAVES_GPKG}.")
+    com_geometria = ~np.isnan(x)
+    if not com_geometria.any():
+        return fids
+    posicoes = ordenar(x[com_geometria], y[com_geometria], chave)
+    return np.concatenate([fids[com_geometria][posicoes], fids[~com_geometria]])
+
+
+def indexar_e_compactar(caminho, camada):
+    """Cria o R-tree da camada (se ainda não existir) e roda VACUUM e ANALYZE."""
+    ds = ogr.Open(caminho, 1)
+    if ds is None:
+        raise Exception(f"Não foi possível abrir o GeoPackage: {caminho}")
+    lyr = _abrir_camada(ds, camada)
+    coluna = lyr.GetGeometryColumn()
+    if coluna and lyr.TestCapability(ogr.OLCFastSpatialFilter) == 0:
+        tabela = lyr.GetName().replace("'", "''")
+        ds.ExecuteSQL(f"SELECT CreateSpatialIndex('{tabela}', '{coluna}')")
+    ds.ExecuteSQL("VACUUM")
+    ds.ExecuteSQL("ANALYZE")
+    ds = None
+
+
+def reescrever_ordenado(origem, destino, camada=None, chave="hilbert"):
+    """
+    Copia a camada 'camada' de 'origem' para um GPKG novo em 'destino',
+    com as feições na ordem da curva 'chave', R-tree criado depois da
+    carga, VACUUM e ANALYZE. Retorna o número de feições gravadas.
+    """
+    ds_origem = ogr.Open(origem, 0)
+    if ds_origem is None:
+        raise Exception(f"Não foi possível abrir a origem pelo OGR: {origem}")
+    lyr_origem = _abrir_camada(ds_origem, camada)
+    nome = lyr_origem.GetName()
+
+    fids, x, y = centros_envelopes(lyr_origem)
+    ordem = ordem_espacial(fids, x, y, chave)
+
+    driver = ogr.GetDriverByName("GPKG")
+    if os.path.exists(destino):
+        driver.DeleteDataSource(destino)
+    ds = driver.CreateDataSource(destino)
+    if ds is None:
+        raise Exception(f"Não foi possível criar o GeoPackage: {destino}")
+
+    opcoes = ["SPATIAL_INDEX=NO"]
+    if lyr_origem.GetGeometryColumn():
+        opcoes.append(f"GEOMETRY_NAME={lyr_origem.GetGeometryColumn()}")
+    if lyr_origem.GetFIDColumn():
+        opcoes.append(f"FID={lyr_origem.GetFIDColumn()}")
+    lyr = ds.CreateLayer(nome, lyr_origem.GetSpatialRef(), lyr_origem.GetGeomType(), options=opcoes)
+    defn_origem = lyr_origem.GetLayerDefn()
+    for i in range(defn_origem.GetFieldCount()):
+        lyr.CreateField(defn_origem.GetFieldDefn(i))
+
+    defn = lyr.GetLayerDefn()
+    ds.StartTransaction()
+    for fid in ordem.tolist():
+        feat_origem = lyr_origem.GetFeature(fid)
+        feat = ogr.Feature(defn)
+        # Mesmo esquema, mesmos índices de campo; fid novo = posição na ordem
+        feat.SetFrom(feat_origem)
+        feat.SetFID(ogr.NullFID)
+        lyr.CreateFeature(feat)
+    ds.CommitTransaction()
+    ds = None
+    ds_origem = None
+
+    indexar_e_compactar(destino, nome)
+    return len(ordem)
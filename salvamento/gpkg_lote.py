@@ -0,0 +1,124 @@
+"""
+Gravação em lote de muitas tabelas pequenas em GeoPackage, direto pelo OGR.
+
+Cada arquivo de saída tem UM único datasource aberto e tudo é gravado dentro
+de uma transação, em vez de abrir/fechar um writer por feição.
+Este módulo não depende do QGIS (só do GDAL/OGR), para poder ser usado
+também fora do console.
+"""
+import os
+from contextlib import contextmanager
+
+from osgeo import gdal, ogr
+
+ogr.UseExceptions()
+
+
+@contextmanager
+def sem_sincronizar():
+    """
+    OGR_SQLITE_SYNCHRONOUS=OFF (sem fsync a cada commit) só enquanto dura o
+    bloco e só nesta thread: o arquivo do lote só é usado depois que o lote
+    termina, mas outros GeoPackages abertos pelo processo (ou pelo QGIS)
+    continuam com o valor que tinham.
+    """
+    anterior = gdal.GetThreadLocalConfigOption("OGR_SQLITE_SYNCHRONOUS", None)
+    gdal.SetThreadLocalConfigOption("OGR_SQLITE_SYNCHRONOUS", "OFF")
+    try:
+        yield
+    finally:
+        gdal.SetThreadLocalConfigOption("OGR_SQLITE_SYNCHRONOUS", anterior)
+
+
+def fatiar(total, n_arquivos):
+    """
+    Divide 'total' itens em 'n_arquivos' fatias contíguas.
+    Retorna a lista de (inicio, fim) de cada fatia.
+    n_arquivos <= 0 -> uma fatia por item (um arquivo por feição).
+    """
+    if total <= 0:
+        return []
+    if n_arquivos <= 0 or n_arquivos > total:
+        n_arquivos = total
+
+    fatias = []
+    for i in range(n_arquivos):
+        inicio = i * total // n_arquivos
+        fim = (i + 1) * total // n_arquivos
+        fatias.append((inicio, fim))
+    return fatias
+
+
+def caminho_fatia(pasta, nome_base, indice, n_fatias):
+    """
+    Caminho do GPKG de uma fatia.
+    Com uma fatia só o arquivo leva apenas o nome base.
+    """
+    if n_fatias == 1:
+        return os.path.join(pasta, f"{nome_base}.gpkg")
+    digitos = len(str(n_fatias))
+    return os.path.join(pasta, f"{nome_base}_{str(indice + 1).zfill(digitos)}.gpkg")
+
+
+class EscritorGpkg:
+    """
+    Um GeoPackage aberto uma vez, com uma transação aberta até 'fechar()'.
+    Cada chamada de 'gravar_tabela' cria uma tabela nova com uma feição.
+    """
+
+    def __init__(self, caminho, srs, tipo_geometria, definicoes_campos):
+        self.caminho = caminho
+        self.srs = srs
+        self.tipo_geometria = tipo_geometria
+        self.definicoes_campos = definicoes_campos
+        self.tabelas = []
+
+        driver = ogr.GetDriverByName("GPKG")
+        if os.path.exists(caminho):
+            driver.DeleteDataSource(caminho)
+        # A opção é lida quando a conexão SQLite é aberta
+        with sem_sincronizar():
+            self.ds = driver.CreateDataSource(caminho)
+            if self.ds is None:
+                raise Exception(f"Não foi possível criar o GeoPackage: {caminho}")
+
+            self.ds.StartTransaction()
+
+    def gravar_tabela(self, nome_tabela, geometria_wkb, valores, fid=None):
+        """
+        Cria a tabela 'nome_tabela' e grava nela uma feição.
+        'valores' segue a mesma ordem de 'definicoes_campos'
+        (None = NULL).
+        """
+        # Tabelas de uma feição só não precisam de índice espacial
+        lyr = self.ds.CreateLayer(
+            nome_tabela,
+            self.srs,
+            self.tipo_geometria,
+            options=["SPATIAL_INDEX=NO"]
+        )
+        for defn in self.definicoes_campos:
+            lyr.CreateField(defn)
+
+        feat = ogr.Feature(lyr.GetLayerDefn())
+        if fid is not None:
+            feat.SetFID(fid)
+        if geometria_wkb is not None:
+            feat.SetGeometry(ogr.CreateGeometryFromWkb(geometria_wkb))
+
+        for i, valor in enumerate(valores):
+            if valor is None:
+                feat.SetFieldNull(i)
+            else:
+                feat.SetField(i, valor)
+
+        lyr.CreateFeature(feat)
+        self.tabelas.append(nome_tabela)
+
+    def fechar(self):
+        """Confirma a transação e fecha o arquivo."""
+        if self.ds is None:
+            return
+        with sem_sincronizar():
+            self.ds.CommitTransaction()
+            self.ds = None
@@ -0,0 +1,195 @@
+"""
+Manifesto de exportação incremental.
+
+Guarda, num JSON dentro da pasta de saída, o que foi exportado de cada
+camada: caminho de origem, tamanho e data de modificação de cada arquivo
+(incluindo os auxiliares: .dbf/.shx/.prj do shapefile, -wal do GeoPackage,
+.ovr/.aux.xml/.tfw do raster), número de feições, um hash rápido do
+conteúdo e um hash do estilo. Na próxima exportação só é regravado o que
+mudou.
+
+O hash só é recalculado quando tamanho ou data de algum arquivo mudam, e
+é por amostras (começo, meio e fim, mais o tamanho): uma edição do mesmo
+tamanho fora das amostras passa despercebida, mas a data nova faz o
+arquivo ser conferido de novo. Se o hash bater (arquivo só "tocado"), a
+data nova fica gravada e o arquivo não é lido na próxima vez.
+"""
+import hashlib
+import json
+import os
+
+from qgis.PyQt.QtXml import QDomDocument
+
+from entrega_raster import arquivos_auxiliares as auxiliares_raster
+
+NOME_MANIFESTO = "manifesto_exportacao.json"
+
+# Hash rápido: arquivo inteiro até 3 amostras; acima disso, amostras do
+# começo, do meio e do fim (mais o tamanho do arquivo)
+TAMANHO_AMOSTRA = 1024 * 1024
+
+# Arquivos que acompanham a origem vetorial e também guardam dados dela.
+# O -wal do GeoPackage/SQLite pode ter edições ainda não passadas para o
+# arquivo principal (que então não muda de tamanho nem de data).
+# Nos rasters, os mesmos auxiliares que a entrega leva (entrega_raster.py).
+ARQUIVOS_AUXILIARES = {
+    ".shp": [".dbf", ".shx", ".prj", ".cpg"],
+    ".gpkg": ["-wal"],
+    ".sqlite": ["-wal"],
+}
+
+
+def hash_rapido(caminho):
+    """Hash do conteúdo sem ler arquivos grandes inteiros."""
+    tamanho = os.path.getsize(caminho)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(tamanho).encode())
+
+    with open(caminho, "rb") as f:
+        if tamanho <= 3 * TAMANHO_AMOSTRA:
+            for bloco in iter(lambda: f.read(TAMANHO_AMOSTRA), b""):
+                h.update(bloco)
+        else:
+            for posicao in (0, tamanho // 2, tamanho - TAMANHO_AMOSTRA):
+                f.seek(posicao)
+                h.update(f.read(TAMANHO_AMOSTRA))
+
+    return h.hexdigest()
+
+
+def hash_texto(texto):
+    return hashlib.blake2b(texto.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def hash_estilo(layer):
+    """Hash do estilo da camada (o mesmo XML que vai para o QML)."""
+    doc = QDomDocument()
+    layer.exportNamedStyle(doc)
+    return hash_texto(doc.toString())
+
+
+def caminho_origem(layer):
+    """Arquivo de origem da camada, sem os parâmetros extras ('|layername=...')."""
+    return layer.source().split("|")[0]
+
+
+def arquivos_origem(origem):
+    """O arquivo de origem mais os auxiliares que existirem (.dbf, .shx, -wal, .ovr...)."""
+    base, ext = os.path.splitext(origem)
+    if ext.lower() not in ARQUIVOS_AUXILIARES:
+        return [origem] + auxiliares_raster(origem)
+    arquivos = [origem]
+    for sufixo in ARQUIVOS_AUXILIARES[ext.lower()]:
+        candidato = origem + sufixo if sufixo.startswith("-") else base + sufixo
+        if os.path.isfile(candidato):
+            arquivos.append(candidato)
+    return arquivos
+
+
+class Manifesto:
+    """Leitura, comparação e gravação do manifesto de uma pasta de saída."""
+
+    def __init__(self, pasta):
+        self.caminho = os.path.join(pasta, NOME_MANIFESTO)
+        self.camadas = {}
+        if os.path.isfile(self.caminho):
+            try:
+                with open(self.caminho, encoding="utf-8") as f:
+                    self.camadas = json.load(f).get("camadas", {})
+            except (OSError, ValueError, AttributeError):
+                # Manifesto corrompido: recomeça vazio (tudo é regravado)
+                self.camadas = {}
+
+        # Hash de cada arquivo nesta execução, por (caminho, tamanho, data):
+        # várias camadas do mesmo GPKG leem o arquivo uma vez só
+        self._hashes = {}
+
+        self.bytes_copiados = 0
+        self.bytes_pulados = 0
+        self.regravados = 0
+        self.pulados = 0
+
+    def assinatura_dados(self, chave, layer, extra=""):
+        """
+        Assinatura dos dados de origem da camada (arquivo principal e
+        auxiliares).
+        Se tamanho e data de todos os arquivos forem os mesmos do manifesto,
+        reaproveita o hash gravado (não lê os arquivos de novo); senão, hash
+        rápido de cada arquivo (uma vez por execução). Um arquivo só
+        "tocado" (data nova, mesmo conteúdo) dá o mesmo hash: registre a
+        assinatura também quando a camada for pulada, para gravar a data nova.
+        'extra' entra na assinatura (ex.: regras de campos, filtro).
+        Retorna None se a origem não é um arquivo local (sempre exporta).
+        """
+        origem = caminho_origem(layer)
+        if not os.path.isfile(origem):
+            return None
+
+        arquivos = {}
+        for caminho in arquivos_origem(origem):
+            stat = os.stat(caminho)
+            arquivos[caminho] = [stat.st_size, stat.st_mtime]
+        anterior = self.camadas.get(chave, {}).get("dados", {})
+
+        assinatura = {
+            "origem": origem,
+            "arquivos": arquivos,
+            "feicoes": layer.featureCount() if hasattr(layer, "featureCount") else None,
+            "extra": extra,
+        }
+
+        mesmos_arquivos = anterior.get("origem") == origem and anterior.get("arquivos") == arquivos
+        if mesmos_arquivos and "hash" in anterior:
+            assinatura["hash"] = anterior["hash"]
+        else:
+            assinatura["hash"] = hash_texto("|".join(
+                f"{os.path.basename(caminho)}:{self._hash_arquivo(caminho, tamanho, mtime)}"
+                for caminho, (tamanho, mtime) in arquivos.items()
+            ))
+        return assinatura
+
+    def _hash_arquivo(self, caminho, tamanho, mtime):
+        chave = (caminho, tamanho, mtime)
+        if chave not in self._hashes:
+            self._hashes[chave] = hash_rapido(caminho)
+        return self._hashes[chave]
+
+    def dados_iguais(self, chave, assinatura, saidas):
+        """True se os dados não mudaram e as saídas ainda existem."""
+        if assinatura is None:
+            return False
+        anterior = self.camadas.get(chave, {}).get("dados")
+        if not anterior or not all(os.path.exists(s) for s in saidas):
+            return False
+        campos = ("origem", "feicoes", "hash", "extra")
+        return all(anterior.get(c) == assinatura.get(c) for c in campos)
+
+    def estilo_igual(self, chave, hash_novo, caminho_qml):
+        anterior = self.camadas.get(chave, {}).get("estilo")
+        return anterior == hash_novo and os.path.exists(caminho_qml)
+
+    def registrar(self, chave, dados=None, estilo=None):
+        registro = self.camadas.setdefault(chave, {})
+        if dados is not None:
+            registro["dados"] = dados
+        if estilo is not None:
+            registro["estilo"] = estilo
+
+    def esquecer_dados(self, chave):
+        """Tira a assinatura dos dados: a próxima exportação grava de novo."""
+        self.camadas.get(chave, {}).pop("dados", None)
+
+    def contar_gravado(self, *caminhos):
+        self.regravados += 1
+        self.bytes_copiados += sum(os.path.getsize(c) for c in caminhos if os.path.isfile(c))
+
+    def contar_pulado(self, *caminhos):
+        self.pulados += 1
+        self.bytes_pulados += sum(os.path.getsize(c) for c in caminhos if os.path.isfile(c))
+
+    def salvar(self):
+        """Grava o manifesto (arquivo temporário + troca, para não corromper)."""
+        temporario = self.caminho + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump({"camadas": self.camadas}, f, ensure_ascii=False, indent=2)
+        os.replace(temporario, self.caminho)
@@ -0,0 +1,84 @@
+"""
+Mapa de campos origem -> destino, compilado uma vez por camada.
+
+Em vez de copiar atributo por atributo pelo nome em cada feição
+(feat[field.name()], duas buscas nome -> índice por campo), o mapa guarda
+a lista de índices de origem na ordem do destino e move o vetor de
+atributos inteiro de uma vez (setAttributes).
+
+Também aplica regras de renomear e remover campos, para enxugar as tabelas
+durante a exportação.
+A parte principal não depende do QGIS, então serve também para o OGR
+(worker_exportacao.py).
+"""
+from operator import itemgetter
+
+
+class MapeamentoCampos:
+    """
+    - nomes_origem: nomes dos campos da camada de origem, na ordem
+    - renomear: dict {nome_origem: nome_destino}
+    - remover: nomes de origem que não vão para o destino
+    - ignorar_ausentes: se False, regra com campo inexistente gera erro
+    """
+
+    def __init__(self, nomes_origem, renomear=None, remover=None, ignorar_ausentes=False):
+        renomear = dict(renomear or {})
+        remover = set(remover or [])
+        nomes_origem = list(nomes_origem)
+
+        if not ignorar_ausentes:
+            ausentes = (set(renomear) | remover) - set(nomes_origem)
+            if ausentes:
+                raise Exception(f"Campos das regras não existem na camada: {sorted(ausentes)}")
+
+        self.indices = []
+        self.nomes = []
+        for i, nome in enumerate(nomes_origem):
+            if nome in remover:
+                continue
+            self.indices.append(i)
+            self.nomes.append(renomear.get(nome, nome))
+
+        repetidos = {n for n in self.nomes if self.nomes.count(n) > 1}
+        if repetidos:
+            raise Exception(f"Nomes de campo repetidos depois de renomear: {sorted(repetidos)}")
+
+        self.n_origem = len(nomes_origem)
+        self.remove_campos = len(self.indices) != self.n_origem
+        self.renomeia_campos = self.nomes != [nomes_origem[i] for i in self.indices]
+        self.identidade = not self.remove_campos and not self.renomeia_campos
+
+        # itemgetter com um índice só devolve o valor solto, não uma tupla
+        if len(self.indices) > 1:
+            self._pegar = itemgetter(*self.indices)
+        elif self.indices:
+            indice = self.indices[0]
+            self._pegar = lambda atributos: (atributos[indice],)
+        else:
+            self._pegar = lambda atributos: ()
+
+    def converter(self, atributos):
+        """Vetor de atributos da origem -> vetor de atributos do destino."""
+        if not self.remove_campos:
+            return list(atributos)
+        return list(self._pegar(atributos))
+
+    def selecionar(self, itens):
+        """Filtra uma lista paralela aos campos de origem (definições etc.)."""
+        return [itens[i] for i in self.indices]
+
+    def copiar(self, feat_origem, feat_destino):
+        """Copia todos os atributos de uma vez, com um único setAttributes."""
+        feat_destino.setAttributes(self.converter(feat_origem.attributes()))
+
+    def campos_qgis(self, campos_origem):
+        """QgsFields do destino (cópias dos campos de origem, já renomeadas)."""
+        from qgis.core import QgsField, QgsFields
+
+        campos = QgsFields()
+        for indice, nome in zip(self.indices, self.nomes):
+            campo = QgsField(campos_origem.at(indice))
+            campo.setName(nome)
+            campos.append(campo)
+        return campos
@@ -0,0 +1,352 @@
+"""
+Exportação paralela de polígonos para GeoPackage.
+
+Os ids das feições são divididos em blocos. Cada bloco é processado por um
+processo Python separado, que abre a fonte pelo OGR por conta própria e grava
+os seus próprios arquivos (um GPKG por bloco, ou um GPKG por feição).
+Assim cada processo usa um núcleo e o SQLite de cada saída é independente.
+
+Pode ser usado pelo QGIS (exportar_cada_pol_dovertor_individual.py) ou
+sem QGIS, direto no terminal (modo headless):
+
+    python worker_exportacao.py FONTE PASTA_SAIDA --camada NOME --processos 32
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from osgeo import ogr
+
+# Módulos compartilhados entre as pastas (comum/). Este arquivo também roda
+# sozinho, como processo do pool, então acrescenta a pasta por conta própria
+PASTA_COMUM = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "comum")
+if PASTA_COMUM not in sys.path:
+    sys.path.insert(0, PASTA_COMUM)
+
+from processos import executavel_python
+from gpkg_lote import EscritorGpkg, fatiar, caminho_fatia
+from mapeamento_campos import MapeamentoCampos
+
+ogr.UseExceptions()
+
+# A cada quantas feições o processo avisa o progresso no stdout
+INTERVALO_AVISO = 50
+
+
+def abrir_camada(fonte, camada=None):
+    """Abre a fonte pelo OGR (somente leitura). Retorna (ds, layer)."""
+    ds = ogr.Open(fonte, 0)
+    if ds is None:
+        raise Exception(f"Não foi possível abrir a fonte pelo OGR: {fonte}")
+    lyr = ds.GetLayerByName(camada) if camada else ds.GetLayer(0)
+    if lyr is None:
+        raise Exception(f"Camada '{camada}' não encontrada em: {fonte}")
+    return ds, lyr
+
+
+def copiar_definicao(defn, nome):
+    """Cópia de um ogr.FieldDefn com outro nome."""
+    nova = ogr.FieldDefn(nome, defn.GetType())
+    nova.SetSubType(defn.GetSubType())
+    nova.SetWidth(defn.GetWidth())
+    nova.SetPrecision(defn.GetPrecision())
+    return nova
+
+
+def exportar_bloco(fonte, camada, fids, caminho_saida, nome_base,
+                   um_arquivo_por_feicao=False, ao_progredir=None,
+                   renomear=None, remover=None):
+    """
+    Grava as feições 'fids' da fonte, cada uma como tabela própria.
+    - um_arquivo_por_feicao=False: todas as tabelas em 'caminho_saida'
+    - um_arquivo_por_feicao=True: um GPKG por feição, na pasta de 'caminho_saida'
+    - renomear / remover: regras de campos (ver MapeamentoCampos)
+    Retorna a lista de (caminho, [tabelas]) gravados.
+    """
+    ds, lyr = abrir_camada(fonte, camada)
+
+    defn = lyr.GetLayerDefn()
+    origem = [defn.GetFieldDefn(i) for i in range(defn.GetFieldCount())]
+    mapa = MapeamentoCampos([d.GetName() for d in origem], renomear, remover)
+    campos = [
+        copiar_definicao(d, nome)
+        for d, nome in zip(mapa.selecionar(origem), mapa.nomes)
+    ]
+    srs = lyr.GetSpatialRef()
+    tipo_geometria = lyr.GetGeomType()
+    pasta = os.path.dirname(caminho_saida)
+
+    saidas = []
+    escritor = None
+
+    for n, fid in enumerate(fids, start=1):
+        feat = lyr.GetFeature(fid)
+        if feat is None:
+            continue
+
+        if um_arquivo_por_feicao or escritor is None:
+            if escritor is not None:
+                escritor.fechar()
+                saidas.append((escritor.caminho, escritor.tabelas))
+            caminho = (
+                os.path.join(pasta, f"{nome_base}_id{fid}.gpkg")
+                if um_arquivo_por_feicao else caminho_saida
+            )
+            escritor = EscritorGpkg(caminho, srs, tipo_geometria, campos)
+
+        geom = feat.GetGeometryRef()
+        wkb = bytes(geom.ExportToIsoWkb()) if geom is not None and not geom.IsEmpty() else None
+        valores = [
+            feat.GetField(i) if feat.IsFieldSetAndNotNull(i) else None
+            for i in mapa.indices
+        ]
+
+        escritor.gravar_tabela(f"{nome_base}_id{fid}", wkb, valores, fid=fid)
+
+        if ao_progredir and n % INTERVALO_AVISO == 0:
+            ao_progredir(n)
+
+    if escritor is not None:
+        escritor.fechar()
+        saidas.append((escritor.caminho, escritor.tabelas))
+
+    if ao_progredir:
+        ao_progredir(len(fids))
+
+    ds = None
+    return saidas
+
+
+class PoolExportacao:
+    """
+    Fila de blocos de fids executada por até 'processos' processos Python
+    ao mesmo tempo. Cada processo é este mesmo arquivo rodando em modo
+    '--bloco', e avisa o progresso pelo stdout.
+    """
+
+    def __init__(self, fonte, camada, fids, pasta, nome_base, processos,
+                 blocos_por_processo=4, um_arquivo_por_feicao=False,
+                 renomear=None, remover=None, n_arquivos=None):
+        self.fonte = fonte
+        self.camada = camada
+        self.pasta = pasta
+        self.nome_base = nome_base
+        self.processos = max(1, processos)
+        self.um_arquivo_por_feicao = um_arquivo_por_feicao
+        self.renomear = dict(renomear or {})
+        self.remover = list(remover or [])
+        self.total = len(fids)
+
+        # Cada bloco é um GPKG. Com n_arquivos, são exatamente esses arquivos
+        # (mesma divisão do modo em série; com menos arquivos que processos,
+        # só n_arquivos processos trabalham). Sem n_arquivos (ou com um
+        # arquivo por feição), mais blocos que processos, para equilibrar a
+        # carga no final
+        if n_arquivos and not um_arquivo_por_feicao:
+            fatias = fatiar(self.total, n_arquivos)
+        else:
+            fatias = fatiar(self.total, self.processos * blocos_por_processo)
+        self.blocos = [fids[inicio:fim] for inicio, fim in fatias]
+
+        self._feitos = {}
+        self._trava = threading.Lock()
+
+    def _ler_progresso(self, indice, proc):
+        """Lê as linhas 'progresso N' de um processo (roda numa thread)."""
+        for linha in proc.stdout:
+            if linha.startswith("progresso "):
+                with self._trava:
+                    self._feitos[indice] = int(linha.split()[1])
+
+    def feitos(self):
+        with self._trava:
+            return sum(self._feitos.values())
+
+    def _lancar(self, indice, pasta_temp):
+        bloco = self.blocos[indice]
+        arquivo_fids = os.path.join(pasta_temp, f"bloco_{indice}.txt")
+        with open(arquivo_fids, "w") as f:
+            f.write("\n".join(str(fid) for fid in bloco))
+
+        saida = caminho_fatia(self.pasta, self.nome_base, indice, len(self.blocos))
+        cmd = [
+            executavel_python(), os.path.abspath(__file__),
+            self.fonte, self.pasta,
+            "--nome-base", self.nome_base,
+            "--bloco", arquivo_fids,
+            "--saida", saida,
+        ]
+        if self.camada:
+            cmd += ["--camada", self.camada]
+        if self.um_arquivo_por_feicao:
+            cmd.append("--um-arquivo-por-feicao")
+        for antigo, novo in self.renomear.items():
+            cmd += ["--renomear", f"{antigo}={novo}"]
+        for nome in self.remover:
+            cmd += ["--remover", nome]
+
+        # stderr vai para arquivo, para um processo verboso não travar no pipe
+        arquivo_erros = os.path.join(pasta_temp, f"bloco_{indice}.err")
+        with open(arquivo_erros, "w") as erros:
+            proc = subprocess.Popen(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=erros,
+                text=True,
+                bufsize=1,
+                # No Windows, não abre uma janela de console por processo
+                creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0)
+            )
+        leitor = threading.Thread(target=self._ler_progresso, args=(indice, proc), daemon=True)
+        leitor.start()
+        return proc, leitor, saida, arquivo_erros
+
+    def _arquivos_bloco(self, indice, saida):
+        """GPKGs gravados pelo bloco 'indice'."""
+        if not self.um_arquivo_por_feicao:
+            return [saida]
+        return [
+            os.path.join(self.pasta, f"{self.nome_base}_id{fid}.gpkg")
+            for fid in self.blocos[indice]
+        ]
+
+    def executar(self, ao_progredir=None, cancelado=None):
+        """
+        Roda todos os blocos.
+        - ao_progredir(feitos, total): chamado periodicamente
+        - cancelado(): se retornar True, mata os processos e para
+        Retorna dict com 'saidas', 'erros' e 'cancelado'.
+        """
+        pendentes = list(range(len(self.blocos)))
+        rodando = {}    # indice -> (proc, leitor, saida, arquivo_erros)
+        saidas = []
+        erros = []
+        foi_cancelado = False
+
+        with tempfile.TemporaryDirectory(prefix="exportacao_") as pasta_temp:
+            while pendentes or rodando:
+                if cancelado and cancelado():
+                    foi_cancelado = True
+                    for indice, (proc, _, saida, _) in rodando.items():
+                        proc.kill()
+                        proc.wait()
+                        # Bloco incompleto não fica na pasta de saída: o GPKG
+                        # do bloco ou, com um arquivo por feição, os GPKGs já
+                        # criados pelo bloco (o último está pela metade)
+                        for caminho in self._arquivos_bloco(indice, saida):
+                            for arquivo in (caminho, caminho + "-journal"):
+                                if os.path.exists(arquivo):
+                                    os.remove(arquivo)
+                    break
+
+                while pendentes and len(rodando) < self.processos:
+                    indice = pendentes.pop(0)
+                    rodando[indice] = self._lancar(indice, pasta_temp)
+
+                for indice in list(rodando):
+                    proc, leitor, saida, arquivo_erros = rodando[indice]
+                    if proc.poll() is None:
+                        continue
+                    leitor.join()
+                    del rodando[indice]
+                    if proc.returncode == 0:
+                        if self.um_arquivo_por_feicao:
+                            saidas += [
+                                (caminho, [f"{self.nome_base}_id{fid}"])
+                                for caminho, fid in zip(
+                                    self._arquivos_bloco(indice, saida), self.blocos[indice]
+                                )
+                            ]
+                        else:
+                            saidas.append(
+                                (saida, [f"{self.nome_base}_id{fid}" for fid in self.blocos[indice]])
+                            )
+                    else:
+                        with open(arquivo_erros) as f:
+                            erros.append((indice, f.read().strip()))
+
+                if ao_progredir:
+                    ao_progredir(self.feitos(), self.total)
+
+                time.sleep(0.2)
+
+        return {"saidas": saidas, "erros": erros, "cancelado": foi_cancelado}
+
+
+def listar_fids(fonte, camada=None):
+    """Todos os fids da camada, lidos sem geometria e sem atributos."""
+    ds, lyr = abrir_camada(fonte, camada)
+    lyr.SetIgnoredFields(["OGR_GEOMETRY"] + [
+        lyr.GetLayerDefn().GetFieldDefn(i).GetName()
+        for i in range(lyr.GetLayerDefn().GetFieldCount())
+    ])
+    fids = [feat.GetFID() for feat in lyr]
+    ds = None
+    return fids
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Exporta cada polígono de uma camada como tabela de GeoPackage, em paralelo."
+    )
+    parser.add_argument("fonte", help="arquivo de origem (GPKG, SHP, ...)")
+    parser.add_argument("pasta", help="pasta de saída")
+    parser.add_argument("--camada", default=None, help="nome da camada dentro da fonte")
+    parser.add_argument("--nome-base", default=None, help="prefixo dos arquivos e tabelas")
+    parser.add_argument("--processos", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--arquivos", type=int, default=None,
+                        help="número de GPKGs de saída (padrão: 4 por processo)")
+    parser.add_argument("--um-arquivo-por-feicao", action="store_true")
+    parser.add_argument("--renomear", action="append", default=[], metavar="ANTIGO=NOVO",
+                        help="renomeia um campo (pode repetir)")
+    parser.add_argument("--remover", action="append", default=[], metavar="CAMPO",
+                        help="não exporta o campo (pode repetir)")
+    # Uso interno: um único bloco de fids (é assim que o pool chama os processos)
+    parser.add_argument("--bloco", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--saida", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    nome_base = args.nome_base or os.path.splitext(os.path.basename(args.fonte))[0]
+    renomear = dict(regra.split("=", 1) for regra in args.renomear)
+
+    if args.bloco:
+        with open(args.bloco) as f:
+            fids = [int(linha) for linha in f if linha.strip()]
+        exportar_bloco(
+            args.fonte, args.camada, fids, args.saida, nome_base,
+            um_arquivo_por_feicao=args.um_arquivo_por_feicao,
+            ao_progredir=lambda n: print(f"progresso {n}", flush=True),
+            renomear=renomear,
+            remover=args.remover
+        )
+        return
+
+    os.makedirs(args.pasta, exist_ok=True)
+    fids = listar_fids(args.fonte, args.camada)
+    print(f"{len(fids)} feições, {args.processos} processos.")
+
+    pool = PoolExportacao(
+        args.fonte, args.camada, fids, args.pasta, nome_base, args.processos,
+        um_arquivo_por_feicao=args.um_arquivo_por_feicao,
+        renomear=renomear,
+        remover=args.remover,
+        n_arquivos=args.arquivos
+    )
+    inicio = time.time()
+    resultado = pool.executar(
+        ao_progredir=lambda feitos, total: print(f"\r{feitos}/{total}", end="", flush=True)
+    )
+    print(f"\nConcluído em {time.time() - inicio:.1f} s.")
+
+    for indice, erro in resultado["erros"]:
+        print(f"ERRO no bloco {indice}: {erro}")
+    if resultado["erros"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()